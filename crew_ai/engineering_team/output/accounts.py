@@ -1,5 +1,9 @@
 # accounts.py
 
+from ledger import Ledger
+from prices import PriceProvider, StaticPriceProvider
+
+
 class Account:
     SHARE_PRICES = {
         "AAPL": 150.0,
@@ -7,34 +11,35 @@ class Account:
         "GOOGL": 2800.0
     }
 
-    def __init__(self, initial_deposit: float = 0.0) -> None:
+    def __init__(self, initial_deposit: float = 0.0, price_provider: PriceProvider | None = None) -> None:
+        self.price_provider = price_provider or StaticPriceProvider(self.SHARE_PRICES)
         self.balance = initial_deposit
         self.initial_deposit = initial_deposit
         self.holdings = {}
-        self.transactions = []
+        self.transactions = Ledger(initial_deposit)
 
-    def deposit(self, amount: float) -> None:
+    def deposit(self, amount: float, timestamp: float | None = None) -> None:
         self.balance += amount
-        self.transactions.append(("DEPOSIT", amount))
+        self.transactions.append("DEPOSIT", self.balance, price=amount, timestamp=timestamp)
 
-    def withdraw(self, amount: float) -> bool:
+    def withdraw(self, amount: float, timestamp: float | None = None) -> bool:
         if self.balance >= amount:
             self.balance -= amount
-            self.transactions.append(("WITHDRAWAL", amount))
+            self.transactions.append("WITHDRAWAL", self.balance, price=amount, timestamp=timestamp)
             return True
         return False
 
-    def buy_shares(self, symbol: str, quantity: int) -> bool:
+    def buy_shares(self, symbol: str, quantity: int, timestamp: float | None = None) -> bool:
         price = self._get_share_price(symbol)
         total_cost = price * quantity
         if self.balance >= total_cost:
             self.balance -= total_cost
             self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
-            self.transactions.append(("BUY", symbol, quantity, price))
+            self.transactions.append("BUY", self.balance, symbol, quantity, price, timestamp)
             return True
         return False
 
-    def sell_shares(self, symbol: str, quantity: int) -> bool:
+    def sell_shares(self, symbol: str, quantity: int, timestamp: float | None = None) -> bool:
         if self.holdings.get(symbol, 0) >= quantity:
             price = self._get_share_price(symbol)
             total_sale = price * quantity
@@ -42,15 +47,12 @@ class Account:
             self.holdings[symbol] -= quantity
             if self.holdings[symbol] == 0:
                 del self.holdings[symbol]
-            self.transactions.append(("SELL", symbol, quantity, price))
+            self.transactions.append("SELL", self.balance, symbol, quantity, price, timestamp)
             return True
         return False
 
     def get_portfolio_value(self) -> float:
-        total_value = self.balance
-        for symbol, quantity in self.holdings.items():
-            total_value += quantity * self._get_share_price(symbol)
-        return total_value
+        return self._value(self.balance, self.holdings)
 
     def get_profit_or_loss(self) -> float:
         current_value = self.get_portfolio_value()
@@ -59,8 +61,29 @@ class Account:
     def get_holdings(self) -> dict:
         return dict(self.holdings)
 
-    def list_transactions(self) -> list:
-        return list(self.transactions)
+    def list_transactions(self, offset: int = 0, limit: int | None = None) -> list:
+        return self.transactions.page(offset, limit)
+
+    def get_balance_at(self, timestamp: float) -> float:
+        return self.transactions.balance_at(timestamp)
+
+    def get_holdings_at(self, timestamp: float) -> dict:
+        return self.transactions.holdings_at(timestamp)
+
+    def get_portfolio_value_at(self, timestamp: float) -> float:
+        """Balance and holdings as of timestamp, valued at today's share prices."""
+        return self._value(self.get_balance_at(timestamp), self.get_holdings_at(timestamp))
+
+    def get_profit_or_loss_at(self, timestamp: float) -> float:
+        return self.get_portfolio_value_at(timestamp) - self.initial_deposit
+
+    def _value(self, balance: float, holdings: dict) -> float:
+        # One batched price lookup for every holding
+        prices = self.price_provider.get_prices(holdings) if holdings else {}
+        total_value = balance
+        for symbol, quantity in holdings.items():
+            total_value += quantity * prices.get(symbol, 0.0)
+        return total_value
 
     def _get_share_price(self, symbol: str) -> float:
-        return self.SHARE_PRICES.get(symbol, 0.0)
\ No newline at end of file
+        return self.price_provider.get_prices([symbol]).get(symbol, 0.0)
@@ -1,48 +1,65 @@
+import os
+
 import gradio as gr
-from accounts import Account
+from engine import TradingEngine
+from persistence import AccountStore
+
+# One engine for the whole app; each browser session trades on its own account, keyed by session.
+# Set ACCOUNTS_DB to a file path to keep accounts across restarts.
+store = AccountStore(os.environ["ACCOUNTS_DB"]) if os.getenv("ACCOUNTS_DB") else None
+engine = TradingEngine(store=store)
 
-# Create a global account instance for the sake of simplicity
-account = Account()
+def session_account(request: gr.Request) -> str:
+    return engine.ensure_account(request.session_hash)
 
-def create_account(initial_deposit: float):
-    global account
-    account = Account(initial_deposit)
+def create_account(initial_deposit: float, request: gr.Request):
+    engine.open_account(request.session_hash, initial_deposit, replace=True)
     return f"Account created with an initial deposit of ${initial_deposit}"
 
-def deposit_funds(amount: float):
-    account.deposit(amount)
-    return f"Deposited ${amount}. Current Balance: ${account.balance}"
-
-def withdraw_funds(amount: float):
-    if account.withdraw(amount):
-        return f"Withdrew ${amount}. Current Balance: ${account.balance}"
-    else:
-        return f"Insufficient balance for withdrawal of ${amount}. Current Balance: ${account.balance}"
-
-def buy_shares(symbol: str, quantity: int):
-    if account.buy_shares(symbol, quantity):
-        return f"Bought {quantity} shares of {symbol}. Current Balance: ${account.balance}"
-    else:
-        return "Failed to buy shares. Check balance or symbol."
-
-def sell_shares(symbol: str, quantity: int):
-    if account.sell_shares(symbol, quantity):
-        return f"Sold {quantity} shares of {symbol}. Current Balance: ${account.balance}"
-    else:
-        return "Failed to sell shares. Check holdings or symbol."
-
-def get_portfolio_value():
-    return f"Total Portfolio Value: ${account.get_portfolio_value()}"
-
-def get_profit_or_loss():
-    profit_or_loss = account.get_profit_or_loss()
+def deposit_funds(amount: float, request: gr.Request):
+    balance = engine.deposit(session_account(request), amount)
+    return f"Deposited ${amount}. Current Balance: ${balance}"
+
+def withdraw_funds(amount: float, request: gr.Request):
+    account_id = session_account(request)
+    with engine.locked(account_id) as account:
+        if account.withdraw(amount):
+            return f"Withdrew ${amount}. Current Balance: ${account.balance}"
+        else:
+            return f"Insufficient balance for withdrawal of ${amount}. Current Balance: ${account.balance}"
+
+def buy_shares(symbol: str, quantity: int, request: gr.Request):
+    account_id = session_account(request)
+    with engine.locked(account_id) as account:
+        if account.buy_shares(symbol, quantity):
+            return f"Bought {quantity} shares of {symbol}. Current Balance: ${account.balance}"
+        else:
+            return "Failed to buy shares. Check balance or symbol."
+
+def sell_shares(symbol: str, quantity: int, request: gr.Request):
+    account_id = session_account(request)
+    with engine.locked(account_id) as account:
+        if account.sell_shares(symbol, quantity):
+            return f"Sold {quantity} shares of {symbol}. Current Balance: ${account.balance}"
+        else:
+            return "Failed to sell shares. Check holdings or symbol."
+
+def get_portfolio_value(request: gr.Request):
+    with engine.locked(session_account(request)) as account:
+        return f"Total Portfolio Value: ${account.get_portfolio_value()}"
+
+def get_profit_or_loss(request: gr.Request):
+    with engine.locked(session_account(request)) as account:
+        profit_or_loss = account.get_profit_or_loss()
     return f"Profit/Loss from initial deposit: ${profit_or_loss}"
 
-def get_holdings():
-    return f"Current Holdings: {account.get_holdings()}"
+def get_holdings(request: gr.Request):
+    with engine.locked(session_account(request)) as account:
+        return f"Current Holdings: {account.get_holdings()}"
 
-def list_transactions():
-    return f"Transactions: {account.list_transactions()}"
+def list_transactions(request: gr.Request):
+    with engine.locked(session_account(request)) as account:
+        return f"Transactions: {account.list_transactions()}"
 
 with gr.Blocks() as demo:
     gr.Markdown("# Account Management System")
@@ -96,4 +113,5 @@ with gr.Blocks() as demo:
         transactions_output = gr.Textbox(label="Transactions")
         transactions_btn.click(list_transactions, None, transactions_output)
 
-demo.launch()
\ No newline at end of file
+if __name__ == "__main__":
+    demo.launch()
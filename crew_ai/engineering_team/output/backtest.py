@@ -0,0 +1,129 @@
+# backtest.py
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+
+@dataclass
+class BacktestResult:
+    """
+    Outcome of a backtest. Series are indexed by step and hold the state after that step's orders.
+
+    accepted: (orders,) whether each order went through.
+    balance: (steps,) cash balance.
+    holdings: (steps, symbols) shares held of each symbol, in the column order of the price matrix.
+    portfolio_value: (steps,) balance plus holdings valued at that step's prices.
+    profit_or_loss: (steps,) portfolio value less the initial deposit.
+    """
+    symbols: list[str]
+    accepted: np.ndarray
+    balance: np.ndarray
+    holdings: np.ndarray
+    portfolio_value: np.ndarray
+    profit_or_loss: np.ndarray
+
+    def holdings_at(self, step: int) -> dict[str, int]:
+        """Holdings after a step in the same form as Account.get_holdings()."""
+        return {symbol: quantity.item() for symbol, quantity in zip(self.symbols, self.holdings[step]) if quantity}
+
+
+def backtest(prices: np.ndarray, symbols: Sequence[str], steps: np.ndarray, order_symbols: np.ndarray,
+             quantities: np.ndarray, initial_deposit: float = 0.0, window: int = 4096) -> BacktestResult:
+    """
+    Replays a stream of orders against a price matrix under the same rules as Account.buy_shares and
+    Account.sell_shares: a buy needs the balance to cover price * quantity, and a sell needs the shares
+    to be held, so there is no short selling.
+
+    Orders are checked a window at a time, assuming every order in the window goes through. Up to the
+    first order that breaks a rule that assumption holds, so that prefix is accepted in one go, the
+    order is rejected, and checking resumes after it. Balances are accumulated in the same order and
+    with the same operations as Account, so they match it exactly. Portfolio values add holdings in
+    column order, which is exactly what Account gets when its holdings were first bought in that order
+    and differs at most in rounding otherwise.
+
+    :param prices: (steps, symbols) share price of each symbol at each step.
+    :param symbols: Symbol of each price column.
+    :param steps: (orders,) step each order runs at, in non-decreasing order.
+    :param order_symbols: (orders,) symbol of each order, as names or as column indices.
+    :param quantities: (orders,) shares to buy, or negative to sell.
+    :param window: Orders checked per pass. It shrinks after a rejection and grows back after a clean
+        pass, so streams with many rejections do not recheck long stretches.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    symbols = list(symbols)
+    steps = np.asarray(steps, dtype=np.intp)
+    quantities = np.asarray(quantities)
+    columns = _columns(order_symbols, symbols)
+    n_steps, n_symbols = prices.shape
+    if n_symbols != len(symbols):
+        raise ValueError(f"Price matrix has {n_symbols} columns for {len(symbols)} symbols")
+    if not len(steps) == len(columns) == len(quantities):
+        raise ValueError("steps, order_symbols and quantities must have the same length")
+    if len(steps) and (np.any(np.diff(steps) < 0) or steps[0] < 0 or steps[-1] >= n_steps):
+        raise ValueError(f"Order steps must be non-decreasing and within 0 to {n_steps - 1}")
+    if len(columns) and (columns.min() < 0 or columns.max() >= n_symbols):
+        raise ValueError(f"Order symbol columns must be within 0 to {n_symbols - 1}")
+
+    buys = quantities > 0
+    sizes = np.abs(quantities)
+    amounts = prices[steps, columns] * sizes
+    cash = np.where(buys, -amounts, amounts)
+
+    accepted = np.zeros(len(steps), dtype=bool)
+    balance = float(initial_deposit)
+    held = np.zeros(n_symbols, dtype=quantities.dtype)
+    start, size = 0, window
+    while start < len(steps):
+        stop = min(len(steps), start + size)
+        # Balance before each order, accumulated one order at a time from the current balance
+        balances = np.cumsum(np.concatenate(([balance], cash[start:stop])))
+        held_before = held[columns[start:stop]] + _exclusive_cumsum_by(columns[start:stop], quantities[start:stop])
+        ok = np.where(buys[start:stop], balances[:-1] >= amounts[start:stop], held_before >= sizes[start:stop])
+        rejected = np.flatnonzero(~ok)
+        end = start + (rejected[0] if rejected.size else stop - start)
+        accepted[start:end] = True
+        balance = balances[end - start].item()
+        np.add.at(held, columns[start:end], quantities[start:end])
+        if rejected.size:
+            start, size = end + 1, min(window, max(64, 2 * (end - start)))
+        else:
+            start, size = stop, min(window, 2 * size)
+
+    balance_after = np.cumsum(np.concatenate(([float(initial_deposit)], cash[accepted])))
+    balance_series = balance_after[np.searchsorted(steps[accepted], np.arange(n_steps), side="right")]
+    holdings = np.zeros((n_steps, n_symbols), dtype=quantities.dtype)
+    np.add.at(holdings, (steps[accepted], columns[accepted]), quantities[accepted])
+    holdings = np.cumsum(holdings, axis=0)
+    # Added one symbol at a time, as Account._value does
+    portfolio_value = balance_series.copy()
+    for column in range(n_symbols):
+        portfolio_value += holdings[:, column] * prices[:, column]
+    return BacktestResult(symbols, accepted, balance_series, holdings, portfolio_value,
+                          portfolio_value - initial_deposit)
+
+
+def _columns(order_symbols: np.ndarray, symbols: list[str]) -> np.ndarray:
+    order_symbols = np.asarray(order_symbols)
+    if order_symbols.dtype.kind in "iu":
+        return order_symbols.astype(np.intp)
+    names, inverse = np.unique(order_symbols, return_inverse=True)
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+    unknown = [name for name in names.tolist() if name not in index]
+    if unknown:
+        raise ValueError(f"No prices for {unknown}")
+    return np.array([index[name] for name in names.tolist()], dtype=np.intp)[inverse]
+
+
+def _exclusive_cumsum_by(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """For each position, the sum of the earlier values in the same group."""
+    order = np.argsort(groups, kind="stable")
+    sorted_values = values[order]
+    totals = np.cumsum(sorted_values) - sorted_values
+    sorted_groups = groups[order]
+    first = np.flatnonzero(np.concatenate(([True], sorted_groups[1:] != sorted_groups[:-1])))
+    totals -= np.repeat(totals[first], np.diff(np.concatenate((first, [len(order)]))))
+    result = np.empty_like(totals)
+    result[order] = totals
+    return result
@@ -0,0 +1,240 @@
+# engine.py
+
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from accounts import Account
+from persistence import AccountStore
+from prices import CachedPriceProvider, PriceProvider, StaticPriceProvider
+
+SIDES = ("BUY", "SELL")
+
+
+@dataclass(frozen=True)
+class Order:
+    account_id: str
+    side: str
+    symbol: str
+    quantity: int
+
+
+@dataclass(frozen=True)
+class OrderResult:
+    order: Order
+    ok: bool
+    balance: float
+    error: str | None = None
+
+
+class TradingEngine:
+    """
+    Holds many accounts keyed by id and serializes changes to each one with its own lock, so
+    operations on different accounts never wait for each other. Every account shares one cached
+    price provider.
+
+    With a store, accounts are saved after every change and loaded from the store the first time
+    they are used, so they survive restarts.
+    """
+
+    def __init__(self, price_provider: PriceProvider | None = None, price_ttl: float = 1.0,
+                 store: AccountStore | None = None) -> None:
+        """
+        :param price_provider: Quote source shared by all accounts, defaults to Account.SHARE_PRICES.
+        :param price_ttl: Seconds a quote is reused before it is fetched again.
+        :param store: Where accounts are persisted, or None to keep them in memory only.
+        """
+        source = price_provider or StaticPriceProvider(Account.SHARE_PRICES)
+        self.prices = CachedPriceProvider(source, ttl=price_ttl)
+        self.store = store
+        self._accounts: dict[str, Account] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+        self._load_locks = [threading.Lock() for _ in range(64)]
+
+    def open_account(self, account_id: str | None = None, initial_deposit: float = 0.0, replace: bool = False) -> str:
+        """
+        Creates an account and returns its id.
+
+        :param account_id: Id for the account, a random one if None.
+        :param replace: Start the account over if the id already exists, instead of raising ValueError.
+        """
+        account_id = account_id or uuid.uuid4().hex
+        # _load first, so an account that so far exists only in the store is not silently started over
+        if (not replace and self._load(account_id)) or not self._install(account_id, replace, initial_deposit):
+            raise ValueError(f"Account {account_id} already exists")
+        return account_id
+
+    def ensure_account(self, account_id: str, initial_deposit: float = 0.0) -> str:
+        """Opens the account unless it already exists."""
+        if not self._load(account_id):
+            self._install(account_id, False, initial_deposit)
+        return account_id
+
+    def close_account(self, account_id: str) -> None:
+        with self._registry_lock:
+            lock = self._locks.get(account_id)
+        if lock is not None:
+            # Under the account's lock, so an operation in progress finishes before the account goes
+            with lock, self._registry_lock:
+                self._accounts.pop(account_id, None)
+                self._locks.pop(account_id, None)
+        if self.store is not None:
+            self.store.delete(account_id)
+
+    def has_account(self, account_id: str) -> bool:
+        return self._load(account_id)
+
+    def _install(self, account_id: str, replace: bool, initial_deposit: float = 0.0) -> bool:
+        """Puts a new account under the id, unless one exists and replace is False. Returns whether it did."""
+        account = Account(initial_deposit, price_provider=self.prices)
+        with self._registry_lock:
+            if not replace and account_id in self._accounts:
+                return False
+            lock = self._locks.setdefault(account_id, threading.Lock())
+        # Swapped under the account's lock, so an operation in progress on the old account finishes and
+        # saves first, and saved outside the registry lock, so other accounts do not wait on the disk
+        with lock:
+            with self._registry_lock:
+                if not replace and account_id in self._accounts:
+                    return False
+                self._accounts[account_id] = account
+            if self.store is not None:
+                self.store.save(account_id, account)
+        return True
+
+    def _load(self, account_id: str) -> bool:
+        """Whether the account exists, loading it from the store if needed."""
+        with self._registry_lock:
+            if account_id in self._accounts:
+                return True
+        if self.store is None:
+            return False
+        # Read outside the registry lock; the striped lock keeps two threads from loading the same id
+        with self._load_locks[hash(account_id) % len(self._load_locks)]:
+            with self._registry_lock:
+                if account_id in self._accounts:
+                    return True
+            account = self.store.load(account_id, self.prices)
+            if account is None:
+                return False
+            with self._registry_lock:
+                if account_id not in self._accounts:
+                    self._locks.setdefault(account_id, threading.Lock())
+                    self._accounts[account_id] = account
+        return True
+
+    def account_ids(self) -> list[str]:
+        """Ids of the accounts in memory."""
+        with self._registry_lock:
+            return list(self._accounts)
+
+    @contextmanager
+    def locked(self, account_id: str) -> Iterator[Account]:
+        """Holds the account's lock for the block, for several operations that must not interleave."""
+        if not self._load(account_id):
+            raise KeyError(f"Unknown account {account_id}")
+        with self._registry_lock:
+            lock = self._locks.get(account_id)
+        if lock is None:
+            raise KeyError(f"Unknown account {account_id}")
+        with lock:
+            # Look up again under the account lock, in case it was replaced or closed while waiting
+            with self._registry_lock:
+                account = self._accounts.get(account_id)
+            if account is None:
+                raise KeyError(f"Unknown account {account_id}")
+            try:
+                yield account
+            finally:
+                if self.store is not None:
+                    # Replacing or closing takes this account's lock, so the check cannot go stale before
+                    # the save, which runs outside the registry lock as the store has its own
+                    with self._registry_lock:
+                        current = self._accounts.get(account_id) is account
+                    if current:
+                        self.store.save(account_id, account)
+
+    def deposit(self, account_id: str, amount: float) -> float:
+        with self.locked(account_id) as account:
+            account.deposit(amount)
+            return account.balance
+
+    def withdraw(self, account_id: str, amount: float) -> bool:
+        with self.locked(account_id) as account:
+            return account.withdraw(amount)
+
+    def buy_shares(self, account_id: str, symbol: str, quantity: int) -> bool:
+        with self.locked(account_id) as account:
+            return account.buy_shares(symbol, quantity)
+
+    def sell_shares(self, account_id: str, symbol: str, quantity: int) -> bool:
+        with self.locked(account_id) as account:
+            return account.sell_shares(symbol, quantity)
+
+    def summary(self, account_id: str) -> dict:
+        """Balance, holdings, portfolio value and profit/loss, read together so they agree."""
+        with self.locked(account_id) as account:
+            return {
+                "balance": account.balance,
+                "holdings": account.get_holdings(),
+                "portfolio_value": account.get_portfolio_value(),
+                "profit_or_loss": account.get_profit_or_loss(),
+            }
+
+    def _execute(self, account_id: str, orders: list[tuple[int, Order]]) -> list[tuple[int, OrderResult]]:
+        with ExitStack() as stack:
+            # Only the account lookup fails the whole group; errors inside it belong to a single order
+            try:
+                account = stack.enter_context(self.locked(account_id))
+            except KeyError as e:
+                return [(index, OrderResult(order, False, 0.0, str(e))) for index, order in orders]
+            results = []
+            for index, order in orders:
+                try:
+                    if order.side == "BUY":
+                        ok = account.buy_shares(order.symbol, order.quantity)
+                    else:
+                        ok = account.sell_shares(order.symbol, order.quantity)
+                except Exception as e:
+                    results.append((index, OrderResult(order, False, account.balance, str(e))))
+                else:
+                    results.append((index, OrderResult(order, ok, account.balance)))
+            return results
+
+    def submit_orders(self, orders: Iterable[Order], max_workers: int = 1) -> list[OrderResult]:
+        """
+        Executes many buy and sell orders in one call.
+
+        Orders are grouped by account and each group runs in submission order under a single
+        acquisition of that account's lock. Quotes for every symbol in the batch are fetched in
+        one lookup up front. An order that fails the account's rules, names an unknown account, or
+        raises (e.g. its quote lookup fails), gets a result with ok False rather than stopping the batch.
+
+        :param max_workers: Threads used to run different accounts' groups concurrently.
+        :return: One result per order, in the order given.
+        """
+        orders = list(orders)
+        for order in orders:
+            if order.side not in SIDES:
+                raise ValueError(f"Unknown order side {order.side!r}, expected one of {SIDES}")
+        groups: dict[str, list[tuple[int, Order]]] = {}
+        for index, order in enumerate(orders):
+            groups.setdefault(order.account_id, []).append((index, order))
+        self.prices.get_prices({order.symbol for order in orders})
+
+        results: list[OrderResult | None] = [None] * len(orders)
+        if max_workers > 1 and len(groups) > 1:
+            with ThreadPoolExecutor(max_workers) as executor:
+                batches = executor.map(lambda item: self._execute(*item), groups.items())
+                for batch in batches:
+                    for index, result in batch:
+                        results[index] = result
+        else:
+            for account_id, group in groups.items():
+                for index, result in self._execute(account_id, group):
+                    results[index] = result
+        return results
@@ -0,0 +1,135 @@
+# ledger.py
+
+import time
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+
+KINDS = ("DEPOSIT", "WITHDRAWAL", "BUY", "SELL")
+KIND_IDS = {kind: i for i, kind in enumerate(KINDS)}
+CASH_KINDS = {KIND_IDS["DEPOSIT"], KIND_IDS["WITHDRAWAL"]}
+NO_SYMBOL = -1
+
+
+class Ledger(Sequence):
+    """
+    Append-only, columnar transaction log.
+
+    Each transaction is one row across typed arrays (kind, symbol id, quantity, price, timestamp and
+    the cash balance after it), a few dozen bytes per row instead of a tuple of boxed objects. Rows
+    read back as the same tuples Account has always used: ("DEPOSIT", amount), ("WITHDRAWAL", amount),
+    ("BUY", symbol, quantity, price) and ("SELL", symbol, quantity, price).
+
+    A copy of the holdings is taken every snapshot_interval rows, so holdings as of any time come from
+    a binary search on timestamps plus a replay of at most snapshot_interval rows.
+    """
+
+    def __init__(self, initial_balance: float = 0.0, snapshot_interval: int = 256,
+                 initial_holdings: dict[str, int] | None = None) -> None:
+        """
+        :param initial_holdings: Holdings before the first row, for a ledger that starts from a checkpoint.
+        """
+        self.initial_balance = initial_balance
+        self.snapshot_interval = snapshot_interval
+        self.kinds = array("b")
+        self.symbol_ids = array("i")
+        self.quantities = array("q")
+        self.prices = array("d")  # the amount, for deposits and withdrawals
+        self.timestamps = array("d")
+        self.balances = array("d")
+        self.symbols: list[str] = []
+        self._symbol_ids: dict[str, int] = {}
+        # _snapshots[k] holds the holdings after the first k * snapshot_interval rows
+        self._holdings: dict[str, int] = dict(initial_holdings or {})
+        self._snapshots: list[dict[str, int]] = [dict(self._holdings)]
+
+    def symbol_id(self, symbol: str) -> int:
+        if symbol not in self._symbol_ids:
+            self._symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self._symbol_ids[symbol]
+
+    def append(self, kind: str, balance: float, symbol: str | None = None, quantity: int = 0,
+               price: float = 0.0, timestamp: float | None = None) -> None:
+        """
+        Records a transaction and the cash balance after it.
+
+        :param timestamp: Seconds since the epoch, defaults to now. Must not go back in time.
+        """
+        last = self.timestamps[-1] if self.timestamps else float("-inf")
+        if timestamp is None:
+            timestamp = max(time.time(), last)
+        elif timestamp < last:
+            raise ValueError(f"Transaction at {timestamp} is earlier than the last one at {last}")
+        kind_id = KIND_IDS[kind]
+        self.kinds.append(kind_id)
+        self.symbol_ids.append(self.symbol_id(symbol) if symbol is not None else NO_SYMBOL)
+        self.quantities.append(quantity)
+        self.prices.append(price)
+        self.timestamps.append(timestamp)
+        self.balances.append(balance)
+        if kind_id not in CASH_KINDS:
+            self._apply(self._holdings, len(self.kinds) - 1)
+        if len(self.kinds) % self.snapshot_interval == 0:
+            self._snapshots.append(dict(self._holdings))
+
+    def _apply(self, holdings: dict[str, int], row: int) -> None:
+        symbol = self.symbols[self.symbol_ids[row]]
+        change = self.quantities[row] if self.kinds[row] == KIND_IDS["BUY"] else -self.quantities[row]
+        held = holdings.get(symbol, 0) + change
+        if held:
+            holdings[symbol] = held
+        else:
+            holdings.pop(symbol, None)
+
+    def row(self, i: int) -> tuple:
+        kind = self.kinds[i]
+        if kind in CASH_KINDS:
+            return (KINDS[kind], self.prices[i])
+        return (KINDS[kind], self.symbols[self.symbol_ids[i]], self.quantities[i], self.prices[i])
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ledger index out of range")
+        return self.row(index)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Ledger, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Ledger({len(self)} transactions)"
+
+    def page(self, offset: int = 0, limit: int | None = None) -> list:
+        """
+        Returns transactions offset to offset + limit without touching the rest.
+
+        :param limit: Maximum number of transactions, or None for all remaining ones.
+        """
+        stop = len(self) if limit is None else min(len(self), offset + limit)
+        return [self.row(i) for i in range(offset, stop)]
+
+    def rows_before(self, timestamp: float) -> int:
+        """Number of transactions recorded at or before timestamp."""
+        return bisect_right(self.timestamps, timestamp)
+
+    def balance_at(self, timestamp: float) -> float:
+        rows = self.rows_before(timestamp)
+        return self.balances[rows - 1] if rows else self.initial_balance
+
+    def holdings_at(self, timestamp: float) -> dict[str, int]:
+        rows = self.rows_before(timestamp)
+        k = rows // self.snapshot_interval
+        holdings = dict(self._snapshots[k])
+        for i in range(k * self.snapshot_interval, rows):
+            if self.kinds[i] not in CASH_KINDS:
+                self._apply(holdings, i)
+        return holdings
@@ -0,0 +1,334 @@
+# persistence.py
+
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+from itertools import groupby
+
+from accounts import Account
+from ledger import Ledger
+from prices import PriceProvider
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    account_id TEXT PRIMARY KEY,
+    initial_deposit REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    account_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    symbol TEXT,
+    quantity INTEGER NOT NULL,
+    price REAL NOT NULL,
+    timestamp REAL NOT NULL,
+    balance REAL NOT NULL,
+    PRIMARY KEY (account_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshots (
+    account_id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    balance REAL NOT NULL,
+    holdings TEXT NOT NULL
+);
+"""
+
+INSERT_ACCOUNT = "INSERT OR REPLACE INTO accounts VALUES (?, ?)"
+INSERT_EVENT = "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+INSERT_SNAPSHOT = "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)"
+DELETE_EVENTS = "DELETE FROM events WHERE account_id = ?"
+DELETE_SNAPSHOT = "DELETE FROM snapshots WHERE account_id = ?"
+DELETE_ACCOUNT = "DELETE FROM accounts WHERE account_id = ?"
+
+logger = logging.getLogger(__name__)
+
+
+class AccountStore:
+    """
+    Durable Account state in SQLite, as an append-only log of transactions plus periodic snapshots.
+
+    save() writes only the transactions recorded since the last save, so a write costs the same no
+    matter how long the history is. Writes are committed in groups, which spreads the cost of each fsync
+    over many writes. By default save() returns only once its group is committed: the first waiting
+    thread commits everything queued, and saves arriving meanwhile queue up as the next group. With
+    durable=False saves return at once and are committed every group_commit_size events or every
+    commit_interval seconds, so a crash can lose saves that already returned. The database runs in WAL
+    mode, so a commit is a sequential append and readers never block the writer.
+
+    If a commit fails, the group is rolled back and dropped rather than retried forever, and each of
+    its accounts goes back to what was last committed, so its next save writes the lost transactions
+    again.
+
+    Every snapshot_interval events an account's balance and holdings are snapshotted, and load()
+    starts from the latest snapshot and replays only the events after it. compact() drops events that
+    a snapshot already covers, for stores that do not need the full history.
+    """
+
+    def __init__(self, path: str = "accounts.db", snapshot_interval: int = 1000, group_commit_size: int = 256,
+                 commit_interval: float | None = 0.05, synchronous: str = "FULL", durable: bool = True) -> None:
+        """
+        :param path: SQLite database file, created if missing.
+        :param group_commit_size: Queued events that trigger a commit, when not durable.
+        :param commit_interval: Seconds between background commits when not durable, or None to commit
+            only when a group fills up or on flush() and close().
+        :param synchronous: SQLite synchronous mode. NORMAL survives a crashed process but may lose the
+            last commits on power loss.
+        :param durable: Whether save() waits until its transactions are committed.
+        """
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.group_commit_size = group_commit_size
+        self.commit_interval = commit_interval
+        self.durable = durable
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={synchronous}")
+        self._db.executescript(SCHEMA)
+        # _lock guards the queue and tracking state, _db_lock the connection, so saves keep queueing
+        # while a group is being written
+        self._lock = threading.Lock()
+        self._committed_group = threading.Condition(self._lock)
+        self._db_lock = threading.Lock()
+        # (account id, statement, parameters) queued for the next group
+        self._pending: list[tuple[str, str, tuple]] = []
+        self._pending_events = 0
+        # account id -> (the Account object saved, ledger rows saved, last seq, seq of its latest snapshot)
+        self._tracked: dict[str, tuple[Account, int, int, int]] = {}
+        # The same as of the last commit, and the state each account in the queue reaches once committed
+        self._durable: dict[str, tuple[Account, int, int, int]] = {}
+        self._pending_state: dict[str, tuple[Account, int, int, int] | None] = {}
+        # Groups are numbered in order: _group is the one being queued, _committed the last one finished
+        self._group = 1
+        self._committed = 0
+        self._committing = False
+        self._failures = 0
+        self._last_error: BaseException | None = None
+        # account id -> error, for saves waiting on a group that failed
+        self._failed: dict[str, BaseException] = {}
+        self._closed = threading.Event()
+        self._thread = None
+        if commit_interval is not None and not durable:
+            self._thread = threading.Thread(target=self._commit_periodically, name="account-store", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def save(self, account_id: str, account: Account) -> None:
+        """
+        Writes the transactions recorded since this account was last saved or loaded.
+
+        Saving a different Account object under an existing id starts that id over, e.g. when an
+        account is re-created with a new initial deposit.
+
+        :raises sqlite3.Error: If durable and the commit failed. The transactions are then written
+            again by the account's next save.
+        """
+        with self._lock:
+            tracked = self._tracked.get(account_id)
+            if tracked is None or tracked[0] is not account:
+                self._pending += [
+                    (account_id, DELETE_EVENTS, (account_id,)),
+                    (account_id, DELETE_SNAPSHOT, (account_id,)),
+                    (account_id, INSERT_ACCOUNT, (account_id, account.initial_deposit)),
+                ]
+                tracked = (account, 0, 0, 0)
+            _, rows, seq, snapshot_seq = tracked
+            ledger = account.transactions
+            for i in range(rows, len(ledger)):
+                seq += 1
+                row = ledger.row(i)
+                symbol, quantity = (row[1], row[2]) if len(row) == 4 else (None, 0)
+                self._pending.append((account_id, INSERT_EVENT, (
+                    account_id, seq, row[0], symbol, quantity, ledger.prices[i], ledger.timestamps[i], ledger.balances[i],
+                )))
+            self._pending_events += len(ledger) - rows
+            if seq - snapshot_seq >= self.snapshot_interval:
+                self._pending.append((account_id, INSERT_SNAPSHOT, (
+                    account_id, seq, account.balance, json.dumps(account.holdings),
+                )))
+                snapshot_seq = seq
+            self._tracked[account_id] = self._pending_state[account_id] = (account, len(ledger), seq, snapshot_seq)
+            if self.durable:
+                self._failed.pop(account_id, None)
+                self._wait_for(self._group)
+                error = self._failed.pop(account_id, None)
+                if error is not None:
+                    raise error
+            elif self._pending_events >= self.group_commit_size:
+                self._wait_for(self._group)
+
+    def load(self, account_id: str, price_provider: PriceProvider | None = None,
+             full_history: bool = False) -> Account | None:
+        """
+        Rebuilds an account from its latest snapshot and the events after it.
+
+        The returned account's transactions then start at the snapshot. With full_history every
+        retained event is replayed instead, so list_transactions() and the as-of queries cover the
+        whole history.
+
+        :return: The account, or None if the store has no account with this id.
+        """
+        self.flush()
+        with self._db_lock:
+            found = self._db.execute(
+                "SELECT initial_deposit FROM accounts WHERE account_id = ?", (account_id,)
+            ).fetchone()
+            if found is None:
+                return None
+            account = Account(found[0], price_provider)
+            seq, balance, holdings = 0, account.initial_deposit, {}
+            snapshot = self._db.execute(
+                "SELECT seq, balance, holdings FROM snapshots WHERE account_id = ?", (account_id,)
+            ).fetchone()
+            first = self._db.execute("SELECT MIN(seq) FROM events WHERE account_id = ?", (account_id,)).fetchone()[0]
+            # Older events may have been compacted away, in which case the snapshot is the only start
+            if snapshot is not None and not (full_history and first == 1):
+                seq, balance = snapshot[0], snapshot[1]
+                holdings = {symbol: int(quantity) for symbol, quantity in json.loads(snapshot[2]).items()}
+            snapshot_seq = snapshot[0] if snapshot is not None else 0
+
+            ledger = Ledger(balance, initial_holdings=holdings)
+            events = self._db.execute(
+                "SELECT seq, kind, symbol, quantity, price, timestamp, balance FROM events "
+                "WHERE account_id = ? AND seq > ? ORDER BY seq",
+                (account_id, seq),
+            )
+            for seq, kind, symbol, quantity, price, timestamp, balance in events:
+                # int() also reads stores created when the quantity column was REAL
+                ledger.append(kind, balance, symbol, int(quantity), price, timestamp)
+        account.balance = balance
+        account.holdings = ledger.holdings_at(float("inf"))
+        account.transactions = ledger
+        with self._lock:
+            self._tracked[account_id] = self._durable[account_id] = (account, len(ledger), seq, snapshot_seq)
+        return account
+
+    def account_ids(self) -> list[str]:
+        self.flush()
+        with self._db_lock:
+            return [row[0] for row in self._db.execute("SELECT account_id FROM accounts ORDER BY account_id")]
+
+    def delete(self, account_id: str) -> None:
+        with self._lock:
+            self._tracked.pop(account_id, None)
+            self._pending += [(account_id, sql, (account_id,)) for sql in (DELETE_EVENTS, DELETE_SNAPSHOT, DELETE_ACCOUNT)]
+            self._pending_state[account_id] = None
+        self.flush()
+
+    def compact(self) -> int:
+        """
+        Deletes events already covered by a snapshot.
+
+        :return: The number of events deleted.
+        """
+        self.flush()
+        with self._db_lock:
+            cursor = self._db.execute(
+                "DELETE FROM events WHERE seq <= "
+                "(SELECT seq FROM snapshots WHERE snapshots.account_id = events.account_id)"
+            )
+            return cursor.rowcount
+
+    def flush(self) -> None:
+        """
+        Commits everything queued so far.
+
+        :raises sqlite3.Error: If a group committed meanwhile failed.
+        """
+        with self._lock:
+            failures = self._failures
+            self._wait_for(self._group)
+            if self._failures != failures:
+                raise self._last_error
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush()
+        finally:
+            self._db.close()
+            atexit.unregister(self.close)
+
+    def __enter__(self) -> "AccountStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _wait_for(self, group: int) -> None:
+        """
+        Returns once the group has been committed or has failed, committing it on this thread unless
+        another one already is. Called with _lock held.
+        """
+        while self._committed < group:
+            if self._committing:
+                self._committed_group.wait()
+            else:
+                self._commit()
+
+    def _commit(self) -> None:
+        """Commits the queued group, releasing _lock while it is written. Called with _lock held."""
+        group, ops, states = self._group, self._pending, self._pending_state
+        self._group += 1
+        self._pending, self._pending_state, self._pending_events = [], {}, 0
+        self._committing = True
+        self._lock.release()
+        error = None
+        try:
+            if ops:
+                with self._db_lock:
+                    self._write(ops)
+        except BaseException as e:
+            error = e
+        finally:
+            self._lock.acquire()
+            self._committing = False
+            self._committed = group
+            self._committed_group.notify_all()
+        if error is None:
+            for account_id, state in states.items():
+                if state is None:
+                    self._durable.pop(account_id, None)
+                else:
+                    self._durable[account_id] = state
+            return
+        self._failures += 1
+        self._last_error = error
+        # Anything queued since for these accounts follows on from the lost group, so drop it too and go
+        # back to what was last committed; their next save writes it all again
+        self._pending = [op for op in self._pending if op[0] not in states]
+        self._pending_events = sum(1 for op in self._pending if op[1] == INSERT_EVENT)
+        for account_id in states:
+            self._pending_state.pop(account_id, None)
+            if account_id in self._durable:
+                self._tracked[account_id] = self._durable[account_id]
+            else:
+                self._tracked.pop(account_id, None)
+            if self.durable:
+                self._failed[account_id] = error
+        if not isinstance(error, Exception):
+            raise error
+
+    def _write(self, ops: list[tuple[str, str, tuple]]) -> None:
+        self._db.execute("BEGIN")
+        try:
+            # Runs of the same statement go through executemany, in the order they were queued
+            for sql, group in groupby(ops, key=lambda op: op[1]):
+                self._db.executemany(sql, [params for _, _, params in group])
+            self._db.execute("COMMIT")
+        except BaseException:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            raise
+
+    def _commit_periodically(self) -> None:
+        while not self._closed.wait(self.commit_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Background commit to %s failed", self.path)
@@ -0,0 +1,132 @@
+# prices.py
+
+import csv
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+
+class PriceProvider(ABC):
+    """
+    Source of share prices. Implementations answer a whole batch of symbols in one call, so valuing
+    a portfolio costs one round trip to the quote source rather than one per holding.
+    """
+
+    @abstractmethod
+    def get_prices(self, symbols: Iterable[str]) -> dict[str, float]:
+        """
+        Returns the current price of each symbol.
+
+        :param symbols: The stock symbols to price.
+        :return: Mapping of symbol to price. Symbols with no known price are left out.
+        """
+
+    def get_price(self, symbol: str) -> float | None:
+        return self.get_prices([symbol]).get(symbol)
+
+
+class StaticPriceProvider(PriceProvider):
+    """Fixed prices, from a mapping or a JSON ({"AAPL": 150.0}) or CSV (symbol,price) file."""
+
+    def __init__(self, prices: dict[str, float]) -> None:
+        self.prices = dict(prices)
+
+    @classmethod
+    def from_file(cls, path: str) -> "StaticPriceProvider":
+        with open(path, newline="") as f:
+            if path.endswith(".json"):
+                return cls({symbol: float(price) for symbol, price in json.load(f).items()})
+            return cls({row["symbol"]: float(row["price"]) for row in csv.DictReader(f)})
+
+    def get_prices(self, symbols: Iterable[str]) -> dict[str, float]:
+        return {symbol: self.prices[symbol] for symbol in symbols if symbol in self.prices}
+
+
+class ReplayPriceProvider(PriceProvider):
+    """
+    Replays recorded quotes. Prices are those of the latest quote at or before the replay clock,
+    which starts at the first quote and is moved with advance().
+    """
+
+    def __init__(self, quotes: Iterable[tuple[float, str, float]]) -> None:
+        self._times: dict[str, list[float]] = {}
+        self._prices: dict[str, list[float]] = {}
+        for timestamp, symbol, price in sorted(quotes):
+            self._times.setdefault(symbol, []).append(timestamp)
+            self._prices.setdefault(symbol, []).append(price)
+        self.now = min((times[0] for times in self._times.values()), default=0.0)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "ReplayPriceProvider":
+        """Loads quotes from a CSV file with timestamp, symbol and price columns."""
+        with open(path, newline="") as f:
+            return cls((float(row["timestamp"]), row["symbol"], float(row["price"])) for row in csv.DictReader(f))
+
+    def advance(self, timestamp: float) -> None:
+        if timestamp < self.now:
+            raise ValueError(f"Cannot rewind replay from {self.now} to {timestamp}")
+        self.now = timestamp
+
+    def get_prices(self, symbols: Iterable[str]) -> dict[str, float]:
+        prices = {}
+        for symbol in symbols:
+            i = bisect_right(self._times.get(symbol, []), self.now)
+            if i:
+                prices[symbol] = self._prices[symbol][i - 1]
+        return prices
+
+
+class CachedPriceProvider(PriceProvider):
+    """
+    TTL and LRU cache in front of another provider. Each get_prices call forwards only the symbols
+    that are missing or expired, in a single batch. Safe to share between threads.
+    """
+
+    def __init__(self, provider: PriceProvider, ttl: float = 5.0, max_size: int = 10_000,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.provider = provider
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._quotes: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_prices(self, symbols: Iterable[str]) -> dict[str, float]:
+        prices = {}
+        missing = []
+        now = self.clock()
+        with self._lock:
+            for symbol in dict.fromkeys(symbols):
+                quote = self._quotes.get(symbol)
+                if quote is not None and now - quote[1] < self.ttl:
+                    self._quotes.move_to_end(symbol)
+                    prices[symbol] = quote[0]
+                else:
+                    missing.append(symbol)
+            self.hits += len(prices)
+            self.misses += len(missing)
+        if not missing:
+            return prices
+        # Fetched outside the lock so a slow quote source does not block cache hits
+        fetched = self.provider.get_prices(missing)
+        with self._lock:
+            for symbol, price in fetched.items():
+                self._quotes[symbol] = (price, now)
+                self._quotes.move_to_end(symbol)
+            while len(self._quotes) > self.max_size:
+                self._quotes.popitem(last=False)
+        prices.update(fetched)
+        return prices
+
+    def invalidate(self, symbol: str | None = None) -> None:
+        with self._lock:
+            if symbol is None:
+                self._quotes.clear()
+            else:
+                self._quotes.pop(symbol, None)
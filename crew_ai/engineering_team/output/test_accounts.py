@@ -1,7 +1,8 @@
-`import unittest
+import unittest
 
 # Assuming accounts.py is accessible
 from accounts import Account
+from ledger import Ledger
 
 class TestAccount(unittest.TestCase):
 
@@ -81,6 +82,7 @@ class TestAccount(unittest.TestCase):
 
     def test_get_holdings(self):
         """Test getting a copy of holdings."""
+        self.account.deposit(5000.0)  # two GOOGL shares cost more than the initial deposit
         self.account.buy_shares("GOOGL", 2)
         holdings = self.account.get_holdings()
         self.assertEqual(holdings, {"GOOGL": 2})
@@ -96,5 +98,94 @@ class TestAccount(unittest.TestCase):
         ]
         self.assertEqual(transactions, expected_transactions)
 
+    def test_list_transactions_paginated(self):
+        """Test listing a page of transactions."""
+        for amount in range(1, 11):
+            self.account.deposit(amount)
+        self.assertEqual(self.account.list_transactions(offset=2, limit=3),
+                         [("DEPOSIT", 3), ("DEPOSIT", 4), ("DEPOSIT", 5)])
+        self.assertEqual(self.account.list_transactions(offset=8), [("DEPOSIT", 9), ("DEPOSIT", 10)])
+        self.assertEqual(self.account.list_transactions(offset=20, limit=5), [])
+
+    def test_as_of_queries(self):
+        """Test balance, holdings and profit/loss as of a past time."""
+        self.account.buy_shares("AAPL", 2, timestamp=10.0)
+        self.account.deposit(500.0, timestamp=20.0)
+        self.account.sell_shares("AAPL", 1, timestamp=30.0)
+        self.assertEqual(self.account.get_balance_at(5.0), 1000.0)
+        self.assertEqual(self.account.get_holdings_at(5.0), {})
+        self.assertEqual(self.account.get_balance_at(10.0), 700.0)
+        self.assertEqual(self.account.get_holdings_at(25.0), {"AAPL": 2})
+        self.assertEqual(self.account.get_balance_at(25.0), 1200.0)
+        self.assertEqual(self.account.get_profit_or_loss_at(25.0), 500.0)
+        self.assertEqual(self.account.get_holdings_at(30.0), {"AAPL": 1})
+        self.assertEqual(self.account.get_portfolio_value_at(30.0), self.account.get_portfolio_value())
+
+    def test_timestamps_cannot_go_back(self):
+        """Test that a transaction earlier than the last one is rejected."""
+        self.account.deposit(100.0, timestamp=50.0)
+        with self.assertRaises(ValueError):
+            self.account.deposit(100.0, timestamp=40.0)
+
+
+class TestLedger(unittest.TestCase):
+
+    def setUp(self):
+        """Build a ledger with snapshots every few rows and a list of the same transactions."""
+        self.ledger = Ledger(initial_balance=100.0, snapshot_interval=4)
+        self.expected = []
+        holdings = {}
+        balance = 100.0
+        for i in range(30):
+            symbol = ["AAPL", "TSLA", "GOOGL"][i % 3]
+            if i % 5 == 4 and holdings.get(symbol):
+                quantity = holdings[symbol]
+                balance += quantity * 10.0
+                self.ledger.append("SELL", balance, symbol, quantity, 10.0, timestamp=float(i))
+                self.expected.append(("SELL", symbol, quantity, 10.0))
+                del holdings[symbol]
+            elif i % 7 == 6:
+                balance += 50.0
+                self.ledger.append("DEPOSIT", balance, price=50.0, timestamp=float(i))
+                self.expected.append(("DEPOSIT", 50.0))
+            else:
+                balance -= 10.0
+                self.ledger.append("BUY", balance, symbol, 1, 10.0, timestamp=float(i))
+                self.expected.append(("BUY", symbol, 1, 10.0))
+                holdings[symbol] = holdings.get(symbol, 0) + 1
+
+    def replay(self, rows):
+        """Holdings after the first rows transactions, the slow way."""
+        holdings = {}
+        for transaction in self.expected[:rows]:
+            if transaction[0] in ("BUY", "SELL"):
+                change = transaction[2] if transaction[0] == "BUY" else -transaction[2]
+                holdings[transaction[1]] = holdings.get(transaction[1], 0) + change
+                if holdings[transaction[1]] == 0:
+                    del holdings[transaction[1]]
+        return holdings
+
+    def test_rows_match_tuples(self):
+        """Test that rows read back as the original transaction tuples."""
+        self.assertEqual(len(self.ledger), 30)
+        self.assertEqual(self.ledger, self.expected)
+        self.assertEqual(self.ledger[-1], self.expected[-1])
+        self.assertEqual(self.ledger[3:6], self.expected[3:6])
+        self.assertIn(self.expected[10], self.ledger)
+        self.assertTrue(all(type(row[2]) is int for row in self.ledger if len(row) == 4))
+
+    def test_holdings_at_matches_replay(self):
+        """Test as-of holdings against a full replay at every point, across snapshot boundaries."""
+        self.assertEqual(self.ledger.holdings_at(-1.0), {})
+        for i in range(30):
+            self.assertEqual(self.ledger.holdings_at(float(i)), self.replay(i + 1))
+        self.assertTrue(all(type(quantity) is int for quantity in self.ledger.holdings_at(29.0).values()))
+
+    def test_balance_at(self):
+        """Test as-of balance is the balance after the last transaction at or before the time."""
+        self.assertEqual(self.ledger.balance_at(-1.0), 100.0)
+        self.assertEqual(self.ledger.balance_at(0.5), 90.0)
+        self.assertEqual(self.ledger.balance_at(100.0), self.ledger.balances[-1])
+
 if __name__ == '__main__':
-    unittest.main()`
\ No newline at end of file
+    unittest.main()
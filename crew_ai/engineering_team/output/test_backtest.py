@@ -0,0 +1,109 @@
+import unittest
+
+import numpy as np
+
+from accounts import Account
+from backtest import backtest
+from prices import ReplayPriceProvider
+
+
+def run_accounts(prices, symbols, steps, order_symbols, quantities, initial_deposit):
+    """Replay the orders one at a time through Account, recording the same series as backtest()."""
+    replay = ReplayPriceProvider(
+        (float(step), symbol, float(prices[step, column]))
+        for step in range(len(prices)) for column, symbol in enumerate(symbols)
+    )
+    account = Account(initial_deposit, price_provider=replay)
+    accepted, balance, holdings, profit_or_loss = [], [], [], []
+    i = 0
+    for step in range(len(prices)):
+        replay.advance(float(step))
+        while i < len(steps) and steps[i] == step:
+            symbol, quantity = symbols[order_symbols[i]], int(quantities[i])
+            if quantity > 0:
+                accepted.append(account.buy_shares(symbol, quantity))
+            else:
+                accepted.append(account.sell_shares(symbol, -quantity))
+            i += 1
+        balance.append(account.balance)
+        holdings.append(account.get_holdings())
+        profit_or_loss.append(account.get_profit_or_loss())
+    return accepted, balance, holdings, profit_or_loss
+
+
+class TestBacktest(unittest.TestCase):
+
+    def setUp(self):
+        """Set up constant prices matching Account.SHARE_PRICES."""
+        self.symbols = list(Account.SHARE_PRICES)
+        self.prices = np.array([list(Account.SHARE_PRICES.values())] * 3)
+
+    def test_buy_and_sell_rules(self):
+        """Test the scenarios from test_accounts: buys need the balance, sells need the shares."""
+        result = backtest(
+            self.prices, self.symbols,
+            steps=[0, 0, 1, 1, 2],
+            order_symbols=["AAPL", "TSLA", "AAPL", "AAPL", "TSLA"],
+            quantities=[5, 10, -3, -10, -1],
+            initial_deposit=1000.0,
+        )
+        self.assertEqual(result.accepted.tolist(), [True, False, True, False, False])
+        self.assertEqual(result.balance.tolist(), [250.0, 700.0, 700.0])
+        self.assertEqual(result.holdings_at(0), {"AAPL": 5})
+        self.assertEqual(result.holdings_at(2), {"AAPL": 2})
+        self.assertEqual(result.portfolio_value.tolist(), [1000.0, 1000.0, 1000.0])
+        self.assertEqual(result.profit_or_loss.tolist(), [0.0, 0.0, 0.0])
+
+    def test_profit_or_loss_follows_prices(self):
+        """Test holdings are valued at each step's prices."""
+        prices = np.array([[150.0, 600.0, 2800.0], [160.0, 600.0, 2800.0]])
+        result = backtest(prices, self.symbols, [0], [0], [5], initial_deposit=1000.0)
+        self.assertEqual(result.profit_or_loss.tolist(), [0.0, 50.0])
+
+    def test_matches_account(self):
+        """Test random order streams give the same results as running them through Account."""
+        rng = np.random.default_rng(7)
+        symbols = ["AAPL", "TSLA", "GOOGL", "MSFT"]
+        # Prices in quarters keep every sum exact, so values match whatever order Account adds holdings in
+        prices = np.round(rng.uniform(10, 200, size=(200, len(symbols))) * 4) / 4
+        steps = np.sort(rng.integers(0, len(prices), size=3000))
+        order_symbols = rng.integers(0, len(symbols), size=len(steps))
+        quantities = rng.integers(1, 21, size=len(steps)) * rng.choice([-1, 1], size=len(steps))
+        for window in (1, 64, 4096):
+            result = backtest(prices, symbols, steps, order_symbols, quantities, initial_deposit=5000.0, window=window)
+            accepted, balance, holdings, profit_or_loss = run_accounts(
+                prices, symbols, steps, order_symbols, quantities, 5000.0)
+            self.assertEqual(result.accepted.tolist(), accepted)
+            self.assertTrue(0 < result.accepted.sum() < len(steps))
+            self.assertEqual(result.balance.tolist(), balance)
+            self.assertEqual([result.holdings_at(step) for step in range(len(prices))], holdings)
+            self.assertEqual(result.profit_or_loss.tolist(), profit_or_loss)
+
+    def test_balances_match_account_exactly(self):
+        """Test balances match Account bit for bit with prices in cents."""
+        rng = np.random.default_rng(11)
+        prices = np.round(rng.uniform(1, 100, size=(50, 2)), 2)
+        steps = np.sort(rng.integers(0, len(prices), size=500))
+        order_symbols = rng.integers(0, 2, size=len(steps))
+        quantities = rng.integers(1, 6, size=len(steps)) * rng.choice([-1, 1], size=len(steps))
+        result = backtest(prices, ["A", "B"], steps, order_symbols, quantities, initial_deposit=1234.56)
+        accepted, balance, _, profit_or_loss = run_accounts(prices, ["A", "B"], steps, order_symbols, quantities, 1234.56)
+        self.assertEqual(result.accepted.tolist(), accepted)
+        self.assertEqual(result.balance.tolist(), balance)
+        np.testing.assert_allclose(result.profit_or_loss, profit_or_loss, rtol=0, atol=1e-9)
+
+    def test_invalid_orders(self):
+        """Test unknown symbols, out of range columns and out of order steps are rejected."""
+        with self.assertRaises(ValueError):
+            backtest(self.prices, self.symbols, [0], ["MSFT"], [1])
+        with self.assertRaises(ValueError):
+            backtest(self.prices, self.symbols, [1, 0], [0, 0], [1, 1])
+        with self.assertRaises(ValueError):
+            backtest(self.prices, self.symbols, [3], [0], [1])
+        for column in (-1, len(self.symbols)):
+            with self.assertRaises(ValueError):
+                backtest(self.prices, self.symbols, [0], [column], [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import threading
+import unittest
+
+from engine import Order, TradingEngine
+from prices import StaticPriceProvider
+
+
+class LostQuotePrices(StaticPriceProvider):
+    """Answers the first lookup of a symbol, then raises KeyError for it."""
+
+    def __init__(self, prices, lost):
+        super().__init__(prices)
+        self.lost = lost
+        self.seen = set()
+
+    def get_prices(self, symbols):
+        symbols = list(symbols)
+        if self.lost in symbols and self.lost in self.seen:
+            raise KeyError(f"No quote for {self.lost}")
+        self.seen.update(symbols)
+        return super().get_prices(symbols)
+
+
+class TestTradingEngine(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an engine with two funded accounts."""
+        self.engine = TradingEngine(StaticPriceProvider({"AAPL": 100.0, "TSLA": 500.0}))
+        self.engine.open_account("alice", 1000.0)
+        self.engine.open_account("bob", 1000.0)
+
+    def test_open_account(self):
+        """Test opening, replacing and closing accounts."""
+        account_id = self.engine.open_account(initial_deposit=50.0)
+        self.assertTrue(self.engine.has_account(account_id))
+        with self.assertRaises(ValueError):
+            self.engine.open_account("alice")
+        self.engine.open_account("alice", 10.0, replace=True)
+        self.assertEqual(self.engine.summary("alice")["balance"], 10.0)
+        self.engine.close_account(account_id)
+        self.assertEqual(sorted(self.engine.account_ids()), ["alice", "bob"])
+
+    def test_ensure_account(self):
+        """Test ensure_account opens a missing account but leaves an existing one alone."""
+        self.engine.deposit("alice", 500.0)
+        self.engine.ensure_account("alice")
+        self.engine.ensure_account("carol")
+        self.assertEqual(self.engine.summary("alice")["balance"], 1500.0)
+        self.assertEqual(self.engine.summary("carol")["balance"], 0.0)
+
+    def test_accounts_are_isolated(self):
+        """Test operations on one account do not affect another."""
+        self.assertTrue(self.engine.buy_shares("alice", "AAPL", 5))
+        self.assertFalse(self.engine.withdraw("bob", 2000.0))
+        self.assertEqual(self.engine.summary("alice")["holdings"], {"AAPL": 5})
+        self.assertEqual(self.engine.summary("bob"), {
+            "balance": 1000.0, "holdings": {}, "portfolio_value": 1000.0, "profit_or_loss": 0.0,
+        })
+
+    def test_unknown_account(self):
+        """Test operations on an unknown account raise KeyError."""
+        with self.assertRaises(KeyError):
+            self.engine.deposit("nobody", 10.0)
+
+    def test_submit_orders(self):
+        """Test a batch of orders returns one result per order, in submission order."""
+        results = self.engine.submit_orders([
+            Order("alice", "BUY", "AAPL", 3),
+            Order("bob", "BUY", "TSLA", 1),
+            Order("alice", "BUY", "TSLA", 2),  # not enough cash left
+            Order("nobody", "BUY", "AAPL", 1),
+            Order("bob", "SELL", "TSLA", 1),
+        ])
+        self.assertEqual([result.ok for result in results], [True, True, False, False, True])
+        self.assertEqual([result.balance for result in results], [700.0, 500.0, 700.0, 0.0, 1000.0])
+        self.assertIn("nobody", results[3].error)
+        self.assertEqual(results[2].order, Order("alice", "BUY", "TSLA", 2))
+
+    def test_failing_order_does_not_fail_its_group(self):
+        """Test an order that raises fails alone, and the orders around it keep their results."""
+        engine = TradingEngine(LostQuotePrices({"AAPL": 100.0, "TSLA": 500.0}, lost="TSLA"), price_ttl=0.0)
+        engine.open_account("alice", 1000.0)
+        results = engine.submit_orders([
+            Order("alice", "BUY", "AAPL", 3),
+            Order("alice", "BUY", "TSLA", 1),
+            Order("alice", "BUY", "AAPL", 1),
+        ])
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertEqual([result.balance for result in results], [700.0, 700.0, 600.0])
+        self.assertIn("TSLA", results[1].error)
+        self.assertEqual(engine.summary("alice")["holdings"], {"AAPL": 4})
+
+    def test_submit_orders_rejects_unknown_side(self):
+        """Test a batch with an unknown side is rejected before anything runs."""
+        with self.assertRaises(ValueError):
+            self.engine.submit_orders([Order("alice", "BUY", "AAPL", 1), Order("alice", "HOLD", "AAPL", 1)])
+        self.assertEqual(self.engine.summary("alice")["balance"], 1000.0)
+
+    def test_submit_orders_in_parallel(self):
+        """Test running account groups on several threads gives the same results."""
+        orders = [Order(account_id, side, "AAPL", 2) for side in ("BUY", "BUY", "SELL")
+                  for account_id in ("alice", "bob")]
+        serial = TradingEngine(StaticPriceProvider({"AAPL": 100.0}))
+        serial.open_account("alice", 1000.0)
+        serial.open_account("bob", 1000.0)
+        self.assertEqual(self.engine.submit_orders(orders, max_workers=4), serial.submit_orders(orders))
+
+    def test_concurrent_trades_on_one_account(self):
+        """Test concurrent buys and sells on the same account leave it consistent."""
+        def trade():
+            for _ in range(100):
+                self.engine.buy_shares("alice", "AAPL", 1)
+                self.engine.sell_shares("alice", "AAPL", 1)
+
+        threads = [threading.Thread(target=trade) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        summary = self.engine.summary("alice")
+        self.assertEqual(summary["balance"], 1000.0)
+        self.assertEqual(summary["holdings"], {})
+        with self.engine.locked("alice") as account:
+            self.assertEqual(len(account.transactions), 8 * 100 * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
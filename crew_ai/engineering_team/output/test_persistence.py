@@ -0,0 +1,284 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from accounts import Account
+from engine import TradingEngine
+from persistence import AccountStore
+
+
+class TestAccountStore(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a store in a temporary directory that commits only when asked."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "accounts.db")
+        self.store = AccountStore(self.path, snapshot_interval=4, commit_interval=None)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def trade(self, account_id, account):
+        """Record a mix of transactions on the account one second apart, saving after each."""
+        for change in (
+            lambda: account.deposit(1000.0, timestamp=1.0),
+            lambda: account.buy_shares("AAPL", 5, timestamp=2.0),
+            lambda: account.buy_shares("TSLA", 1, timestamp=3.0),
+            lambda: account.sell_shares("AAPL", 2, timestamp=4.0),
+            lambda: account.withdraw(100.0, timestamp=5.0),
+            lambda: account.sell_shares("TSLA", 1, timestamp=6.0),
+        ):
+            change()
+            self.store.save(account_id, account)
+
+    def reopen(self, **kwargs):
+        self.store.close()
+        self.store = AccountStore(self.path, commit_interval=None, **kwargs)
+
+    def assertSameState(self, account, expected):
+        self.assertEqual(account.initial_deposit, expected.initial_deposit)
+        self.assertEqual(account.balance, expected.balance)
+        self.assertEqual(account.get_holdings(), expected.get_holdings())
+        self.assertEqual(account.get_profit_or_loss(), expected.get_profit_or_loss())
+
+    def test_save_and_load(self):
+        """Test an account survives closing and reopening the store."""
+        account = Account(500.0)
+        self.trade("alice", account)
+        self.reopen()
+        loaded = self.store.load("alice", full_history=True)
+        self.assertSameState(loaded, account)
+        self.assertEqual(loaded.transactions, account.transactions)
+        self.assertEqual(loaded.get_balance_at(3.0), account.get_balance_at(3.0))
+        self.assertEqual(loaded.get_holdings_at(4.0), {"AAPL": 3, "TSLA": 1})
+        self.assertTrue(all(type(row[2]) is int for row in loaded.list_transactions() if len(row) == 4))
+        self.assertTrue(all(type(quantity) is int for quantity in loaded.get_holdings().values()))
+        self.assertIsNone(self.store.load("nobody"))
+
+    def test_load_replays_only_the_tail(self):
+        """Test loading starts from the latest snapshot and replays only later events."""
+        account = Account(500.0)
+        self.trade("alice", account)
+        self.reopen()
+        loaded = self.store.load("alice")
+        self.assertSameState(loaded, account)
+        self.assertEqual(loaded.list_transactions(), account.list_transactions(4))
+
+    def test_incremental_saves(self):
+        """Test saving after every change writes each transaction once and keeps loading correct."""
+        account = Account()
+        account.deposit(1000.0, timestamp=1.0)
+        self.store.save("alice", account)
+        account.buy_shares("AAPL", 2, timestamp=2.0)
+        self.store.save("alice", account)
+        self.store.save("alice", account)
+        self.store.flush()
+        with sqlite3.connect(self.path) as db:
+            self.assertEqual(db.execute("SELECT COUNT(*) FROM events").fetchone()[0], 2)
+        loaded = self.store.load("alice")
+        loaded.sell_shares("AAPL", 1, timestamp=3.0)
+        self.store.save("alice", loaded)
+        account.sell_shares("AAPL", 1, timestamp=3.0)
+        self.reopen()
+        self.assertSameState(self.store.load("alice"), account)
+
+    def test_group_commit(self):
+        """Test saves are buffered until a group fills up or the store is flushed."""
+        self.reopen(group_commit_size=3, durable=False)
+        account = Account(100.0)
+        account.deposit(1.0)
+        self.store.save("alice", account)
+        with sqlite3.connect(self.path) as db:
+            self.assertEqual(db.execute("SELECT COUNT(*) FROM events").fetchone()[0], 0)
+            account.deposit(1.0)
+            account.deposit(1.0)
+            self.store.save("alice", account)
+            self.assertEqual(db.execute("SELECT COUNT(*) FROM events").fetchone()[0], 3)
+
+    def test_durable_saves(self):
+        """Test a save has been committed by the time it returns, also with many threads saving at once."""
+        def trade(account_id):
+            account = Account(100.0)
+            for _ in range(20):
+                account.deposit(1.0)
+                self.store.save(account_id, account)
+                with sqlite3.connect(self.path) as db:
+                    committed = db.execute("SELECT COUNT(*) FROM events WHERE account_id = ?", (account_id,)).fetchone()[0]
+                counts.append(committed == len(account.transactions))
+
+        counts = []
+        threads = [threading.Thread(target=trade, args=(f"account-{i}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counts, [True] * 160)
+
+    def test_failed_commit(self):
+        """Test a failed commit is reported to the saver, does not block later commits, and is written again."""
+        self.store.close()
+        self.store = FailingStore(self.path, failures=0)
+        alice, bob = Account(100.0), Account(50.0)
+        self.store.save("bob", bob)
+        self.store.failures = 1
+        alice.deposit(1.0, timestamp=1.0)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.store.save("alice", alice)
+        alice.deposit(2.0, timestamp=2.0)
+        self.store.save("alice", alice)
+        bob.deposit(5.0, timestamp=3.0)
+        self.store.save("bob", bob)
+        self.reopen()
+        self.assertSameState(self.store.load("alice", full_history=True), alice)
+        self.assertEqual(self.store.load("alice", full_history=True).transactions, alice.transactions)
+        self.assertSameState(self.store.load("bob"), bob)
+
+    def test_background_commits_survive_a_failure(self):
+        """Test the periodic commit logs a failure and keeps committing."""
+        self.store.close()
+        self.store = FailingStore(self.path, failures=1, durable=False, commit_interval=0.01)
+        account = Account(100.0)
+        account.deposit(1.0, timestamp=1.0)
+        with self.assertLogs("persistence", level="ERROR"):
+            self.store.save("alice", account)
+            self.assertTrue(self.store.failed.wait(5))
+            time.sleep(0.05)
+        account.deposit(2.0, timestamp=2.0)
+        self.store.save("alice", account)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            with sqlite3.connect(self.path) as db:
+                if db.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 2:
+                    break
+            time.sleep(0.01)
+        self.assertTrue(self.store._thread.is_alive())
+        self.reopen()
+        self.assertSameState(self.store.load("alice", full_history=True), account)
+
+    def test_replacing_an_account_starts_over(self):
+        """Test saving a new Account under an existing id replaces the old one."""
+        old = Account(500.0)
+        self.trade("alice", old)
+        new = Account(50.0)
+        new.deposit(5.0, timestamp=1.0)
+        self.store.save("alice", new)
+        self.reopen()
+        self.assertSameState(self.store.load("alice", full_history=True), new)
+
+    def test_compact(self):
+        """Test compacting drops events covered by a snapshot without changing the loaded state."""
+        account = Account(500.0)
+        self.trade("alice", account)
+        self.assertEqual(self.store.compact(), 4)
+        self.reopen()
+        self.assertSameState(self.store.load("alice", full_history=True), account)
+
+    def test_delete(self):
+        """Test a deleted account is gone from the store."""
+        self.store.save("alice", Account(10.0))
+        self.store.save("bob", Account(20.0))
+        self.store.delete("alice")
+        self.assertEqual(self.store.account_ids(), ["bob"])
+        self.assertIsNone(self.store.load("alice"))
+
+
+class FailingStore(AccountStore):
+    """Store whose first few commits fail as if the disk were full."""
+
+    def __init__(self, path, failures, **kwargs):
+        super().__init__(path, **kwargs)
+        self.failures = failures
+        self.failed = threading.Event()
+
+    def _write(self, ops):
+        if self.failures:
+            self.failures -= 1
+            self.failed.set()
+            raise sqlite3.OperationalError("database or disk is full")
+        super()._write(ops)
+
+
+class SlowStore(AccountStore):
+    """Store whose saves for one account block until released."""
+
+    def __init__(self, path, slow_id):
+        super().__init__(path, commit_interval=None)
+        self.slow_id = slow_id
+        self.saving = threading.Event()
+        self.release = threading.Event()
+
+    def save(self, account_id, account):
+        if account_id == self.slow_id and len(account.transactions):
+            self.saving.set()
+            self.release.wait(5)
+        super().save(account_id, account)
+
+
+class TestEnginePersistence(unittest.TestCase):
+
+    def test_slow_save_does_not_block_other_accounts(self):
+        """Test a save in progress on one account does not hold up operations on another."""
+        with tempfile.TemporaryDirectory() as directory:
+            with SlowStore(os.path.join(directory, "accounts.db"), "alice") as store:
+                engine = TradingEngine(store=store)
+                engine.open_account("alice", 100.0)
+                engine.open_account("bob", 100.0)
+                thread = threading.Thread(target=engine.deposit, args=("alice", 1.0))
+                thread.start()
+                self.assertTrue(store.saving.wait(5))
+                other = threading.Thread(target=engine.deposit, args=("bob", 1.0))
+                other.start()
+                other.join(1)
+                blocked = other.is_alive()
+                store.release.set()
+                thread.join()
+                other.join()
+                self.assertFalse(blocked)
+                self.assertEqual(engine.summary("bob")["balance"], 101.0)
+                self.assertEqual(engine.summary("alice")["balance"], 101.0)
+
+    def test_accounts_survive_restart(self):
+        """Test an engine with a store picks up its accounts after a restart."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "accounts.db")
+            with AccountStore(path) as store:
+                engine = TradingEngine(store=store)
+                engine.open_account("alice", 1000.0)
+                engine.buy_shares("alice", "AAPL", 2)
+                with engine.locked("alice") as account:
+                    account.deposit(50.0)
+                before = engine.summary("alice")
+            with AccountStore(path) as store:
+                engine = TradingEngine(store=store)
+                self.assertTrue(engine.has_account("alice"))
+                self.assertEqual(engine.summary("alice"), before)
+                self.assertFalse(engine.has_account("bob"))
+
+    def test_open_account_after_restart(self):
+        """Test opening an id that exists only in the store raises instead of wiping it."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "accounts.db")
+            with AccountStore(path) as store:
+                engine = TradingEngine(store=store)
+                engine.open_account("alice", 1000.0)
+                engine.buy_shares("alice", "AAPL", 2)
+                before = engine.summary("alice")
+            with AccountStore(path) as store:
+                engine = TradingEngine(store=store)
+                with self.assertRaises(ValueError):
+                    engine.open_account("alice", 0.0)
+                self.assertEqual(engine.summary("alice"), before)
+            with AccountStore(path) as store:
+                engine = TradingEngine(store=store)
+                self.assertEqual(engine.summary("alice"), before)
+                engine.open_account("alice", 10.0, replace=True)
+            with AccountStore(path) as store:
+                self.assertEqual(TradingEngine(store=store).summary("alice")["balance"], 10.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
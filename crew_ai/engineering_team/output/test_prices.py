@@ -0,0 +1,164 @@
+import json
+import os
+import tempfile
+import unittest
+
+from accounts import Account
+from prices import CachedPriceProvider, PriceProvider, ReplayPriceProvider, StaticPriceProvider
+
+
+class CountingProvider(PriceProvider):
+    """Static prices that record every batch they are asked for."""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    def get_prices(self, symbols):
+        symbols = list(symbols)
+        self.calls.append(symbols)
+        return {symbol: self.prices[symbol] for symbol in symbols if symbol in self.prices}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPriceProvider(unittest.TestCase):
+
+    def test_get_prices_is_required(self):
+        """Test a provider without get_prices cannot be created."""
+        class Incomplete(PriceProvider):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+class TestStaticPriceProvider(unittest.TestCase):
+
+    def test_get_prices(self):
+        """Test known symbols are priced and unknown ones left out."""
+        provider = StaticPriceProvider({"AAPL": 150.0, "TSLA": 600.0})
+        self.assertEqual(provider.get_prices(["AAPL", "MSFT"]), {"AAPL": 150.0})
+        self.assertEqual(provider.get_price("TSLA"), 600.0)
+        self.assertIsNone(provider.get_price("MSFT"))
+
+    def test_from_file(self):
+        """Test loading prices from JSON and CSV files."""
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, "prices.json")
+            with open(json_path, "w") as f:
+                json.dump({"AAPL": 151.5}, f)
+            csv_path = os.path.join(directory, "prices.csv")
+            with open(csv_path, "w") as f:
+                f.write("symbol,price\nGOOGL,2790.25\n")
+            self.assertEqual(StaticPriceProvider.from_file(json_path).get_prices(["AAPL"]), {"AAPL": 151.5})
+            self.assertEqual(StaticPriceProvider.from_file(csv_path).get_prices(["GOOGL"]), {"GOOGL": 2790.25})
+
+
+class TestReplayPriceProvider(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a replay of a few quotes, deliberately out of order."""
+        self.provider = ReplayPriceProvider([
+            (20.0, "AAPL", 155.0),
+            (10.0, "AAPL", 150.0),
+            (15.0, "TSLA", 600.0),
+        ])
+
+    def test_prices_follow_the_replay_clock(self):
+        """Test prices are the latest quote at or before the replay time."""
+        self.assertEqual(self.provider.now, 10.0)
+        self.assertEqual(self.provider.get_prices(["AAPL", "TSLA"]), {"AAPL": 150.0})
+        self.provider.advance(15.0)
+        self.assertEqual(self.provider.get_prices(["AAPL", "TSLA"]), {"AAPL": 150.0, "TSLA": 600.0})
+        self.provider.advance(25.0)
+        self.assertEqual(self.provider.get_prices(["AAPL"]), {"AAPL": 155.0})
+
+    def test_cannot_rewind(self):
+        """Test the replay clock only moves forward."""
+        self.provider.advance(20.0)
+        with self.assertRaises(ValueError):
+            self.provider.advance(10.0)
+
+    def test_from_csv(self):
+        """Test loading quotes from a CSV file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "quotes.csv")
+            with open(path, "w") as f:
+                f.write("timestamp,symbol,price\n1,AAPL,150\n2,AAPL,152\n")
+            provider = ReplayPriceProvider.from_csv(path)
+            provider.advance(2.0)
+            self.assertEqual(provider.get_prices(["AAPL"]), {"AAPL": 152.0})
+
+
+class TestCachedPriceProvider(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a cache with a controllable clock in front of a counting provider."""
+        self.source = CountingProvider({"AAPL": 150.0, "TSLA": 600.0, "GOOGL": 2800.0})
+        self.clock = FakeClock()
+        self.cache = CachedPriceProvider(self.source, ttl=5.0, max_size=2, clock=self.clock)
+
+    def test_only_misses_are_fetched(self):
+        """Test cached quotes are served locally and only missing ones are fetched, in one batch."""
+        self.assertEqual(self.cache.get_prices(["AAPL"]), {"AAPL": 150.0})
+        self.assertEqual(self.cache.get_prices(["AAPL", "TSLA"]), {"AAPL": 150.0, "TSLA": 600.0})
+        self.assertEqual(self.source.calls, [["AAPL"], ["TSLA"]])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_quotes_expire(self):
+        """Test a quote older than the TTL is fetched again."""
+        self.cache.get_prices(["AAPL"])
+        self.clock.now = 4.9
+        self.cache.get_prices(["AAPL"])
+        self.clock.now = 5.0
+        self.cache.get_prices(["AAPL"])
+        self.assertEqual(self.source.calls, [["AAPL"], ["AAPL"]])
+
+    def test_least_recently_used_is_evicted(self):
+        """Test the cache holds at most max_size quotes, dropping the least recently used."""
+        self.cache.get_prices(["AAPL", "TSLA"])
+        self.cache.get_prices(["AAPL"])
+        self.cache.get_prices(["GOOGL"])
+        self.cache.get_prices(["AAPL", "TSLA"])
+        self.assertEqual(self.source.calls, [["AAPL", "TSLA"], ["GOOGL"], ["TSLA"]])
+
+
+class TestAccountValuation(unittest.TestCase):
+
+    def test_portfolio_value_uses_one_batch(self):
+        """Test valuing a portfolio makes a single batched price lookup."""
+        source = CountingProvider({"AAPL": 150.0, "TSLA": 600.0, "GOOGL": 2800.0})
+        account = Account(10000.0, price_provider=source)
+        account.buy_shares("AAPL", 2)
+        account.buy_shares("TSLA", 1)
+        account.buy_shares("GOOGL", 1)
+        source.calls.clear()
+        self.assertEqual(account.get_portfolio_value(), 10000.0)
+        self.assertEqual(len(source.calls), 1)
+        self.assertEqual(sorted(source.calls[0]), ["AAPL", "GOOGL", "TSLA"])
+
+    def test_valuation_follows_provider(self):
+        """Test profit/loss reflects the prices the provider returns."""
+        replay = ReplayPriceProvider([(0.0, "AAPL", 150.0), (1.0, "AAPL", 160.0)])
+        account = Account(1000.0, price_provider=replay)
+        account.buy_shares("AAPL", 5)
+        self.assertEqual(account.get_profit_or_loss(), 0.0)
+        replay.advance(1.0)
+        self.assertEqual(account.get_profit_or_loss(), 50.0)
+
+    def test_default_prices(self):
+        """Test accounts without a provider use the built-in share prices."""
+        account = Account(1000.0)
+        self.assertEqual(account._get_share_price("TSLA"), 600.0)
+        self.assertEqual(account._get_share_price("UNKNOWN"), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
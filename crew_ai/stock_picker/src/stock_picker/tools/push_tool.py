@@ -1,8 +1,7 @@
 from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
-import os
-import requests
+from notifier import push
 
 class PushNotificationInput(BaseModel):
     """A message to send to the user"""
@@ -16,13 +15,5 @@ class PushNotificationTool(BaseTool):
     args_schema: Type[BaseModel] = PushNotificationInput
 
     def _run(self, message: str) -> str:
-        pusover_user = os.getenv("PUSHOVER_USER")
-        pusover_token = os.getenv("PUSHOVER_TOKEN")
-        pusover_url = "https://api.pushover.net/1/messages.json"
-        payload = {
-            "user": pusover_user,
-            "token": pusover_token,
-            "message": message
-        }
-        requests.post(pusover_url, data=payload)
+        push(message)
         return '{"notification": "ok"}'
@@ -0,0 +1,254 @@
+"""
+Offline benchmark for the deep research pipeline.
+
+Runs the full plan -> search -> write -> notify flow of ResearchManager against a fake agent
+backend whose per-stage latencies are drawn from configurable log-normal distributions, so
+scheduling, timeouts, caching and synthesis settings can be tuned without API credits.
+
+    python benchmark.py --concurrency 1,4,16 --queries 32
+    python benchmark.py --save-baseline benchmark_baseline.json
+    python benchmark.py --baseline benchmark_baseline.json --tolerance 0.15
+
+Reports p50/p95/p99 per stage, time to report and throughput at each concurrency level, and
+exits non-zero when any percentile regresses past the tolerance against the stored baseline.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+from agents import set_tracing_disabled
+from openai.types.responses import ResponseTextDeltaEvent
+
+from planner_agent import WebSearchItem, WebSearchPlan
+from researcher_agent import ReportData
+from research_manager import ResearchManager
+from scheduler import ResearchScheduler
+
+STAGES = {
+    "PlannerAgent": "plan",
+    "FollowUpPlannerAgent": "plan",
+    "Search agent": "search",
+    "DigestAgent": "digest",
+    "WriteAgent": "write",
+    "notification_agent": "notify",
+}
+
+DEFAULT_LATENCIES = {
+    "plan": (1.5, 0.3),
+    "search": (4.0, 0.5),
+    "digest": (3.0, 0.3),
+    "write": (20.0, 0.25),
+    "notify": (3.0, 0.3),
+}
+
+
+class LatencyModel:
+    """ Log-normal latency per stage, given as (median seconds, sigma), scaled down by time_scale """
+
+    def __init__(self, latencies: dict[str, tuple[float, float]], time_scale: float, seed: int):
+        self.latencies = latencies
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+
+    def sample(self, stage: str) -> float:
+        median, sigma = self.latencies[stage]
+        return self.random.lognormvariate(math.log(median), sigma) * self.time_scale
+
+
+class FakeRunner:
+    """ Stands in for agents.Runner: sleeps for a sampled latency and returns canned output """
+
+    def __init__(self, latency: LatencyModel, searches: int, report_words: int):
+        self.latency = latency
+        self.searches = searches
+        self.report_words = report_words
+        self.timings: dict[str, list[float]] = defaultdict(list)
+
+    def _result(self, output):
+        return SimpleNamespace(final_output=output, final_output_as=lambda cls, raise_if_incorrect_type=False: output)
+
+    async def run(self, agent, input, **kwargs):
+        stage = STAGES[agent.name]
+        start = time.perf_counter()
+        await asyncio.sleep(self.latency.sample(stage))
+        if stage == "plan":
+            if agent.name == "FollowUpPlannerAgent":
+                output = WebSearchPlan(searches=[])
+            else:
+                topic = random.getrandbits(32)
+                output = WebSearchPlan(searches=[
+                    WebSearchItem(reason="benchmark", query=f"topic{topic} aspect{i}") for i in range(self.searches)
+                ])
+        elif stage == "write":
+            output = self._report()
+        else:
+            output = f"{stage} output for {input[:40]} " + "lorem ipsum " * 100
+        self.timings[stage].append(time.perf_counter() - start)
+        return self._result(output)
+
+    def run_streamed(self, agent, input, **kwargs):
+        runner = self
+        report = self._report()
+
+        class Streamed:
+            final_output = report
+
+            def final_output_as(self, cls, raise_if_incorrect_type=False):
+                return report
+
+            async def stream_events(self):
+                start = time.perf_counter()
+                raw = report.model_dump_json()
+                total = runner.latency.sample("write")
+                chunks = max(1, len(raw) // 200)
+                for i in range(chunks):
+                    await asyncio.sleep(total / chunks)
+                    delta = raw[i * len(raw) // chunks:(i + 1) * len(raw) // chunks]
+                    yield SimpleNamespace(type="raw_response_event",
+                                          data=ResponseTextDeltaEvent.model_construct(delta=delta, type="response.output_text.delta"))
+                runner.timings["write"].append(time.perf_counter() - start)
+
+        return Streamed()
+
+    def _report(self) -> ReportData:
+        return ReportData(
+            short_summary="Benchmark report.",
+            markdown_report="# Benchmark report\n\n" + "word " * self.report_words,
+            follow_up_questions=["What next?"],
+        )
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {}
+    if len(samples) == 1:
+        return {"p50": samples[0], "p95": samples[0], "p99": samples[0]}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": statistics.median(samples), "p95": cuts[94], "p99": cuts[98]}
+
+
+async def run_level(args, concurrency: int, seed: int) -> dict:
+    runner = FakeRunner(LatencyModel(args.latencies, args.time_scale, seed), args.searches, args.report_words)
+    scheduler = ResearchScheduler(max_concurrency=args.max_concurrency, rate=args.rate, burst=args.burst) if args.scheduler else None
+    time_to_report: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            manager = ResearchManager(
+                runner=runner, scheduler=scheduler, session=f"session-{i}",
+                stream_report=args.stream, adaptive=args.adaptive,
+                search_timeout=args.search_timeout * args.time_scale, hedge_delay=args.hedge_delay * args.time_scale,
+            )
+            start = time.perf_counter()
+            async for _ in manager.run(f"benchmark query {i}"):
+                pass
+            time_to_report.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.queries)))
+    elapsed = time.perf_counter() - start
+    # Notifications run in the background; let them finish so their latency is recorded
+    await asyncio.gather(*list(ResearchManager._background_tasks), return_exceptions=True)
+
+    scale = 1 / args.time_scale  # report in unscaled seconds
+    stages = {stage: {k: v * scale for k, v in percentiles(samples).items()} for stage, samples in runner.timings.items()}
+    return {
+        "stages": stages,
+        "time_to_report": {k: v * scale for k, v in percentiles(time_to_report).items()},
+        "throughput_qpm": args.queries / (elapsed * scale) * 60,
+        "scheduler": scheduler.metrics() if scheduler else None,
+    }
+
+
+def print_level(concurrency: int, result: dict):
+    print(f"\n== concurrency {concurrency}: {result['throughput_qpm']:.2f} queries/min")
+    print(f"{'stage':<16}{'p50':>10}{'p95':>10}{'p99':>10}")
+    rows = dict(sorted(result["stages"].items()))
+    rows["time_to_report"] = result["time_to_report"]
+    for stage, p in rows.items():
+        print(f"{stage:<16}{p['p50']:>10.2f}{p['p95']:>10.2f}{p['p99']:>10.2f}")
+    if result["scheduler"]:
+        m = result["scheduler"]
+        print(f"scheduler: {m['calls']} calls, wait p50 {m['wait_p50'] * 1000:.1f}ms p95 {m['wait_p95'] * 1000:.1f}ms")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """ Lists every percentile or throughput figure that got worse than baseline by more than tolerance """
+    regressions = []
+    for level, result in results.items():
+        base = baseline.get(level)
+        if base is None:
+            continue
+        rows = {**result["stages"], "time_to_report": result["time_to_report"]}
+        base_rows = {**base["stages"], "time_to_report": base["time_to_report"]}
+        for stage, p in rows.items():
+            for key, value in p.items():
+                reference = base_rows.get(stage, {}).get(key)
+                if reference and value > reference * (1 + tolerance):
+                    regressions.append(f"concurrency {level} {stage} {key}: {value:.2f}s vs {reference:.2f}s baseline")
+        if result["throughput_qpm"] < base["throughput_qpm"] * (1 - tolerance):
+            regressions.append(f"concurrency {level} throughput: {result['throughput_qpm']:.2f} vs {base['throughput_qpm']:.2f} queries/min baseline")
+    return regressions
+
+
+def parse_latency(value: str) -> tuple[float, float]:
+    median, _, sigma = value.partition(":")
+    return float(median), float(sigma or 0.3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma separated numbers of concurrent queries")
+    parser.add_argument("--queries", type=int, default=16, help="Queries per concurrency level")
+    parser.add_argument("--searches", type=int, default=3, help="Searches the fake planner returns")
+    parser.add_argument("--report-words", type=int, default=1200)
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Multiplier applied to every sampled latency")
+    for stage, (median, sigma) in DEFAULT_LATENCIES.items():
+        parser.add_argument(f"--{stage}-latency", type=parse_latency, default=(median, sigma), metavar="MEDIAN[:SIGMA]")
+    parser.add_argument("--search-timeout", type=float, default=60.0)
+    parser.add_argument("--hedge-delay", type=float, default=20.0)
+    parser.add_argument("--no-stream", dest="stream", action="store_false")
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--scheduler", action="store_true", help="Route calls through a shared ResearchScheduler")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=400.0, help="Scheduler calls/sec, in scaled time")
+    parser.add_argument("--burst", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="Compare against this baseline file")
+    parser.add_argument("--save-baseline", help="Write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression, 0.1 = 10%%")
+    args = parser.parse_args()
+    args.latencies = {stage: getattr(args, f"{stage}_latency") for stage in DEFAULT_LATENCIES}
+
+    set_tracing_disabled(True)
+    random.seed(args.seed)
+    results = {}
+    for level in (int(c) for c in args.concurrency.split(",")):
+        results[str(level)] = asyncio.run(run_level(args, level, args.seed + level))
+        print_level(level, results[str(level)])
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
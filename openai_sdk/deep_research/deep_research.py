@@ -1,11 +1,25 @@
+import os
 import gradio as gr
 from dotenv import load_dotenv
 from research_manager import ResearchManager
+from search_cache import SearchCache
+from scheduler import ResearchScheduler
+from metrics import MetricsRegistry
 
 load_dotenv(override=True)
 
-async def run(query: str):
-    async for chunk in ResearchManager().run(query): # This code is used to keep yieliding or showing progress
+# Shared by every session so repeat topics reuse recent search summaries
+search_cache = SearchCache()
+# One scheduler for every session so concurrent researches share the provider rate limit fairly
+scheduler = ResearchScheduler()
+# Per-stage timing, token and cost numbers for every run; set RESEARCH_METRICS_PORT to expose them over HTTP
+metrics = MetricsRegistry()
+if os.getenv("RESEARCH_METRICS_PORT"):
+    metrics.serve(int(os.environ["RESEARCH_METRICS_PORT"]))
+
+async def run(query: str, request: gr.Request):
+    manager = ResearchManager(cache=search_cache, scheduler=scheduler, session=request.session_hash or "default", metrics=metrics)
+    async for chunk in manager.run(query): # This code is used to keep yieliding or showing progress
         yield chunk
 
 with gr.Blocks(theme=gr.themes.Default(primary_hue="sky")) as ui:
@@ -0,0 +1,221 @@
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# USD per million tokens: (input, cached input, output)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+# USD per hosted web search call, which is billed on top of the tokens
+WEB_SEARCH_CALL_PRICE = 0.025
+
+DURATION_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+
+@dataclass
+class StageRecord:
+    """ Timing, token usage and cost of one agent call """
+    stage: str
+    agent: str
+    model: str
+    started: float = field(default_factory=time.time)
+    queued: float = 0.0  # seconds spent waiting for a scheduler slot
+    duration: float = 0.0  # seconds spent in the call itself
+    outcome: str = "error"  # ok, error or cancelled
+    requests: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    web_searches: int = 0
+    cost: float = 0.0
+
+    def add_usage(self, result):
+        """ Reads usage off a RunResult or RunResultStreaming; results without usage count as zero """
+        usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+        if usage is not None:
+            self.requests += usage.requests
+            self.input_tokens += usage.input_tokens
+            self.cached_tokens += getattr(usage.input_tokens_details, "cached_tokens", 0) or 0
+            self.output_tokens += usage.output_tokens
+        for item in getattr(result, "new_items", None) or []:
+            if getattr(getattr(item, "raw_item", None), "type", None) == "web_search_call":
+                self.web_searches += 1
+        self.cost = estimate_cost(self.model, self.input_tokens, self.cached_tokens, self.output_tokens, self.web_searches)
+
+
+@dataclass
+class RunRecord:
+    """ Every agent call made for one research query """
+    trace_id: str
+    query: str
+    session: str = "default"
+    started: float = field(default_factory=time.time)
+    time_to_report: float | None = None  # seconds until the report was ready
+    duration: float | None = None  # seconds until everything, including the notification, finished
+    stages: list[StageRecord] = field(default_factory=list)
+
+    @property
+    def cost(self) -> float:
+        return sum(stage.cost for stage in self.stages)
+
+    @property
+    def tokens(self) -> int:
+        return sum(stage.input_tokens + stage.output_tokens for stage in self.stages)
+
+    def summary(self) -> dict:
+        """ Wall time, call count, tokens and cost per stage """
+        stages = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0})
+        for stage in self.stages:
+            row = stages[stage.stage]
+            row["calls"] += 1
+            row["seconds"] += stage.duration
+            row["input_tokens"] += stage.input_tokens
+            row["output_tokens"] += stage.output_tokens
+            row["cost"] += stage.cost
+        return dict(stages)
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "cost": self.cost, "tokens": self.tokens}
+
+
+def estimate_cost(model: str, input_tokens: int, cached_tokens: int, output_tokens: int, web_searches: int = 0) -> float:
+    """ USD cost of a call; models missing from MODEL_PRICES only count their web searches """
+    input_price, cached_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0, 0.0))
+    tokens = (input_tokens - cached_tokens) * input_price + cached_tokens * cached_price + output_tokens * output_price
+    return tokens / 1_000_000 + web_searches * WEB_SEARCH_CALL_PRICE
+
+
+class Histogram:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """ In-process aggregate of StageRecords and RunRecords, renderable as OpenMetrics text.
+
+    Stage observations are counted as each call finishes, and the most recent runs are kept whole
+    so a single slow or expensive query can be inspected afterwards. Safe to read from another
+    thread, e.g. the endpoint started by serve(). """
+
+    def __init__(self, keep_runs: int = 100):
+        self._lock = threading.Lock()
+        self.runs: deque[RunRecord] = deque(maxlen=keep_runs)
+        self._calls: dict[tuple[str, str], int] = defaultdict(int)
+        self._durations: dict[str, Histogram] = defaultdict(Histogram)
+        self._queued: dict[str, float] = defaultdict(float)
+        self._tokens: dict[tuple[str, str], int] = defaultdict(int)
+        self._web_searches: dict[str, int] = defaultdict(int)
+        self._cost: dict[str, float] = defaultdict(float)
+        self._runs_total = 0
+        self._time_to_report = Histogram()
+        self._run_durations = Histogram()
+
+    def observe_stage(self, record: StageRecord):
+        with self._lock:
+            self._calls[record.stage, record.outcome] += 1
+            self._durations[record.stage].observe(record.duration)
+            self._queued[record.stage] += record.queued
+            self._tokens[record.stage, "input"] += record.input_tokens - record.cached_tokens
+            self._tokens[record.stage, "cached"] += record.cached_tokens
+            self._tokens[record.stage, "output"] += record.output_tokens
+            self._web_searches[record.stage] += record.web_searches
+            self._cost[record.stage] += record.cost
+
+    def observe_run(self, run: RunRecord):
+        with self._lock:
+            self._runs_total += 1
+            self.runs.append(run)
+            if run.time_to_report is not None:
+                self._time_to_report.observe(run.time_to_report)
+            if run.duration is not None:
+                self._run_durations.observe(run.duration)
+
+    def recent_runs(self) -> list[dict]:
+        with self._lock:
+            return [run.to_dict() for run in self.runs]
+
+    def render(self) -> str:
+        """ OpenMetrics text, which Prometheus scrapes natively """
+        lines = []
+
+        def histogram(name: str, help: str, series: dict[str, Histogram], label: str | None = None):
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} histogram"])
+            for key, h in series.items():
+                extra = {label: key} if label else {}
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f"{name}_bucket{_labels(**extra, le=float(bound))} {count}")
+                lines.append(f"{name}_bucket{_labels(**extra, le='+Inf')} {h.count}")
+                suffix = _labels(**extra) if extra else ""
+                lines.append(f"{name}_sum{suffix} {h.sum}")
+                lines.append(f"{name}_count{suffix} {h.count}")
+
+        def counter(name: str, help: str, series: dict, labels: tuple[str, ...]):
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} counter"])
+            for key, value in series.items():
+                key = key if isinstance(key, tuple) else (key,)
+                lines.append(f"{name}_total{_labels(**dict(zip(labels, key)))} {value}")
+
+        with self._lock:
+            counter("research_agent_calls", "Agent calls by stage and outcome", self._calls, ("stage", "outcome"))
+            histogram("research_agent_call_seconds", "Agent call wall time, excluding scheduler wait", self._durations, "stage")
+            counter("research_agent_queued_seconds", "Time agent calls spent waiting for a scheduler slot", self._queued, ("stage",))
+            counter("research_agent_tokens", "Tokens by stage and type (input excludes cached)", self._tokens, ("stage", "type"))
+            counter("research_agent_web_searches", "Hosted web search calls", self._web_searches, ("stage",))
+            counter("research_agent_cost_usd", "Estimated spend in USD", self._cost, ("stage",))
+            lines.extend(["# HELP research_runs Research queries completed", "# TYPE research_runs counter",
+                          f"research_runs_total {self._runs_total}"])
+            histogram("research_time_to_report_seconds", "Seconds from query to finished report", {"": self._time_to_report})
+            histogram("research_run_seconds", "Seconds from query until the notification finished", {"": self._run_durations})
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """ Serves /metrics (OpenMetrics text) and /runs (recent RunRecords as JSON) from a daemon thread """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.render().encode(), "application/openmetrics-text; version=1.0.0; charset=utf-8"
+                elif self.path == "/runs":
+                    body, content_type = json.dumps(registry.recent_runs()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -1,24 +1,12 @@
 
 
 # Setup Push notification
-import os
 from agents import Agent, function_tool
-import requests
+from notifier import push
 
-
-def push(text):
-    requests.post(
-        "https://api.pushover.net/1/messages.json",
-        data={
-            "token": os.getenv("PUSHOVER_TOKEN"),
-            "user": os.getenv("PUSHOVER_USER"),
-            "message": text,
-        }
-    )
-    
 @function_tool
 def send_push_notification(message : str):
-    push(message)
+    push(message)  # queued, delivery and retries happen in the background
     return {"status": "success"}
 
 # Agent to send the HTML formatted email
@@ -23,4 +23,27 @@ planner_agent = Agent(
     instructions=instructions,
     model="gpt-4o-mini",
     output_type=WebSearchPlan
-)
\ No newline at end of file
+)
+
+# Adaptive planning: the planner picks how many searches a query deserves within these bounds
+min_searches = 1
+max_searches = 6
+
+def adaptive_planner_agent(min_searches: int = min_searches, max_searches: int = max_searches) -> Agent:
+    """ Planner that sizes the search fan-out to the complexity of the query """
+    return planner_agent.clone(
+        instructions=f"You are a helpful research assistant. Given a query, come up with a set of web searches \
+    to perform to best answer the query. First judge how complex the query is: a narrow factual question needs as few as \
+    {min_searches}, a broad, multi-part or contested topic needs up to {max_searches}. Output between \
+    {min_searches} and {max_searches} terms to query for, and no more than the query actually needs."
+    )
+
+def follow_up_planner_agent(max_new_searches: int) -> Agent:
+    """ Planner that reviews the results so far and asks for more searches only if coverage is insufficient """
+    return planner_agent.clone(
+        name="FollowUpPlannerAgent",
+        instructions=f"You are a helpful research assistant reviewing research in progress. You will be given a query, \
+    the searches already performed and a summary of each result. Decide whether the results cover the query well \
+    enough to write a thorough report. If they do, return an empty list of searches. If not, return only the \
+    additional searches needed to fill the gaps, at most {max_new_searches}, and never repeat a search already performed."
+    )
@@ -1,62 +1,403 @@
 
 import asyncio
+import contextlib
+import contextvars
+import re
+import statistics
+import time
+from collections import deque
 from agents import Runner, gen_trace_id, trace
+from openai.types.responses import ResponseTextDeltaEvent
 
-from planner_agent import WebSearchItem, WebSearchPlan, planner_agent
+from planner_agent import WebSearchItem, WebSearchPlan, planner_agent, adaptive_planner_agent, follow_up_planner_agent
 from assistant_agent import search_agent
-from researcher_agent import writer_agent, ReportData
+from researcher_agent import writer_agent, digest_agent, ReportData
 from notifications_agent import notification_agent
+from search_cache import SearchCache, dedupe_searches
+from scheduler import ResearchScheduler
+from synthesis import estimate_tokens, format_results, plan_chunks
+from metrics import MetricsRegistry, RunRecord, StageRecord
+
+JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+class JsonStringFieldStream:
+    """ Incrementally decodes one string field out of a JSON object that is still being generated,
+    so the text can be shown before the whole structured output has arrived """
+
+    def __init__(self, field: str):
+        self.pattern = re.compile(re.escape(f'"{field}"') + r'\s*:\s*"')
+        self.buffer = ""
+        self.pos = None
+        self.done = False
+
+    def feed(self, delta: str) -> str:
+        """ Adds the next chunk of raw JSON and returns any newly decoded text of the field """
+        self.buffer += delta
+        if self.pos is None:
+            match = self.pattern.search(self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+        out = []
+        buffer = self.buffer
+        while not self.done and self.pos < len(buffer):
+            char = buffer[self.pos]
+            if char == '"':
+                self.done = True
+            elif char != "\\":
+                out.append(char)
+                self.pos += 1
+            elif self.pos + 1 >= len(buffer):
+                break  # escape split across chunks, wait for the rest
+            elif buffer[self.pos + 1] != "u":
+                out.append(JSON_ESCAPES.get(buffer[self.pos + 1], buffer[self.pos + 1]))
+                self.pos += 2
+            else:
+                if self.pos + 6 > len(buffer):
+                    break
+                code = int(buffer[self.pos + 2:self.pos + 6], 16)
+                if 0xD800 <= code < 0xDC00:
+                    # High surrogate, the low half follows as another \\uXXXX escape
+                    if self.pos + 12 > len(buffer):
+                        break
+                    low = int(buffer[self.pos + 8:self.pos + 12], 16)
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    self.pos += 12
+                else:
+                    out.append(chr(code))
+                    self.pos += 6
+        return "".join(out)
 
 class ResearchManager:
-    
+    # Notifications outlive the manager that started them, so keep them referenced here until they finish
+    _background_tasks: set[asyncio.Task] = set()
+    # Recent search latencies across all runs, used to decide when a search counts as a straggler
+    _search_latencies: deque[float] = deque(maxlen=200)
+
+    def __init__(self, pipelined: bool = True, notification_timeout: float = 120.0,
+                 search_timeout: float = 60.0, hedge_percentile: float = 0.9, hedge_delay: float = 20.0,
+                 cache: SearchCache | None = None, scheduler: ResearchScheduler | None = None, session: str = "default",
+                 adaptive: bool = False, min_searches: int = 1, max_searches: int = 6, max_rounds: int = 2,
+                 stream_report: bool = True, report_token_budget: int = 8000, chunk_token_budget: int = 3000,
+                 runner=Runner, metrics: MetricsRegistry | None = None):
+        # pipelined: stream search progress as each search lands and yield the report before the
+        # notification, which then runs as a background task bounded by notification_timeout
+        self.pipelined = pipelined
+        self.notification_timeout = notification_timeout
+        # Each search gets search_timeout seconds in total. If it is still running once it is slower than
+        # hedge_percentile of recent searches (hedge_delay until there is enough history), a duplicate is
+        # started and whichever finishes first wins. Set hedge_percentile to None to disable hedging.
+        if hedge_percentile is not None and not 0 < hedge_percentile < 1:
+            raise ValueError(f"hedge_percentile must be between 0 and 1 exclusive, got {hedge_percentile}")
+        self.search_timeout = search_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.timed_out: list[WebSearchItem] = []
+        self.failed: list[WebSearchItem] = []
+        self.hedged: list[WebSearchItem] = []
+        # Optional cache of search summaries shared across runs
+        self.cache = cache
+        # Optional process-wide scheduler that rate limits and fairly queues agent calls across sessions
+        self.scheduler = scheduler
+        self.session = session
+        # adaptive: let the planner size the fan-out between min_searches and max_searches, then run up to
+        # max_rounds follow-up rounds that only add searches when coverage of the query looks insufficient
+        self.adaptive = adaptive
+        self.min_searches = min_searches
+        self.max_searches = max_searches
+        self.max_rounds = max_rounds
+        # stream_report: yield the markdown report progressively while the writer generates it
+        self.stream_report = stream_report
+        # Search results beyond report_token_budget are condensed map-reduce style: chunks of up to
+        # chunk_token_budget are digested in parallel before the writer sees them
+        self.report_token_budget = report_token_budget
+        self.chunk_token_budget = chunk_token_budget
+        # Anything with Runner's run/run_streamed interface, so the pipeline can be driven by a fake backend
+        self.runner = runner
+        # Timing, tokens and cost of every agent call in the latest run, also fed to metrics when given
+        self.metrics = metrics
+        self.record: RunRecord | None = None
+
     async def run(self,query: str):
         trace_id = gen_trace_id()
+        self.record = record = RunRecord(trace_id=trace_id, query=query, session=self.session)
+        start = time.monotonic()
         with trace("Research trace", trace_id=trace_id):
             print("Starting research...")
             search_plan = await self.plan_searches(query)
             yield "Searches planned, starting to search..."
-            search_results = await self.perform_searches(search_plan)
+            self.timed_out, self.failed, self.hedged = [], [], []
+            searched = list(search_plan.searches)
+            search_results = []
+            async for progress in self._search_round(search_plan, search_results, len(searched)):
+                yield progress
+            for _ in range(self.max_rounds if self.adaptive else 0):
+                remaining = self.max_searches - len(searched)
+                if remaining <= 0:
+                    break
+                follow_up = await self.plan_follow_up(query, searched, search_results, remaining)
+                if not follow_up.searches:
+                    yield "Coverage looks sufficient..."
+                    break
+                yield f"Coverage insufficient, running {len(follow_up.searches)} more searches..."
+                searched += follow_up.searches
+                async for progress in self._search_round(follow_up, search_results, len(searched)):
+                    yield progress
+            if self.timed_out or self.failed:
+                yield f"{len(self.timed_out)} searches timed out and {len(self.failed)} failed, continuing with {len(search_results)} results..."
             yield "Searches complete, writing report..."
-            report = await self.write_report(query, search_results)
-            yield "Report written, sending email..."
-            await self.send_notification(report)
-            yield "Email sent, research complete"
-            yield report.markdown_report
-        
+            if self.stream_report:
+                async for update in self.write_report_streamed(query, search_results):
+                    if isinstance(update, ReportData):
+                        report = update
+                    else:
+                        yield update
+            else:
+                report = await self.write_report(query, search_results)
+            record.time_to_report = time.monotonic() - start
+            if not self.pipelined:
+                yield "Report written, sending email..."
+                await self.send_notification(report)
+                yield "Email sent, research complete"
+                self._finish(record, start)
+        if self.pipelined:
+            self.send_notification_in_background(report).add_done_callback(lambda _: self._finish(record, start))
+        yield report.markdown_report
+
+    def _finish(self, record: RunRecord, start: float):
+        record.duration = time.monotonic() - start
+        if self.metrics is not None:
+            self.metrics.observe_run(record)
+
+    @contextlib.asynccontextmanager
+    async def _stage(self, stage: str, agent, on_start=None):
+        """ Holds a scheduler slot, when there is a scheduler, and records the timing of the agent call
+        made inside the block. The caller passes its result to record.add_usage for tokens and cost.
+        on_start, if given, is called once the slot is granted """
+        record = StageRecord(stage=stage, agent=agent.name, model=str(agent.model))
+        run = self.record
+        start = time.monotonic()
+        called = start
+        try:
+            async with (self.scheduler.slot(self.session) if self.scheduler is not None else contextlib.nullcontext()):
+                called = time.monotonic()
+                if on_start is not None:
+                    on_start()
+                yield record
+            record.outcome = "ok"
+        except asyncio.CancelledError:
+            record.outcome = "cancelled"
+            raise
+        finally:
+            record.queued = called - start
+            record.duration = time.monotonic() - called
+            if run is not None:
+                run.stages.append(record)
+            if self.metrics is not None:
+                self.metrics.observe_stage(record)
+
+    async def _run(self, agent, input, stage: str, on_start=None):
+        """ Runs an agent, through the shared scheduler when there is one, and records the call under stage """
+        async with self._stage(stage, agent, on_start) as record:
+            result = await self.runner.run(agent, input)
+            record.add_usage(result)
+        return result
+
+    async def _search_round(self, search_plan: WebSearchPlan, search_results: list[str], total: int):
+        """ Runs one round of searches, appending to search_results and yielding progress """
+        if self.pipelined:
+            async for result in self.stream_searches(search_plan):
+                search_results.append(result)
+                yield f"Searches complete: {len(search_results)}/{total}..."
+        else:
+            search_results.extend(await self.perform_searches(search_plan))
+
     # Create Plan
     async def plan_searches(self, query: str) -> WebSearchPlan:
         """ Uses the planner agent to plan which searched to run for the query """
         print("Planning searches...")
-        result = await Runner.run(planner_agent, f"Query: {query}")
-        print(f"Will perform {len(result.final_output.searches)} searches.")
-        return result.final_output
+        agent = adaptive_planner_agent(self.min_searches, self.max_searches) if self.adaptive else planner_agent
+        result = await self._run(agent, f"Query: {query}", "plan")
+        search_plan = result.final_output
+        searches = dedupe_searches(search_plan.searches)
+        if self.adaptive:
+            searches = searches[:self.max_searches]
+        if len(searches) < len(search_plan.searches):
+            print(f"Dropped {len(search_plan.searches) - len(searches)} duplicate or excess searches.")
+            search_plan = WebSearchPlan(searches=searches)
+        print(f"Will perform {len(search_plan.searches)} searches.")
+        return search_plan
+
+    async def plan_follow_up(self, query: str, searched: list[WebSearchItem], search_results: list[str], limit: int) -> WebSearchPlan:
+        """ Asks the follow-up planner for more searches; an empty plan means coverage is sufficient """
+        print("Checking coverage...")
+        performed = "\n".join(f"- {item.query}" for item in searched)
+        summaries = "\n\n".join(search_results)
+        input = f"Query: {query}\n\nSearches performed:\n{performed}\n\nResults:\n{summaries}"
+        result = await self._run(follow_up_planner_agent(limit), input, "follow_up")
+        # Keep only searches that are new relative to everything already run, within the remaining budget
+        combined = dedupe_searches(searched + result.final_output.searches)
+        new = [item for item in combined if not any(item is done for done in searched)][:limit]
+        print(f"Will perform {len(new)} follow-up searches.")
+        return WebSearchPlan(searches=new)
 
     # Perform Individual searches helper function
-    async def search(self, item: WebSearchItem) -> str | None:
+    async def search(self, item: WebSearchItem, on_start=None) -> str | None:
         """ Uses the search agent to perform a single search """
         input = f"Search term: {item.query}\nReason for searching: {item.reason}"
-        result = await Runner.run(search_agent, input)
+        result = await self._run(search_agent, input, "search", on_start)
         return str(result.final_output)
-        
+
+    def _hedge_after(self) -> float | None:
+        """ Seconds after which a still-running search gets a duplicate request """
+        if self.hedge_percentile is None:
+            return None
+        if len(self._search_latencies) >= 20:
+            # quantiles() returns the 99 cut points between percentiles 1 and 99
+            percentile = min(99, max(1, round(self.hedge_percentile * 100)))
+            cut = statistics.quantiles(self._search_latencies, n=100)[percentile - 1]
+        else:
+            cut = self.hedge_delay
+        return cut if cut < self.search_timeout else None
+
+    async def search_with_deadline(self, item: WebSearchItem) -> str | None:
+        """ Runs one search with a deadline and a hedged duplicate for stragglers.
+        Returns None, and records the item in timed_out or failed, if no attempt succeeded in time """
+        if self.cache is not None:
+            cached = self.cache.get(item.query)
+            if cached is not None:
+                return cached
+        hedge_after = self._hedge_after()
+        started = asyncio.Event()
+        attempts = {asyncio.create_task(self.search(item, started.set))}
+        launched = 1
+        running = asyncio.create_task(started.wait())
+        try:
+            # Time spent queued for a scheduler slot does not count: hedging it would only add paid
+            # searches under the load the scheduler is smoothing, so the clock starts once the first
+            # attempt is running, or has already finished
+            await asyncio.wait(attempts | {running}, return_when=asyncio.FIRST_COMPLETED)
+            start = time.monotonic()
+            deadline = start + self.search_timeout
+            while True:
+                now = time.monotonic()
+                if not attempts:
+                    # The first attempt failed outright; spend the hedge on a retry
+                    if launched > 1 or hedge_after is None:
+                        self.failed.append(item)
+                        return None
+                    attempts.add(asyncio.create_task(self.search(item)))
+                    launched += 1
+                wake = deadline if launched > 1 or hedge_after is None else min(deadline, start + hedge_after)
+                done, attempts = await asyncio.wait(attempts, timeout=max(0.0, wake - now), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._search_latencies.append(time.monotonic() - start)
+                        if self.cache is not None:
+                            self.cache.put(item.query, task.result())
+                        return task.result()
+                    print(f"Search for {item.query!r} failed: {task.exception()}")
+                if time.monotonic() >= deadline:
+                    self._search_latencies.append(self.search_timeout)
+                    self.timed_out.append(item)
+                    print(f"Search for {item.query!r} timed out after {self.search_timeout}s")
+                    return None
+                if attempts and launched == 1 and hedge_after is not None and time.monotonic() - start >= hedge_after:
+                    self.hedged.append(item)
+                    attempts.add(asyncio.create_task(self.search(item)))
+                    launched += 1
+        finally:
+            running.cancel()
+            for task in attempts:
+                task.cancel()
+
     # perform searches in parallel
     async def perform_searches(self, search_plan: WebSearchPlan) -> list[str]:
-        """ Uses the search agent to perform the searches in the search plan """
+        """ Uses the search agent to perform the searches in the search plan.
+        Searches that time out or fail are left out of the results """
         print("Performing searches...")
-        tasks = [asyncio.create_task(self.search(item)) for item in search_plan.searches]
+        tasks = [asyncio.create_task(self.search_with_deadline(item)) for item in search_plan.searches]
         results = await asyncio.gather(*tasks)
         print("Finished searching")
-        return results
+        return [result for result in results if result is not None]
+
+    async def stream_searches(self, search_plan: WebSearchPlan):
+        """ Runs the searches in parallel and yields each successful result as soon as it finishes """
+        print("Performing searches...")
+        tasks = [asyncio.create_task(self.search_with_deadline(item)) for item in search_plan.searches]
+        try:
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                if result is not None:
+                    yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+        print("Finished searching")
+
+    async def digest(self, query: str, chunk: list[str]) -> str:
+        """ Uses the digest agent to condense one chunk of search results """
+        result = await self._run(digest_agent, f"Original Query: {query}\n\n{format_results(chunk)}", "digest")
+        return str(result.final_output)
+
+    async def writer_input(self, query: str, search_results: list[str], max_levels: int = 3) -> str:
+        """ Builds the writer prompt, condensing the results map-reduce style if they exceed the token budget """
+        for level in range(max_levels):
+            if estimate_tokens(format_results(search_results)) <= self.report_token_budget:
+                break
+            chunks = plan_chunks(search_results, self.chunk_token_budget)
+            if len(chunks) == len(search_results) and level > 0:
+                break  # digests are no longer shrinking, stop recursing
+            print(f"Condensing {len(search_results)} results into {len(chunks)} digests...")
+            search_results = await asyncio.gather(*(self.digest(query, chunk) for chunk in chunks))
+        return f"Original Query: {query}\n\nSummarized search results:\n\n{format_results(search_results)}"
 
     async def write_report(self, query: str, search_results: list[str]) -> ReportData:
         """ Uses the writer agent to write the report based on the query and search results """
         print("Thinking about the report...")
-        input = f"Original Query: {query}\nSummarized search results: {search_results}"
-        result = await Runner.run(writer_agent, input)
+        input = await self.writer_input(query, search_results)
+        result = await self._run(writer_agent, input, "write")
         print("Finished writing report")
         return result.final_output_as(ReportData)
 
+    async def write_report_streamed(self, query: str, search_results: list[str], interval: float = 0.1):
+        """ Like write_report, but yields the markdown report so far as the writer generates it,
+        at most every interval seconds, and finally yields the complete ReportData """
+        print("Thinking about the report...")
+        input = await self.writer_input(query, search_results)
+        markdown = JsonStringFieldStream("markdown_report")
+        text = ""
+        last = 0.0
+        async with self._stage("write", writer_agent) as record:
+            result = self.runner.run_streamed(writer_agent, input)
+            async for event in result.stream_events():
+                if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                    text += markdown.feed(event.data.delta)
+                    if text and time.monotonic() - last >= interval:
+                        last = time.monotonic()
+                        yield text
+            record.add_usage(result)
+        print("Finished writing report")
+        yield result.final_output_as(ReportData)
+
     async def send_notification(self, report: ReportData):
         """ Uses the notification agent to send a notification with the report """
-        result = await Runner.run(notification_agent, report.markdown_report)
+        result = await self._run(notification_agent, report.markdown_report, "notify")
         print("Notification sent")
-        return report
\ No newline at end of file
+        return report
+
+    def send_notification_in_background(self, report: ReportData) -> asyncio.Task:
+        """ Sends the notification without making the caller wait for it """
+        async def notify():
+            try:
+                await asyncio.wait_for(self.send_notification(report), self.notification_timeout)
+            except asyncio.TimeoutError:
+                print(f"Notification timed out after {self.notification_timeout}s")
+            except Exception as e:
+                print(f"Notification failed: {e}")
+
+        # Run outside the research trace, which has already been closed by the time this finishes
+        task = asyncio.create_task(notify(), context=contextvars.Context())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
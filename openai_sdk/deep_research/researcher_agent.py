@@ -21,4 +21,19 @@ writer_agent = Agent(
     instructions=instructions,
     model="gpt-4o-mini",
     output_type=ReportData,
-)
\ No newline at end of file
+)
+
+digest_instructions = (
+    "You are a research analyst condensing research for a senior researcher who will write a report. "
+    "You will be given the original query and a batch of search result summaries. "
+    "Merge them into one dense digest of at most 400 words: keep every concrete fact, figure, date, name "
+    "and source, note where results disagree, and drop repetition and anything irrelevant to the query. "
+    "Output only the digest."
+)
+
+# Map step of map-reduce synthesis: condenses one chunk of search results
+digest_agent = Agent(
+    name="DigestAgent",
+    instructions=digest_instructions,
+    model="gpt-4o-mini",
+)
@@ -0,0 +1,109 @@
+
+import asyncio
+import statistics
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+import openai
+from agents import Runner
+
+
+class ResearchScheduler:
+    """ Shares one budget of agent calls between every research session in the process.
+
+    Each Runner.run call first waits for a slot: at most max_concurrency calls are in flight,
+    and a token bucket (rate calls/sec, bursts up to burst) paces how fast new ones start.
+    Waiting calls are queued per session and served round-robin, so one heavy research run
+    cannot starve the others. """
+
+    def __init__(self, max_concurrency: int = 8, rate: float = 4.0, burst: int = 8):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._queues: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self._in_flight = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._waits: deque[float] = deque(maxlen=1000)
+        self._calls = 0
+        self._rate_limited = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _dispatch(self):
+        """ Grants slots to queued calls, round-robin across sessions, while capacity and tokens allow """
+        while self._in_flight < self.max_concurrency and self._queues:
+            self._refill()
+            if self._tokens < 1:
+                if self._timer is None:
+                    delay = (1 - self._tokens) / self.rate
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+                return
+            session, queue = self._queues.popitem(last=False)
+            waiter = queue.popleft()
+            if queue:
+                self._queues[session] = queue  # back of the line behind the other sessions
+            if waiter.done():
+                continue  # caller gave up while queued
+            self._tokens -= 1
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    async def acquire(self, session: str = "default"):
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(session, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        self._waits.append(time.monotonic() - start)
+
+    def release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, session: str = "default"):
+        """ Holds one scheduler slot for the duration of the block, e.g. around a streamed run """
+        await self.acquire(session)
+        self._calls += 1
+        try:
+            yield
+        except openai.RateLimitError:
+            # The provider is already pushing back, so empty the bucket to slow everyone down
+            self._rate_limited += 1
+            self._tokens = min(self._tokens, 0.0)
+            raise
+        finally:
+            self.release()
+
+    async def run(self, agent, input, session: str = "default", **kwargs):
+        """ Runner.run behind the shared concurrency cap, rate limit and fair queue """
+        async with self.slot(session):
+            return await Runner.run(agent, input, **kwargs)
+
+    def metrics(self) -> dict:
+        waits = list(self._waits)
+        return {
+            "queue_depth": sum(len(q) for q in self._queues.values()),
+            "queued_sessions": len(self._queues),
+            "in_flight": self._in_flight,
+            "calls": self._calls,
+            "rate_limited": self._rate_limited,
+            "wait_p50": statistics.median(waits) if waits else 0.0,
+            "wait_p95": statistics.quantiles(waits, n=20)[-1] if len(waits) >= 2 else (waits[0] if waits else 0.0),
+            "wait_max": max(waits, default=0.0),
+        }
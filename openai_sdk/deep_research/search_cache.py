@@ -0,0 +1,114 @@
+
+import re
+import sqlite3
+import threading
+import time
+
+from planner_agent import WebSearchItem
+
+# Interrogatives ("why" vs "how") and recency words ("latest") change what a search is asking for,
+# so they are kept as content words
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "with",
+}
+
+
+def query_tokens(query: str) -> frozenset[str]:
+    """ Reduces a search query to its content words, so reworded or reordered queries match """
+    tokens = set()
+    for word in re.findall(r"[a-z0-9]+", query.lower()):
+        if word in STOPWORDS:
+            continue
+        # Crude plural folding, enough for "agents"/"agent" or "frameworks"/"framework"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.add(word)
+    return frozenset(tokens)
+
+
+def query_key(query: str) -> str:
+    return " ".join(sorted(query_tokens(query)))
+
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    """ Jaccard similarity of two token sets """
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    return len(a & b) / len(a | b)
+
+
+def dedupe_searches(searches: list[WebSearchItem], threshold: float = 0.8) -> list[WebSearchItem]:
+    """ Drops searches that are the same as, or near duplicates of, an earlier one in the plan """
+    kept: list[tuple[frozenset[str], WebSearchItem]] = []
+    for item in searches:
+        tokens = query_tokens(item.query)
+        if any(similarity(tokens, other) >= threshold for other, _ in kept):
+            continue
+        kept.append((tokens, item))
+    return [item for _, item in kept]
+
+
+class SearchCache:
+    """ Persistent cache of search summaries keyed by normalized query, with TTL expiry.
+    A lookup that misses exactly falls back to the most similar recent query above the threshold. """
+
+    def __init__(self, path: str = "search_cache.db", ttl: float = 24 * 3600, threshold: float = 0.8):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS searches (key TEXT PRIMARY KEY, query TEXT, summary TEXT, created REAL)"
+        )
+        # Token sets of every live entry, for near-duplicate lookups without scanning the table
+        self._index: dict[str, tuple[frozenset[str], float]] = {
+            key: (frozenset(key.split()), created)
+            for key, created in self._conn.execute("SELECT key, created FROM searches")
+        }
+        self.evict_expired()
+
+    def _match(self, query: str) -> str | None:
+        key = query_key(query)
+        now = time.time()
+        if key in self._index and now - self._index[key][1] <= self.ttl:
+            return key
+        tokens = frozenset(key.split())
+        best, best_score = None, self.threshold
+        for other, (other_tokens, created) in self._index.items():
+            if now - created > self.ttl:
+                continue
+            score = similarity(tokens, other_tokens)
+            if score >= best_score:
+                best, best_score = other, score
+        return best
+
+    def get(self, query: str) -> str | None:
+        with self._lock:
+            key = self._match(query)
+            row = self._conn.execute("SELECT summary FROM searches WHERE key = ?", (key,)).fetchone() if key else None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, query: str, summary: str):
+        key = query_key(query)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches (key, query, summary, created) VALUES (?, ?, ?, ?)",
+                (key, query, summary, now),
+            )
+            self._index[key] = (frozenset(key.split()), now)
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            cutoff = time.time() - self.ttl
+            removed = self._conn.execute("DELETE FROM searches WHERE created < ?", (cutoff,)).rowcount
+            self._index = {k: v for k, v in self._index.items() if v[1] >= cutoff}
+            return removed
@@ -0,0 +1,31 @@
+
+# Rough token accounting for planning how search results are fed to the writer.
+# About four characters per token is close enough for English prose to size chunks.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_results(search_results: list[str]) -> str:
+    """ Lays search summaries out as numbered sections instead of a python list repr """
+    return "\n\n".join(f"### Result {i}\n{result.strip()}" for i, result in enumerate(search_results, 1))
+
+
+def plan_chunks(search_results: list[str], chunk_budget: int) -> list[list[str]]:
+    """ Packs results, in order, into as few chunks as possible that each fit the token budget.
+    A single result larger than the budget gets a chunk of its own. """
+    chunks: list[list[str]] = []
+    current: list[str] = []
+    used = 0
+    for result in search_results:
+        cost = estimate_tokens(result)
+        if current and used + cost > chunk_budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(result)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
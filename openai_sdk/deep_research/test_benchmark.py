@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from agents import set_tracing_disabled
+
+from benchmark import DEFAULT_LATENCIES, compare, percentiles, run_level
+
+set_tracing_disabled(True)
+
+
+def result(p95: float, throughput: float) -> dict:
+    return {
+        "stages": {"search": {"p50": 1.0, "p95": p95, "p99": p95}},
+        "time_to_report": {"p50": 10.0, "p95": 20.0, "p99": 30.0},
+        "throughput_qpm": throughput,
+    }
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_within_tolerance(self):
+        """Test changes inside the tolerance are not regressions."""
+        self.assertEqual(compare({"4": result(5.4, 9.5)}, {"4": result(5.0, 10.0)}, 0.1), [])
+
+    def test_regressions(self):
+        """Test slower percentiles and lower throughput past the tolerance are reported."""
+        regressions = compare({"4": result(6.0, 8.0)}, {"4": result(5.0, 10.0)}, 0.1)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(regressions[0].startswith("concurrency 4 search p95"))
+        self.assertTrue(regressions[-1].startswith("concurrency 4 throughput"))
+
+    def test_levels_missing_from_the_baseline(self):
+        """Test concurrency levels without a baseline are skipped."""
+        self.assertEqual(compare({"16": result(60.0, 1.0)}, {"4": result(5.0, 10.0)}, 0.1), [])
+
+
+class TestPercentiles(unittest.TestCase):
+
+    def test_percentiles(self):
+        self.assertEqual(percentiles([]), {})
+        self.assertEqual(percentiles([2.0]), {"p50": 2.0, "p95": 2.0, "p99": 2.0})
+        p = percentiles([float(i) for i in range(1, 101)])
+        self.assertEqual(p["p50"], 50.5)
+        self.assertAlmostEqual(p["p95"], 95.05)
+
+
+class TestRunLevel(unittest.TestCase):
+
+    def test_run_level(self):
+        """Test a small offline run reports every stage and a positive throughput."""
+        args = SimpleNamespace(
+            latencies=DEFAULT_LATENCIES, time_scale=0.001, searches=3, report_words=50, queries=4,
+            scheduler=True, max_concurrency=4, rate=10000.0, burst=8, stream=True, adaptive=False,
+            search_timeout=60.0, hedge_delay=20.0,
+        )
+        level = asyncio.run(run_level(args, concurrency=2, seed=0))
+        self.assertEqual(set(level["stages"]), {"plan", "search", "write", "notify"})
+        self.assertEqual(level["scheduler"]["calls"], 4 * (1 + 3 + 1 + 1))
+        self.assertGreater(level["throughput_qpm"], 0)
+        self.assertEqual(set(level["time_to_report"]), {"p50", "p95", "p99"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import re
+import unittest
+import urllib.request
+
+from metrics import MetricsRegistry, RunRecord, StageRecord, estimate_cost
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text: str) -> dict[str, dict]:
+    """Parses OpenMetrics text into {family: {"type": ..., "samples": [(name, labels, value)]}}, checking its structure."""
+    assert text.endswith("# EOF\n"), "missing # EOF terminator"
+    families: dict[str, dict] = {}
+    family = None
+    for line in text.splitlines()[:-1]:
+        if line.startswith("# HELP "):
+            family = line.split(" ", 3)[2]
+            assert family not in families, f"{family} declared twice"
+            families[family] = {"type": None, "samples": []}
+        elif line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name == family, f"TYPE for {name} outside its family"
+            families[family]["type"] = kind
+        else:
+            match = SAMPLE.match(line)
+            assert match, f"bad sample line {line!r}"
+            name, labels, value = match.group(1), dict(LABEL.findall(match.group(2) or "")), float(match.group(3))
+            suffixes = {"counter": ("_total",), "histogram": ("_bucket", "_sum", "_count")}[families[family]["type"]]
+            assert name in (family + suffix for suffix in suffixes), f"{name} does not belong to {family}"
+            families[family]["samples"].append((name, labels, value))
+    return families
+
+
+def stage(name: str, duration: float, outcome: str = "ok", **usage) -> StageRecord:
+    record = StageRecord(stage=name, agent="agent", model="gpt-4o-mini", duration=duration, outcome=outcome, **usage)
+    record.cost = estimate_cost(record.model, record.input_tokens, record.cached_tokens, record.output_tokens, record.web_searches)
+    return record
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a registry with two searches, a failed search, a write and one finished run."""
+        self.registry = MetricsRegistry()
+        for record in (
+            stage("search", 1.5, input_tokens=1000, cached_tokens=200, output_tokens=100, web_searches=1),
+            stage("search", 7.0, input_tokens=1000, output_tokens=100, web_searches=1),
+            stage("search", 0.2, outcome="error"),
+            stage("write", 25.0, input_tokens=5000, output_tokens=2000),
+        ):
+            self.registry.observe_stage(record)
+        self.registry.observe_run(RunRecord(trace_id="t1", query='a "quoted"\nquery', time_to_report=30.0, duration=33.0))
+
+    def test_render_parses_as_openmetrics(self):
+        """Test the rendered text is well-formed OpenMetrics with the expected families."""
+        families = parse(self.registry.render())
+        self.assertEqual(families["research_agent_calls"]["type"], "counter")
+        self.assertEqual(families["research_agent_call_seconds"]["type"], "histogram")
+        calls = {(labels["stage"], labels["outcome"]): value for _, labels, value in families["research_agent_calls"]["samples"]}
+        self.assertEqual(calls, {("search", "ok"): 2, ("search", "error"): 1, ("write", "ok"): 1})
+        tokens = {(labels["stage"], labels["type"]): value for _, labels, value in families["research_agent_tokens"]["samples"]}
+        self.assertEqual((tokens["search", "input"], tokens["search", "cached"]), (1800, 200))
+        self.assertEqual(families["research_runs"]["samples"], [("research_runs_total", {}, 1.0)])
+
+    def test_histogram_buckets(self):
+        """Test histogram buckets are cumulative and end at +Inf with the total count."""
+        samples = parse(self.registry.render())["research_agent_call_seconds"]["samples"]
+        buckets = [(float(labels["le"]), value) for name, labels, value in samples
+                   if name.endswith("_bucket") and labels["stage"] == "search"]
+        self.assertEqual([bound for bound, _ in buckets], sorted(bound for bound, _ in buckets))
+        counts = [value for _, value in buckets]
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(buckets[-1], (float("inf"), 3))
+        self.assertEqual(dict(buckets)[2.0], 2)
+        count = next(value for name, labels, value in samples if name.endswith("_count") and labels["stage"] == "search")
+        self.assertEqual(count, 3)
+
+    def test_serve(self):
+        """Test the endpoint serves the metrics text and recent runs."""
+        server = self.registry.serve(port=0)
+        try:
+            base = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(f"{base}/metrics") as response:
+                self.assertTrue(response.headers["Content-Type"].startswith("application/openmetrics-text"))
+                parse(response.read().decode())
+            with urllib.request.urlopen(f"{base}/runs") as response:
+                self.assertEqual(json.loads(response.read())[0]["query"], 'a "quoted"\nquery')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestEstimateCost(unittest.TestCase):
+
+    def test_cost(self):
+        """Test cached input is billed at the cached rate and web searches on top."""
+        self.assertAlmostEqual(estimate_cost("gpt-4o-mini", 1_000_000, 400_000, 100_000, web_searches=2),
+                               0.6 * 0.15 + 0.4 * 0.075 + 0.1 * 0.60 + 2 * 0.025)
+        self.assertEqual(estimate_cost("unknown-model", 1000, 0, 1000), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,265 @@
+import asyncio
+import json
+import statistics
+import time
+import unittest
+from collections import defaultdict
+from types import SimpleNamespace
+
+from agents import set_tracing_disabled
+from openai.types.responses import ResponseTextDeltaEvent
+
+from metrics import MetricsRegistry
+from planner_agent import WebSearchItem, WebSearchPlan
+from researcher_agent import ReportData
+from research_manager import JsonStringFieldStream, ResearchManager
+
+set_tracing_disabled(True)
+
+
+class FakeRunner:
+    """Stands in for agents.Runner: waits out a delay for each call and returns canned output."""
+
+    def __init__(self, delays: dict[str, list[float]] | None = None, searches: int = 3,
+                 follow_ups: list[list[str]] | None = None):
+        # Agent name -> delay of each call in order, the last one repeating
+        self.delays = delays or {}
+        self.searches = searches
+        # Queries returned by each follow-up planner call in turn, then none
+        self.follow_ups = list(follow_ups or [])
+        self.queries: list[str] = []
+        self.calls: dict[str, int] = defaultdict(int)
+        self.finished: dict[str, int] = defaultdict(int)
+
+    def output(self, name: str, input: str):
+        if name == "PlannerAgent":
+            return WebSearchPlan(searches=[WebSearchItem(reason="test", query=f"topic {i}") for i in range(self.searches)])
+        if name == "FollowUpPlannerAgent":
+            queries = self.follow_ups.pop(0) if self.follow_ups else []
+            return WebSearchPlan(searches=[WebSearchItem(reason="follow up", query=query) for query in queries])
+        if name == "Search agent":
+            self.queries.append(input.splitlines()[0].removeprefix("Search term: "))
+        if name == "WriteAgent":
+            return ReportData(short_summary="Summary.", markdown_report="# Report", follow_up_questions=[])
+        return f"{name} output for {input.splitlines()[0]}"
+
+    async def run(self, agent, input, **kwargs):
+        delays = self.delays.get(agent.name, [0.0])
+        delay = delays[min(self.calls[agent.name], len(delays) - 1)]
+        self.calls[agent.name] += 1
+        await asyncio.sleep(delay)
+        self.finished[agent.name] += 1
+        output = self.output(agent.name, input)
+        return SimpleNamespace(final_output=output, final_output_as=lambda cls, raise_if_incorrect_type=False: output)
+
+    def run_streamed(self, agent, input, chunk: int = 5, **kwargs):
+        """Streams the writer's report as raw JSON text deltas of chunk characters each."""
+        report = self.output(agent.name, input)
+        raw = report.model_dump_json()
+
+        async def stream_events():
+            for i in range(0, len(raw), chunk):
+                await asyncio.sleep(0)
+                delta = ResponseTextDeltaEvent.model_construct(delta=raw[i:i + chunk], type="response.output_text.delta")
+                yield SimpleNamespace(type="raw_response_event", data=delta)
+            self.finished[agent.name] += 1
+
+        self.calls[agent.name] += 1
+        return SimpleNamespace(stream_events=stream_events, final_output_as=lambda cls, raise_if_incorrect_type=False: report)
+
+
+class ManagerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        """Clear the search latency history shared by every ResearchManager."""
+        ResearchManager._search_latencies.clear()
+
+    def tearDown(self):
+        ResearchManager._search_latencies.clear()
+
+
+def collect(manager: ResearchManager, query: str = "query") -> list:
+    """Runs the manager to completion, returning every update with the runner's finished counts at that point."""
+    async def run():
+        updates = [(update, dict(manager.runner.finished)) async for update in manager.run(query)]
+        await asyncio.gather(*list(ResearchManager._background_tasks))
+        return updates
+
+    return asyncio.run(run())
+
+
+class TestPipelining(ManagerTestCase):
+
+    def test_progress_streams_as_searches_land(self):
+        """Test each search is reported as it finishes rather than after the slowest one."""
+        runner = FakeRunner({"Search agent": [0.3, 0.0, 0.1]})
+        updates = collect(ResearchManager(runner=runner, stream_report=False))
+        progress = [finished["Search agent"] for update, finished in updates if str(update).startswith("Searches complete:")]
+        self.assertEqual(progress, [1, 2, 3])
+
+    def test_report_before_notification(self):
+        """Test the report is yielded before the notification finishes, which then completes in the background."""
+        runner = FakeRunner({"notification_agent": [0.2]})
+        update, finished = collect(ResearchManager(runner=runner, stream_report=False))[-1]
+        self.assertEqual(update, "# Report")
+        self.assertEqual(finished.get("notification_agent", 0), 0)
+        self.assertEqual(runner.finished["notification_agent"], 1)
+
+    def test_not_pipelined(self):
+        """Test the unpipelined flow sends the notification before yielding the report."""
+        runner = FakeRunner({"notification_agent": [0.05]})
+        update, finished = collect(ResearchManager(runner=runner, pipelined=False, stream_report=False))[-1]
+        self.assertEqual((update, finished["notification_agent"]), ("# Report", 1))
+
+
+class TestAdaptiveFanOut(ManagerTestCase):
+
+    def test_plan_capped_at_max_searches(self):
+        """Test the adaptive planner's searches are cut to max_searches."""
+        runner = FakeRunner(searches=5)
+        collect(ResearchManager(runner=runner, adaptive=True, max_searches=3, max_rounds=0, stream_report=False))
+        self.assertEqual(runner.queries, ["topic 0", "topic 1", "topic 2"])
+
+    def test_follow_up_rounds(self):
+        """Test follow-up rounds add only new searches within the budget and stop once coverage is sufficient."""
+        runner = FakeRunner(searches=2, follow_ups=[["topic 0", "battery life"], ["price history", "reviews", "specs"]])
+        updates = collect(ResearchManager(runner=runner, adaptive=True, max_searches=5, max_rounds=3, stream_report=False))
+        self.assertEqual(sorted(runner.queries), sorted(["topic 0", "topic 1", "battery life", "price history", "reviews"]))
+        self.assertEqual(runner.calls["FollowUpPlannerAgent"], 2)
+        self.assertIn("Coverage insufficient, running 1 more searches...", [update for update, _ in updates])
+
+    def test_sufficient_coverage_stops(self):
+        """Test an empty follow-up plan ends the research after the first round."""
+        runner = FakeRunner(searches=2)
+        updates = collect(ResearchManager(runner=runner, adaptive=True, max_searches=6, max_rounds=3, stream_report=False))
+        self.assertEqual(runner.calls["FollowUpPlannerAgent"], 1)
+        self.assertIn("Coverage looks sufficient...", [update for update, _ in updates])
+
+
+class TestJsonStringFieldStream(unittest.TestCase):
+
+    def test_field_split_across_chunks(self):
+        """Test the field decodes the same however the JSON is split, including inside escapes."""
+        # json.dumps escapes the accent as \u00e9 and the rocket as a \ud83d\ude80 surrogate pair
+        markdown = '# Title\n\n"Quoted" \\ path, caf\u00e9 and \U0001F680\tend'
+        raw = json.dumps({"short_summary": "s", "markdown_report": markdown, "follow_up_questions": []})
+        for size in range(1, 12):
+            stream = JsonStringFieldStream("markdown_report")
+            text = "".join(stream.feed(raw[i:i + size]) for i in range(0, len(raw), size))
+            self.assertEqual(text, markdown, f"chunk size {size}")
+            self.assertTrue(stream.done)
+
+    def test_nothing_before_the_field(self):
+        """Test no text is returned until the field's value starts."""
+        stream = JsonStringFieldStream("markdown_report")
+        self.assertEqual(stream.feed('{"short_summary": "not this", "markdown_rep'), "")
+        self.assertEqual(stream.feed('ort": "th'), "th")
+        self.assertEqual(stream.feed('is", "x": "y"}'), "is")
+
+
+class TestStreamedReport(ManagerTestCase):
+
+    def test_report_streams_progressively(self):
+        """Test the report is yielded as growing prefixes before the final ReportData."""
+        manager = ResearchManager(runner=FakeRunner())
+
+        async def run():
+            return [update async for update in manager.write_report_streamed("query", ["result"], interval=0.0)]
+
+        updates = asyncio.run(run())
+        texts, report = updates[:-1], updates[-1]
+        self.assertIsInstance(report, ReportData)
+        self.assertGreater(len(texts), 1)
+        self.assertEqual(texts[-1], report.markdown_report)
+        for shorter, longer in zip(texts, texts[1:]):
+            self.assertTrue(longer.startswith(shorter))
+
+
+class TestSynthesis(ManagerTestCase):
+
+    def test_small_results_go_straight_to_the_writer(self):
+        """Test results within the token budget are not digested."""
+        runner = FakeRunner()
+        manager = ResearchManager(runner=runner, report_token_budget=1000)
+        writer_input = asyncio.run(manager.writer_input("query", ["one", "two"]))
+        self.assertEqual(runner.calls["DigestAgent"], 0)
+        self.assertIn("### Result 2\ntwo", writer_input)
+
+    def test_large_results_are_condensed(self):
+        """Test results over the budget are digested chunk by chunk before the writer sees them."""
+        runner = FakeRunner()
+        manager = ResearchManager(runner=runner, report_token_budget=100, chunk_token_budget=120)
+        results = [f"result {i} " + "word " * 40 for i in range(6)]  # about 50 tokens each, two to a chunk
+        writer_input = asyncio.run(manager.writer_input("query", results))
+        self.assertEqual(runner.calls["DigestAgent"], 3)
+        self.assertNotIn("word word", writer_input)
+        self.assertEqual(writer_input.count("DigestAgent output"), 3)
+
+
+class TestMetrics(ManagerTestCase):
+
+    def test_run_is_recorded(self):
+        """Test every agent call of a run is recorded and the run reaches the registry once notified."""
+        registry = MetricsRegistry()
+        manager = ResearchManager(runner=FakeRunner({"notification_agent": [0.05]}), metrics=registry, stream_report=False)
+        collect(manager)
+        self.assertEqual([stage.stage for stage in manager.record.stages].count("search"), 3)
+        self.assertEqual({stage.stage for stage in manager.record.stages}, {"plan", "search", "write", "notify"})
+        self.assertTrue(all(stage.outcome == "ok" for stage in manager.record.stages))
+        self.assertLessEqual(manager.record.time_to_report, manager.record.duration)
+        self.assertEqual([run["trace_id"] for run in registry.recent_runs()], [manager.record.trace_id])
+        self.assertIn('research_agent_calls_total{stage="search",outcome="ok"} 3', registry.render())
+
+
+class TestHedging(ManagerTestCase):
+
+    def test_hedge_percentile_bounds(self):
+        """Test percentiles outside (0, 1) are rejected and None switches hedging off."""
+        for percentile in (0.0, 1.0, 1.5, -0.1):
+            with self.assertRaises(ValueError):
+                ResearchManager(hedge_percentile=percentile)
+        self.assertIsNone(ResearchManager(hedge_percentile=None)._hedge_after())
+
+    def test_hedge_cut(self):
+        """Test the hedge fires at the requested percentile of recent search latencies."""
+        latencies = [i / 10 for i in range(1, 101)]
+        ResearchManager._search_latencies.extend(latencies)
+        cuts = statistics.quantiles(latencies, n=100)
+        self.assertEqual(ResearchManager(hedge_percentile=0.29)._hedge_after(), cuts[28])
+        self.assertEqual(ResearchManager(hedge_percentile=0.999)._hedge_after(), cuts[98])
+        self.assertEqual(ResearchManager(hedge_percentile=0.001)._hedge_after(), cuts[0])
+        self.assertIsNone(ResearchManager(hedge_percentile=0.9, search_timeout=1.0)._hedge_after())
+
+    def test_hedge_fires_after_the_cut(self):
+        """Test a straggling search gets a duplicate once past the cut, and the first to finish wins."""
+        runner = FakeRunner({"Search agent": [5.0, 0.01]})
+        manager = ResearchManager(runner=runner, search_timeout=2.0, hedge_delay=0.1)
+        item = WebSearchItem(reason="test", query="slow")
+        start = time.monotonic()
+        result = asyncio.run(manager.search_with_deadline(item))
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(result, "Search agent output for Search term: slow")
+        self.assertEqual(manager.hedged, [item])
+        self.assertEqual(runner.calls["Search agent"], 2)
+
+    def test_no_hedge_before_the_cut(self):
+        """Test a search finishing before the cut is not duplicated."""
+        runner = FakeRunner({"Search agent": [0.05]})
+        manager = ResearchManager(runner=runner, search_timeout=2.0, hedge_delay=0.5)
+        asyncio.run(manager.search_with_deadline(WebSearchItem(reason="test", query="fast")))
+        self.assertEqual((manager.hedged, runner.calls["Search agent"]), ([], 1))
+
+    def test_deadline(self):
+        """Test a search still running at the deadline is abandoned and recorded as timed out."""
+        runner = FakeRunner({"Search agent": [5.0]})
+        manager = ResearchManager(runner=runner, search_timeout=0.2, hedge_percentile=None)
+        item = WebSearchItem(reason="test", query="stuck")
+        start = time.monotonic()
+        self.assertIsNone(asyncio.run(manager.search_with_deadline(item)))
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(manager.timed_out, [item])
+        self.assertEqual(runner.finished["Search agent"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import time
+import unittest
+
+from scheduler import ResearchScheduler
+
+
+class TestResearchScheduler(unittest.TestCase):
+
+    def test_round_robin_across_sessions(self):
+        """Test a session with many queued calls cannot starve another session."""
+        scheduler = ResearchScheduler(max_concurrency=1, rate=1000.0, burst=100)
+        granted = []
+
+        async def call(session: str, i: int):
+            async with scheduler.slot(session):
+                granted.append(f"{session}{i}")
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(*[call("a", i) for i in range(4)], *[call("b", i) for i in range(2)])
+
+        asyncio.run(run())
+        self.assertEqual(granted, ["a0", "a1", "b0", "a2", "b1", "a3"])
+
+    def test_concurrency_cap(self):
+        """Test no more than max_concurrency calls hold a slot at once."""
+        scheduler = ResearchScheduler(max_concurrency=2, rate=1000.0, burst=100)
+        in_flight, peak = 0, 0
+
+        async def call():
+            nonlocal in_flight, peak
+            async with scheduler.slot():
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.01)
+                in_flight -= 1
+
+        async def run():
+            await asyncio.gather(*(call() for _ in range(6)))
+
+        asyncio.run(run())
+        self.assertEqual(peak, 2)
+        self.assertEqual(scheduler.metrics()["calls"], 6)
+
+    def test_token_bucket_paces_starts(self):
+        """Test calls beyond the burst start no faster than the refill rate."""
+        scheduler = ResearchScheduler(max_concurrency=10, rate=20.0, burst=2)
+        starts = []
+
+        async def call():
+            async with scheduler.slot():
+                starts.append(time.monotonic())
+
+        async def run():
+            start = time.monotonic()
+            await asyncio.gather(*(call() for _ in range(4)))
+            return start
+
+        start = asyncio.run(run())
+        offsets = sorted(t - start for t in starts)
+        self.assertLess(offsets[1], 0.03)
+        self.assertGreaterEqual(offsets[2], 0.04)
+        self.assertGreaterEqual(offsets[3], 0.09)
+
+    def test_cancelled_waiter_gives_up_its_place(self):
+        """Test a call cancelled while queued is skipped and does not leak a slot."""
+        scheduler = ResearchScheduler(max_concurrency=1, rate=1000.0, burst=100)
+
+        async def run():
+            await scheduler.acquire("a")
+            queued = asyncio.create_task(scheduler.acquire("b"))
+            await asyncio.sleep(0)
+            queued.cancel()
+            scheduler.release()
+            await asyncio.wait_for(scheduler.acquire("c"), 1.0)
+            scheduler.release()
+            return scheduler.metrics()
+
+        metrics = asyncio.run(run())
+        self.assertEqual((metrics["in_flight"], metrics["queue_depth"]), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import time
+import unittest
+
+from planner_agent import WebSearchItem
+from search_cache import SearchCache, dedupe_searches, query_key
+
+
+class TestQueryKey(unittest.TestCase):
+
+    def test_rewording_matches(self):
+        """Test reordered queries and plural forms share a key."""
+        self.assertEqual(query_key("AI agent frameworks 2025"), query_key("2025 framework for AI agents"))
+
+    def test_different_questions_differ(self):
+        """Test interrogatives and recency words are kept in the key."""
+        self.assertNotEqual(query_key("Why did Tesla stock fall"), query_key("How did Tesla stock fall"))
+        self.assertNotEqual(query_key("latest Tesla earnings"), query_key("Tesla earnings"))
+
+
+class TestDedupeSearches(unittest.TestCase):
+
+    def test_drops_near_duplicates(self):
+        """Test later searches that repeat an earlier one are dropped and order is kept."""
+        searches = [
+            WebSearchItem(reason="1", query="AI agent frameworks 2025"),
+            WebSearchItem(reason="2", query="Tesla stock price"),
+            WebSearchItem(reason="3", query="2025 AI agents frameworks"),
+            WebSearchItem(reason="4", query="Why did Tesla stock fall"),
+            WebSearchItem(reason="5", query="How did Tesla stock fall"),
+        ]
+        self.assertEqual([item.reason for item in dedupe_searches(searches)], ["1", "2", "4", "5"])
+
+
+class TestSearchCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a cache in a temporary directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "search_cache.db")
+        self.cache = SearchCache(self.path)
+
+    def tearDown(self):
+        self.cache._conn.close()
+        self.directory.cleanup()
+
+    def test_exact_and_near_hits(self):
+        """Test reworded queries hit the cache and different questions miss it."""
+        self.cache.put("Why did Tesla stock fall in 2025", "demand slowed")
+        self.assertEqual(self.cache.get("2025: why did Tesla stocks fall"), "demand slowed")
+        self.assertIsNone(self.cache.get("How did Tesla stock fall in 2025"))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_survives_reopening(self):
+        """Test entries persist across instances."""
+        self.cache.put("AI agent frameworks", "summary")
+        self.cache._conn.close()
+        self.cache = SearchCache(self.path)
+        self.assertEqual(self.cache.get("AI agents framework"), "summary")
+
+    def test_expired_entries_miss(self):
+        """Test entries older than the TTL are neither returned nor kept."""
+        self.cache.ttl = 0.05
+        self.cache.put("AI agent frameworks", "summary")
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get("AI agent frameworks"))
+        self.assertEqual(self.cache.evict_expired(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
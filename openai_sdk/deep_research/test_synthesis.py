@@ -0,0 +1,33 @@
+import unittest
+
+from synthesis import estimate_tokens, format_results, plan_chunks
+
+
+class TestPlanChunks(unittest.TestCase):
+
+    def test_packs_in_order_within_budget(self):
+        """Test results are packed in order into as few chunks as fit the budget."""
+        results = ["a" * 40, "b" * 40, "c" * 40, "d" * 40, "e" * 40]  # 11 tokens each
+        chunks = plan_chunks(results, 25)
+        self.assertEqual(chunks, [results[0:2], results[2:4], results[4:]])
+        for chunk in chunks:
+            self.assertLessEqual(sum(estimate_tokens(result) for result in chunk), 25)
+
+    def test_oversized_result_alone(self):
+        """Test a result larger than the budget gets a chunk of its own."""
+        results = ["short", "x" * 400, "short"]
+        self.assertEqual(plan_chunks(results, 20), [["short"], ["x" * 400], ["short"]])
+
+    def test_empty(self):
+        self.assertEqual(plan_chunks([], 100), [])
+
+
+class TestFormatResults(unittest.TestCase):
+
+    def test_numbered_sections(self):
+        """Test results are laid out as numbered sections."""
+        self.assertEqual(format_results([" one ", "two"]), "### Result 1\none\n\n### Result 2\ntwo")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,238 @@
+"""
+Shrinks a raw product page before it is sent to the model.
+
+The page is streamed through an HTMLParser that drops non-content nodes (scripts, styles,
+navigation, footers, forms...), keeps the visible text and image links, and collects the
+structured product data stores embed for search engines: JSON-LD, OpenGraph meta tags and
+schema.org microdata. The visible text is then trimmed to a token budget.
+"""
+import json
+import re
+from html.parser import HTMLParser
+from typing import Iterable, Optional, Union
+
+from pydantic import BaseModel, Field
+
+# Roughly how many characters one token covers for English/HTML text
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 4000
+
+SKIP_TAGS = {
+    "script", "style", "noscript", "svg", "iframe", "template", "canvas",
+    "nav", "header", "footer", "form", "button", "select", "aside",
+}
+SKIP_ROLES = {"navigation", "banner", "contentinfo", "search", "dialog"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "tr", "table",
+    "h1", "h2", "h3", "h4", "h5", "h6", "br", "dd", "dt", "dl", "title",
+}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+class ReducedPage(BaseModel):
+    """ The content-bearing parts of an html page """
+    text: str = ""
+    title: Optional[str] = None
+    canonical_url: Optional[str] = None
+    images: list[str] = Field(default_factory=list)
+    json_ld: list[dict] = Field(default_factory=list)
+    open_graph: dict[str, str] = Field(default_factory=dict)
+    # Top-level microdata items: {"@type": [itemtypes], prop: [values]}, nested items as dicts
+    microdata: list[dict] = Field(default_factory=list)
+    truncated: bool = False
+
+    def has_structured_data(self) -> bool:
+        return bool(self.json_ld or self.open_graph or self.microdata)
+
+    def to_prompt(self) -> str:
+        """ Renders the page as a compact message for the model """
+        parts = []
+        if self.canonical_url:
+            parts.append(f"URL: {self.canonical_url}")
+        if self.json_ld:
+            parts.append("JSON-LD:\n" + json.dumps(self.json_ld, ensure_ascii=False, separators=(",", ":")))
+        if self.open_graph:
+            parts.append("OpenGraph:\n" + json.dumps(self.open_graph, ensure_ascii=False, separators=(",", ":")))
+        if self.microdata:
+            parts.append("Microdata:\n" + json.dumps(self.microdata, ensure_ascii=False, separators=(",", ":")))
+        if self.images:
+            parts.append("Images:\n" + "\n".join(self.images))
+        parts.append("Page text:\n" + self.text)
+        return "\n\n".join(parts)
+
+
+class _Reducer(HTMLParser):
+    def __init__(self, char_budget: int):
+        super().__init__(convert_charrefs=True)
+        self.char_budget = char_budget
+        self.page = ReducedPage()
+        self._chunks: list[str] = []
+        self._chars = 0
+        self._skip: list[str] = []  # stack of tags whose subtree is being dropped
+        self._json_ld: Optional[list[str]] = None
+        self._in_title = False
+        self._title: list[str] = []
+        # [tag, itemprop, text, depth, item] of open microdata nodes, where item is the scope they belong
+        # to; depth counts nested tags of the same name, so the node ends at its own closing tag rather
+        # than at a child's
+        self._itemprops: list[list] = []
+        self._scopes: list[list] = []  # [tag, item, depth] of open itemscope elements
+
+    def _emit(self, text: str):
+        if self._chars >= self.char_budget:
+            self.page.truncated = True
+            return
+        self._chunks.append(text)
+        self._chars += len(text)
+
+    @staticmethod
+    def _add_microdata(item: Optional[dict], prop: str, value: Union[str, dict]):
+        if isinstance(value, str):
+            value = " ".join(value.split())
+        if value and item is not None:
+            for name in prop.split():
+                item.setdefault(name, []).append(value)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: (v or "") for k, v in attrs}
+        if tag == "script" and attrs.get("type", "").lower() == "application/ld+json":
+            self._json_ld = []
+            return
+        if tag == "meta":
+            self._handle_meta(attrs)
+        elif tag == "link" and "canonical" in attrs.get("rel", "").lower().split():
+            self.page.canonical_url = attrs.get("href") or self.page.canonical_url
+        self._handle_microdata(tag, attrs)
+
+        if self._skip:
+            if tag == self._skip[-1] or tag in SKIP_TAGS:
+                self._skip.append(tag)
+            return
+        if tag in SKIP_TAGS or attrs.get("role") in SKIP_ROLES or attrs.get("aria-hidden") == "true" or "hidden" in attrs:
+            if tag not in VOID_TAGS:
+                self._skip.append(tag)
+            return
+        if tag == "title":
+            self._in_title = True
+        elif tag == "img":
+            src = attrs.get("src") or attrs.get("data-src")
+            if src and not src.startswith("data:") and src not in self.page.images:
+                self.page.images.append(src)
+        if tag in BLOCK_TAGS:
+            self._emit("\n")
+
+    def _handle_microdata(self, tag: str, attrs: dict):
+        """ Properties go to the innermost enclosing itemscope, so a breadcrumb's or a seller's name is
+        kept apart from the product's. Properties outside any itemscope belong to no item and are dropped """
+        scope = self._scopes[-1][1] if self._scopes else None
+        prop = attrs.get("itemprop")
+        opens_prop = opens_scope = False
+        if "itemscope" in attrs:
+            item = {"@type": attrs.get("itemtype", "").split()}
+            if prop and scope is not None:
+                self._add_microdata(scope, prop, item)
+            else:
+                self.page.microdata.append(item)
+            if tag not in VOID_TAGS:
+                self._scopes.append([tag, item, 0])
+                opens_scope = True
+        elif prop:
+            value = attrs.get("content") or attrs.get("href") or attrs.get("src") or attrs.get("value")
+            if value or tag in VOID_TAGS:
+                self._add_microdata(scope, prop, value or "")
+            else:
+                self._itemprops.append([tag, prop, [], 0, scope])
+                opens_prop = True
+        if tag in VOID_TAGS:
+            return
+        if not opens_prop and self._itemprops and self._itemprops[-1][0] == tag:
+            self._itemprops[-1][3] += 1
+        if not opens_scope and self._scopes and self._scopes[-1][0] == tag:
+            self._scopes[-1][2] += 1
+
+    @staticmethod
+    def _close(stack: list[list], tag: str, depth: int) -> Optional[list]:
+        """ Pops the top entry if this end tag closes it, or counts down a nested tag of the same name """
+        if not stack or stack[-1][0] != tag:
+            return None
+        if stack[-1][depth]:
+            stack[-1][depth] -= 1
+            return None
+        return stack.pop()
+
+    def _handle_meta(self, attrs: dict):
+        key = (attrs.get("property") or attrs.get("name") or "").lower()
+        content = attrs.get("content", "").strip()
+        if not content:
+            return
+        if key.startswith(("og:", "product:")):
+            self.page.open_graph.setdefault(key, content)
+        elif key in ("description", "twitter:title", "twitter:image"):
+            self.page.open_graph.setdefault(key, content)
+
+    def handle_endtag(self, tag):
+        if tag == "script" and self._json_ld is not None:
+            self._load_json_ld("".join(self._json_ld))
+            self._json_ld = None
+            return
+        closed = self._close(self._itemprops, tag, 3)
+        if closed is not None:
+            _, prop, text, _, item = closed
+            self._add_microdata(item, prop, "".join(text))
+        self._close(self._scopes, tag, 2)
+        if self._skip:
+            if self._skip[-1] == tag:
+                self._skip.pop()
+            return
+        if tag == "title":
+            self._in_title = False
+        if tag in BLOCK_TAGS:
+            self._emit("\n")
+
+    def handle_data(self, data):
+        if self._json_ld is not None:
+            self._json_ld.append(data)
+            return
+        for _, _, text, _, _ in self._itemprops:
+            text.append(data)
+        if self._skip:
+            return
+        if self._in_title:
+            self._title.append(data)
+        # Data can arrive split at any point when streaming, so only collapse whitespace here
+        # and leave word boundaries alone; lines are tidied up in result()
+        self._emit(re.sub(r"\s+", " ", data))
+
+    def _load_json_ld(self, raw: str):
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return
+        items = data if isinstance(data, list) else [data]
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("@graph"), list):
+                self.page.json_ld.extend(i for i in item["@graph"] if isinstance(i, dict))
+            elif isinstance(item, dict):
+                self.page.json_ld.append(item)
+
+    def result(self) -> ReducedPage:
+        lines = (" ".join(line.split()) for line in "".join(self._chunks).splitlines())
+        text = "\n".join(line for line in lines if line)
+        if len(text) > self.char_budget:
+            text = text[:self.char_budget]
+            self.page.truncated = True
+        self.page.text = text
+        self.page.title = " ".join("".join(self._title).split()) or None
+        self.page.canonical_url = self.page.canonical_url or self.page.open_graph.get("og:url")
+        return self.page
+
+
+def reduce_html(source: Union[str, Iterable[str]], token_budget: int = DEFAULT_TOKEN_BUDGET) -> ReducedPage:
+    """ Reduces an html page, given whole or as an iterable of chunks, to its content and structured data.
+    Text beyond the token budget is dropped as it streams in, structured data is always kept. """
+    reducer = _Reducer(char_budget=token_budget * CHARS_PER_TOKEN)
+    for chunk in ([source] if isinstance(source, str) else source):
+        reducer.feed(chunk)
+    reducer.close()
+    return reducer.result()
+
@@ -0,0 +1,195 @@
+"""
+Streaming, resumable writer for scraped Product records.
+
+Records are buffered and written in bounded batches to rotating JSONL or Parquet files.
+After every durable write a line is appended to checkpoint.jsonl naming the input URLs
+that are now safely on disk, so a crashed crawl can be restarted and skip straight past
+them:
+
+    with ProductSink("output/catalog") as sink:
+        async for result in scrape_batch_async(sink.pending(pages)):
+            sink.write_result(result)
+
+JSONL files are appended to and checkpointed after every batch. Parquet files cannot be
+appended to once closed, so each one is checkpointed when it is rotated or the sink is
+closed, and an unfinished file left by a crash is discarded and re-extracted on resume.
+"""
+import json
+import os
+import typing
+from typing import Iterable, Iterator, Optional
+
+from scraper import Page, Product, ScrapeResult
+
+CHECKPOINT = "checkpoint.jsonl"
+FORMATS = ("jsonl", "parquet")
+
+
+def _arrow_schema():
+    """ Arrow schema mirroring the Product model, so every Parquet file has identical columns """
+    import pyarrow as pa
+
+    types = {str: pa.string(), float: pa.float64(), int: pa.int64(), bool: pa.bool_()}
+    fields = [pa.field("source_url", pa.string())]
+    for name, field in Product.model_fields.items():
+        annotation = field.annotation
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+            annotation = args[0]
+        if typing.get_origin(annotation) in (list, typing.List):
+            arrow_type = pa.list_(types[typing.get_args(annotation)[0]])
+        else:
+            arrow_type = types[annotation]
+        fields.append(pa.field(name, arrow_type, nullable=not field.is_required()))
+    return pa.schema(fields)
+
+
+class ProductSink:
+    def __init__(self, directory: str, format: str = "jsonl", batch_size: int = 500,
+                 max_records_per_file: Optional[int] = None, prefix: str = "products"):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format!r}, expected one of {FORMATS}")
+        if format == "parquet":
+            try:
+                import pyarrow.parquet  # noqa: F401
+            except ImportError as e:
+                raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from e
+        self.directory = directory
+        self.format = format
+        self.batch_size = batch_size
+        # Parquet files are only checkpointed once complete, so keep them smaller to bound lost work
+        self.max_records_per_file = max_records_per_file or (100_000 if format == "jsonl" else 20_000)
+        self.prefix = prefix
+        self._buffer: list[dict] = []
+        self._done: set[str] = set()
+        self._file_index = 0
+        self._file_records = 0
+        self._file_urls: list[str] = []  # urls written to the open parquet file but not yet checkpointed
+        self._handle = None
+        self._writer = None
+        os.makedirs(directory, exist_ok=True)
+        self._resume()
+        self._checkpoint = open(os.path.join(directory, CHECKPOINT), "a", encoding="utf-8")
+
+    def _path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{self.prefix}-{index:05d}.{self.format}")
+
+    def _resume(self):
+        """ Rebuilds the done set from the checkpoint and drops anything written after it """
+        last = None
+        path = os.path.join(self.directory, CHECKPOINT)
+        if os.path.exists(path):
+            with open(path, "r+b") as f:
+                data = f.read()
+                # Drop a torn final line from a crash mid-write so new entries start on a clean line
+                complete = data[:data.rfind(b"\n") + 1]
+                if len(complete) != len(data):
+                    f.truncate(len(complete))
+            for line in complete.decode("utf-8").splitlines():
+                entry = json.loads(line)
+                self._done.update(entry["urls"])
+                last = entry
+        if last is not None:
+            self._file_index = last["index"]
+            self._file_records = last["records"]
+            if self.format == "parquet" or self._file_records >= self.max_records_per_file:
+                self._file_index += 1
+                self._file_records = 0
+            else:
+                # Cut off any records appended after the last checkpoint, they will be re-extracted
+                with open(self._path(self._file_index), "r+b") as f:
+                    f.truncate(last["offset"])
+        for name in os.listdir(self.directory):
+            stem, _, ext = name.rpartition(".")
+            if ext == self.format and stem.startswith(f"{self.prefix}-"):
+                index = int(stem.rsplit("-", 1)[1])
+                if index > self._file_index or (index == self._file_index and self._file_records == 0):
+                    os.remove(os.path.join(self.directory, name))
+
+    def completed_urls(self) -> set[str]:
+        return set(self._done)
+
+    def is_done(self, url: str) -> bool:
+        return url in self._done
+
+    def pending(self, pages: Iterable[Page]) -> Iterator[Page]:
+        """ Skips (url, html) pairs whose url is already checkpointed """
+        for page in pages:
+            if not (isinstance(page, tuple) and page[0] in self._done):
+                yield page
+
+    def write(self, url: str, product: Product):
+        self._buffer.append({"source_url": url, **product.model_dump(mode="json")})
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_result(self, result: ScrapeResult) -> bool:
+        """ Writes a successful batch result; failed ones are left out so a resumed crawl retries them """
+        if not result.ok:
+            return False
+        self.write(result.url, result.product)
+        return True
+
+    def flush(self):
+        while self._buffer:
+            room = self.max_records_per_file - self._file_records
+            batch, self._buffer = self._buffer[:room], self._buffer[room:]
+            if self.format == "jsonl":
+                self._write_jsonl(batch)
+            else:
+                self._write_parquet(batch)
+            if self._file_records >= self.max_records_per_file:
+                self._rotate()
+
+    def _write_jsonl(self, batch: list[dict]):
+        if self._handle is None:
+            self._handle = open(self._path(self._file_index), "ab")
+        self._handle.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch).encode())
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._file_records += len(batch)
+        self._record_checkpoint([record["source_url"] for record in batch], offset=self._handle.tell())
+
+    def _write_parquet(self, batch: list[dict]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = _arrow_schema()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._path(self._file_index), schema)
+        self._writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        self._file_records += len(batch)
+        self._file_urls.extend(record["source_url"] for record in batch)
+
+    def _record_checkpoint(self, urls: list[str], offset: int = 0):
+        entry = {"index": self._file_index, "records": self._file_records, "offset": offset, "urls": urls}
+        self._checkpoint.write(json.dumps(entry) + "\n")
+        self._checkpoint.flush()
+        os.fsync(self._checkpoint.fileno())
+        self._done.update(url for url in urls if url is not None)
+
+    def _close_file(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._record_checkpoint(self._file_urls)
+            self._file_urls = []
+
+    def _rotate(self):
+        self._close_file()
+        self._file_index += 1
+        self._file_records = 0
+
+    def close(self):
+        self.flush()
+        self._close_file()
+        self._checkpoint.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
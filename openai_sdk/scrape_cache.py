@@ -0,0 +1,138 @@
+"""
+Persistent, content-addressed cache for scraper extractions.
+
+Entries are keyed by a hash of the normalized (already reduced) page content, the Product
+schema and the model name, so a change to any of them naturally misses. Values are the
+model's JSON output. The store is a single SQLite file with TTL expiry and size-bounded
+LRU eviction, safe to share between threads and between crawler processes.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+DEFAULT_PATH = "scrape_cache.db"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    stores: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def schema_version(schema: dict) -> str:
+    """ Short, stable fingerprint of a JSON schema """
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def make_key(content: str, schema: dict, model: str) -> str:
+    """ Cache key for a piece of page content extracted against a schema by a model """
+    normalized = " ".join(content.split())
+    digest = hashlib.sha256()
+    for part in (model, schema_version(schema), normalized):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, path: str = DEFAULT_PATH, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS extractions_accessed ON extractions (accessed)")
+        self._bytes = self._total_bytes()
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        """ Returns the cached value for key, or None if it is missing or older than the TTL """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, size, created FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats.misses += 1
+                return None
+            value, size, created = row
+            if now - created > self.ttl:
+                self._conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                self._bytes -= size
+                self._stats.expired += 1
+                self._stats.misses += 1
+                return None
+            self._conn.execute("UPDATE extractions SET accessed = ? WHERE key = ?", (now, key))
+            self._stats.hits += 1
+            return value
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        size = len(key) + len(value.encode())
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM extractions WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            self._stats.stores += 1
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """ Drops least recently used entries until the store is back to 90% of its size limit """
+        # Other processes may share the file, so work from the real size rather than our running count
+        self._bytes = self._total_bytes()
+        target = int(self.max_bytes * 0.9)
+        if self._bytes <= target:
+            return
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM extractions ORDER BY accessed"):
+            if self._bytes <= target:
+                break
+            victims.append((key,))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM extractions WHERE key = ?", victims)
+        self._stats.evictions += len(victims)
+
+    def purge_expired(self) -> int:
+        """ Removes every entry older than the TTL and returns how many were dropped """
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM extractions WHERE created < ?", (time.time() - self.ttl,)).rowcount
+            self._bytes = self._total_bytes()
+            self._stats.expired += removed
+            return removed
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+            return self._stats.model_copy(update={"entries": entries, "bytes": self._bytes})
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
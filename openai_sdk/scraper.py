@@ -1,8 +1,17 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
-from typing import List, Optional
-from openai import OpenAI
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union
+import openai
+from openai import AsyncOpenAI, OpenAI
+from html_reducer import DEFAULT_TOKEN_BUDGET, reduce_html
+from structured_data import LLM, extract_structured
+from scrape_cache import ExtractionCache, make_key
 
 load_dotenv(override=True)
 
@@ -76,39 +85,340 @@ class Product(BaseModel):
     product_id: str = Field(
         description="The unique product identifier, SKU, model number, or barcode."
     )
-# Agent which will output the search terms to use
+
+PRODUCT_SCHEMA = Product.model_json_schema()
+
+MODEL = "openai/gpt-4o-mini"
+BASE_URL = "https://openrouter.ai/api/v1"
+
+SYSTEM_PROMPT = "You are a helpful web scraper. Given the content and structured data of a product page, extract the data for the product. Only the listed fields are still needed, the rest are already known. Be sure the data is in the JSON format. Use the extract_product_info tool to extract the data."
+
+# Errors worth retrying: the request never reached the model or the provider asked us to back off
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+# A page is either the raw html or a (url, html) pair so results can be matched back to their source
+Page = Union[str, Tuple[str, str]]
+
 client = OpenAI(
-  base_url="https://openrouter.ai/api/v1",
+  base_url=BASE_URL,
   api_key=os.getenv("OPENROUTER_API_KEY"),
 )
+async_client = AsyncOpenAI(
+  base_url=BASE_URL,
+  api_key=os.getenv("OPENROUTER_API_KEY"),
+)
+
+
+class ExtractionError(Exception):
+    """ Raised when a page could not be turned into a Product """
+
+    def __init__(self, message: str, cause: Optional[BaseException] = None, attempts: int = 1):
+        super().__init__(message)
+        self.cause = cause
+        self.attempts = attempts
+        self.retryable = isinstance(cause, RETRYABLE_ERRORS)
+
 
-def web_scraper(html_page : str) -> Product:
-    completion = client.chat.completions.create(
-            model="openai/gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are a helpful web scraper. Given an html page, extract the data for the product. Be sure the data is in the JSON format. Use the extract_product_info tool to extract the data."},
-                {
-                "role": "user",
-                "content": html_page,
-                },
-            ],
-            tools=[
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "extract_product_info",
-                        "description": "Extracts key details about a product.",
-                        "parameters": Product.model_json_schema()
+class ScrapeResult(BaseModel):
+    """ Outcome of one page in a batch: either a product or the error that stopped it """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: int
+    url: Optional[str] = None
+    product: Optional[Product] = None
+    provenance: dict[str, str] = Field(default_factory=dict)
+    error: Optional[ExtractionError] = None
+    attempts: int = 1
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ExtractionReport(BaseModel):
+    """ An extracted product and where each of its fields came from (json-ld, microdata, opengraph, derived or llm) """
+    product: Product
+    provenance: dict[str, str] = Field(default_factory=dict)
+
+    @property
+    def llm_used(self) -> bool:
+        return LLM in self.provenance.values()
+
+
+class _PreparedPage:
+    """ A reduced page, the fields its markup already provides and what is left for the model """
+
+    def __init__(self, html_page: str, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        page = reduce_html(html_page, token_budget)
+        self.structured = extract_structured(page)
+        self.missing = self.structured.missing(Product.model_fields)
+        self.prompt = page.to_prompt()
+        self.schema = {
+            **PRODUCT_SCHEMA,
+            "properties": {name: PRODUCT_SCHEMA["properties"][name] for name in self.missing},
+            "required": [name for name in PRODUCT_SCHEMA.get("required", []) if name in self.missing],
+        }
+        self.key = None
+
+    def from_markup(self) -> Optional[ExtractionReport]:
+        """ Builds the product from markup alone when every required field is present """
+        if any(field.is_required() for name, field in Product.model_fields.items() if name in self.missing):
+            return None
+        try:
+            return ExtractionReport(product=Product.model_validate(self.structured.fields), provenance=self.structured.provenance)
+        except ValidationError:
+            return None
+
+    def request(self, model: str = MODEL) -> dict:
+        """ Builds the chat completion arguments, asking the model only for the missing fields """
+        return dict(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": SYSTEM_PROMPT},
+                    {
+                    "role": "user",
+                    "content": f"{self.prompt}\n\nFields to extract: {', '.join(self.missing)}",
+                    },
+                ],
+                tools=[
+                    {
+                        "type": "function",
+                        "function": {
+                            "name": "extract_product_info",
+                            "description": "Extracts key details about a product.",
+                            "parameters": self.schema
+                        }
                     }
-                }
-            ],
-            tool_choice={"type": "function", "function": {"name": "extract_product_info"}}
-    )
-    tool_call = completion.choices[0].message.tool_calls[0]
-    json_output_string = tool_call.function.arguments
+                ],
+                tool_choice={"type": "function", "function": {"name": "extract_product_info"}}
+        )
+
+    def merge(self, completion) -> ExtractionReport:
+        """ Combines the model's tool call with the markup fields, markup taking precedence """
+        tool_calls = completion.choices[0].message.tool_calls
+        if not tool_calls:
+            raise ExtractionError("Model did not call extract_product_info")
+        try:
+            llm_fields = json.loads(tool_calls[0].function.arguments)
+        except (TypeError, ValueError) as e:
+            raise ExtractionError("Model output was not valid JSON", cause=e) from e
+        if not isinstance(llm_fields, dict):
+            raise ExtractionError(f"Model output was a JSON {type(llm_fields).__name__}, not an object")
+        provenance = dict(self.structured.provenance)
+        for name in self.missing:
+            if llm_fields.get(name) is not None:
+                provenance[name] = LLM
+        try:
+            product = Product.model_validate({**llm_fields, **self.structured.fields})
+        except ValidationError as e:
+            raise ExtractionError("Model output did not match the Product schema", cause=e) from e
+        return ExtractionReport(product=product, provenance=provenance)
+
+    def cached(self, cache: Optional[ExtractionCache]) -> Optional[ExtractionReport]:
+        if cache is None:
+            return None
+        self.key = make_key(self.request()["messages"][1]["content"], self.schema, MODEL)
+        value = cache.get(self.key)
+        if value is None:
+            return None
+        try:
+            return ExtractionReport.model_validate_json(value)
+        except ValidationError:
+            return None
+
+    def store(self, cache: Optional[ExtractionCache], report: ExtractionReport):
+        if cache is not None and self.key is not None:
+            cache.put(self.key, report.model_dump_json())
+
+
+def _split(page: Page) -> Tuple[Optional[str], str]:
+    if isinstance(page, tuple):
+        return page
+    return None, page
+
+
+def _backoff(attempt: int, backoff: float) -> float:
+    """ Exponential backoff with full jitter """
+    return random.uniform(0, backoff * (2 ** attempt))
+
+
+def extract_product(html_page: str, cache: Optional[ExtractionCache] = None) -> ExtractionReport:
+    """ Extracts a product from markup first, asking the model only for what is still missing """
+    prepared = _PreparedPage(html_page)
+    report = prepared.from_markup() or prepared.cached(cache)
+    if report:
+        return report
+    report = prepared.merge(client.chat.completions.create(**prepared.request()))
+    prepared.store(cache, report)
+    return report
+
+
+async def aextract_product(html_page: str, api_client: Optional[AsyncOpenAI] = None, cache: Optional[ExtractionCache] = None) -> ExtractionReport:
+    # Reducing the page and the SQLite cache are blocking, so they run off the event loop
+    prepared = await asyncio.to_thread(_PreparedPage, html_page)
+    report = prepared.from_markup() or await asyncio.to_thread(prepared.cached, cache)
+    if report:
+        return report
+    report = prepared.merge(await (api_client or async_client).chat.completions.create(**prepared.request()))
+    await asyncio.to_thread(prepared.store, cache, report)
+    return report
+
+
+def web_scraper(html_page : str, cache: Optional[ExtractionCache] = None) -> Product:
+    return extract_product(html_page, cache).product
+
+
+async def aweb_scraper(html_page: str, api_client: Optional[AsyncOpenAI] = None, cache: Optional[ExtractionCache] = None) -> Product:
+    return (await aextract_product(html_page, api_client, cache)).product
+
+
+def _extract_with_retry(index: int, page: Page, api_client: OpenAI, retries: int, backoff: float,
+                        cache: Optional[ExtractionCache]) -> ScrapeResult:
+    url, html_page = _split(page)
+    start = time.perf_counter()
+    try:
+        prepared = _PreparedPage(html_page)
+        report = prepared.from_markup() or prepared.cached(cache)
+    except Exception as e:
+        error = ExtractionError(f"Could not prepare page: {e}", cause=e)
+        return ScrapeResult(index=index, url=url, error=error, elapsed=time.perf_counter() - start)
+    if report:
+        return ScrapeResult(index=index, url=url, product=report.product, provenance=report.provenance, attempts=0, elapsed=time.perf_counter() - start)
+    for attempt in range(retries + 1):
+        try:
+            report = prepared.merge(api_client.chat.completions.create(**prepared.request()))
+            prepared.store(cache, report)
+            return ScrapeResult(index=index, url=url, product=report.product, provenance=report.provenance, attempts=attempt + 1, elapsed=time.perf_counter() - start)
+        except RETRYABLE_ERRORS as e:
+            if attempt == retries:
+                error = ExtractionError(f"Gave up after {attempt + 1} attempts: {e}", cause=e, attempts=attempt + 1)
+                break
+            time.sleep(_backoff(attempt, backoff))
+        except ExtractionError as e:
+            e.attempts = attempt + 1
+            error = e
+            break
+        except openai.OpenAIError as e:
+            error = ExtractionError(str(e), cause=e, attempts=attempt + 1)
+            break
+        except Exception as e:
+            # Anything unexpected, e.g. a malformed response, fails this page rather than the whole batch
+            error = ExtractionError(f"Unexpected error: {e}", cause=e, attempts=attempt + 1)
+            break
+    return ScrapeResult(index=index, url=url, error=error, attempts=error.attempts, elapsed=time.perf_counter() - start)
+
+
+async def _aextract_with_retry(index: int, page: Page, api_client: AsyncOpenAI, retries: int, backoff: float,
+                               cache: Optional[ExtractionCache]) -> ScrapeResult:
+    url, html_page = _split(page)
+    start = time.perf_counter()
+    try:
+        # Reducing the page and the SQLite cache are blocking, so they run off the event loop
+        prepared = await asyncio.to_thread(_PreparedPage, html_page)
+        report = prepared.from_markup() or await asyncio.to_thread(prepared.cached, cache)
+    except Exception as e:
+        error = ExtractionError(f"Could not prepare page: {e}", cause=e)
+        return ScrapeResult(index=index, url=url, error=error, elapsed=time.perf_counter() - start)
+    if report:
+        return ScrapeResult(index=index, url=url, product=report.product, provenance=report.provenance, attempts=0, elapsed=time.perf_counter() - start)
+    for attempt in range(retries + 1):
+        try:
+            report = prepared.merge(await api_client.chat.completions.create(**prepared.request()))
+            await asyncio.to_thread(prepared.store, cache, report)
+            return ScrapeResult(index=index, url=url, product=report.product, provenance=report.provenance, attempts=attempt + 1, elapsed=time.perf_counter() - start)
+        except RETRYABLE_ERRORS as e:
+            if attempt == retries:
+                error = ExtractionError(f"Gave up after {attempt + 1} attempts: {e}", cause=e, attempts=attempt + 1)
+                break
+            await asyncio.sleep(_backoff(attempt, backoff))
+        except ExtractionError as e:
+            e.attempts = attempt + 1
+            error = e
+            break
+        except openai.OpenAIError as e:
+            error = ExtractionError(str(e), cause=e, attempts=attempt + 1)
+            break
+        except Exception as e:
+            # Anything unexpected, e.g. a malformed response, fails this page rather than the whole batch
+            error = ExtractionError(f"Unexpected error: {e}", cause=e, attempts=attempt + 1)
+            break
+    return ScrapeResult(index=index, url=url, error=error, attempts=error.attempts, elapsed=time.perf_counter() - start)
+
+
+async def scrape_batch_async(
+    pages: Iterable[Page],
+    max_in_flight: int = 8,
+    retries: int = 3,
+    backoff: float = 0.5,
+    api_client: Optional[AsyncOpenAI] = None,
+    cache: Optional[ExtractionCache] = None,
+) -> AsyncIterator[ScrapeResult]:
+    """ Extracts products from many pages concurrently, yielding results in completion order.
+    Pages are pulled from the iterable lazily so at most max_in_flight requests are open at once. """
+    # Retries are handled here with jittered backoff, so switch off the SDK's own retry loop
+    api_client = (api_client or async_client).with_options(max_retries=0)
+    pages = iter(enumerate(pages))
+    pending = set()
+
+    def fill():
+        while len(pending) < max_in_flight:
+            try:
+                index, page = next(pages)
+            except StopIteration:
+                return
+            pending.add(asyncio.create_task(_aextract_with_retry(index, page, api_client, retries, backoff, cache)))
+
+    fill()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                yield task.result()
+            fill()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def scrape_batch(
+    pages: Iterable[Page],
+    max_in_flight: int = 8,
+    retries: int = 3,
+    backoff: float = 0.5,
+    api_client: Optional[OpenAI] = None,
+    cache: Optional[ExtractionCache] = None,
+) -> Iterator[ScrapeResult]:
+    """ Synchronous counterpart of scrape_batch_async backed by a thread pool """
+    api_client = (api_client or client).with_options(max_retries=0)
+    pages = iter(enumerate(pages))
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        pending = set()
 
-    product_data = Product.model_validate_json(json_output_string)
+        def fill():
+            while len(pending) < max_in_flight:
+                try:
+                    index, page = next(pages)
+                except StopIteration:
+                    return
+                pending.add(pool.submit(_extract_with_retry, index, page, api_client, retries, backoff, cache))
 
-    return product_data
\ No newline at end of file
+        fill()
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    yield future.result()
+                fill()
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,143 @@
+"""
+Measures scraper throughput (pages/sec) against a local OpenAI-compatible stub server,
+so batch settings can be tuned without spending API credits.
+
+    python scraper_benchmark.py --pages 500 --max-in-flight 32 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from openai import AsyncOpenAI, OpenAI
+from scraper import scrape_batch, scrape_batch_async
+from scrape_cache import ExtractionCache
+
+SAMPLE_PRODUCT = {
+    "product_name": "RG 1/144 RX-78-2 Gundam",
+    "brand": "Bandai Spirits",
+    "series": "Mobile Suit Gundam",
+    "category": "Model Kit",
+    "scale": "1/144",
+    "availability": "In Stock",
+    "price": 29.99,
+    "currency": "USD",
+    "store_name": "Example Hobby",
+    "store_url": "https://hobby.example.com",
+    "url": "https://hobby.example.com/rx-78-2",
+    "images": ["https://hobby.example.com/rx-78-2.jpg"],
+    "description": "Real Grade kit of the RX-78-2 Gundam with beam saber and shield.",
+    "product_id": "BAN-5061594",
+}
+
+SAMPLE_PAGE = "<html><body><h1>RG 1/144 RX-78-2 Gundam</h1>" + "<p>filler</p>" * 200 + "</body></html>"
+
+
+def make_handler(latency: float, jitter: float, error_rate: float):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(max(0.0, random.gauss(latency, jitter)))
+            if random.random() < error_rate:
+                self.send_response(503)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"error": {"message": "stub overloaded"}}')
+                return
+            body = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "stub",
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "tool_calls",
+                    "message": {
+                        "role": "assistant",
+                        "content": None,
+                        "tool_calls": [{
+                            "id": "call_stub",
+                            "type": "function",
+                            "function": {"name": "extract_product_info", "arguments": json.dumps(SAMPLE_PRODUCT)},
+                        }],
+                    },
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(latency: float, jitter: float, error_rate: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency, jitter, error_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def report(label: str, results: list, elapsed: float):
+    failed = sum(1 for r in results if not r.ok)
+    print(f"{label}: {len(results)} pages in {elapsed:.2f}s -> {len(results) / elapsed:.1f} pages/sec ({failed} failed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.1, help="Mean stub response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--cache", action="store_true", help="Also time a cold and a warm pass through the extraction cache")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.latency, args.jitter, args.error_rate)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    pages = [SAMPLE_PAGE] * args.pages
+
+    start = time.perf_counter()
+    results = list(scrape_batch(pages, max_in_flight=args.max_in_flight, retries=args.retries, backoff=0.05,
+                                api_client=OpenAI(base_url=base_url, api_key="stub")))
+    report("sync ", results, time.perf_counter() - start)
+
+    async def run_async():
+        return [r async for r in scrape_batch_async(pages, max_in_flight=args.max_in_flight, retries=args.retries, backoff=0.05,
+                                                    api_client=AsyncOpenAI(base_url=base_url, api_key="stub"))]
+
+    start = time.perf_counter()
+    results = asyncio.run(run_async())
+    report("async", results, time.perf_counter() - start)
+
+    if args.cache:
+        # Distinct pages so the cold pass really has to call the stub for each of them
+        cached_pages = [SAMPLE_PAGE.replace("<p>filler</p>", f"<p>filler {i}</p>", 1) for i in range(args.pages)]
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ExtractionCache(os.path.join(tmp, "cache.db"))
+            for label in ("cold ", "warm "):
+                start = time.perf_counter()
+                results = list(scrape_batch(cached_pages, max_in_flight=args.max_in_flight, retries=args.retries, backoff=0.05,
+                                            api_client=OpenAI(base_url=base_url, api_key="stub"), cache=cache))
+                report(label, results, time.perf_counter() - start)
+            stats = cache.stats()
+            print(f"cache: {stats.hits} hits, {stats.misses} misses ({stats.hit_rate:.0%}), {stats.entries} entries, {stats.bytes} bytes")
+            cache.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
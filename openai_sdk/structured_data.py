@@ -0,0 +1,253 @@
+"""
+Rule-based mapping of schema.org Product/Offer markup onto the scraper's Product fields.
+
+Stores embed the same data three ways: JSON-LD blocks, microdata attributes and OpenGraph
+meta tags. Each field is taken from the most reliable source that has it (JSON-LD, then
+microdata, then OpenGraph), normalized to the shape Product expects, and tagged with where
+it came from so callers can report per-field provenance.
+"""
+import re
+from typing import Optional
+from urllib.parse import urljoin
+
+from pydantic import BaseModel, Field
+
+from html_reducer import ReducedPage
+
+JSON_LD = "json-ld"
+MICRODATA = "microdata"
+OPENGRAPH = "opengraph"
+DERIVED = "derived"
+LLM = "llm"
+
+AVAILABILITY = {
+    "instock": "In Stock",
+    "onlineonly": "In Stock",
+    "limitedavailability": "Limited Availability",
+    "instoreonly": "In Store Only",
+    "outofstock": "Out of Stock",
+    "soldout": "Sold Out",
+    "discontinued": "Discontinued",
+    "preorder": "Pre-order",
+    "presale": "Pre-order",
+    "backorder": "Backorder",
+}
+
+PRODUCT_ID_KEYS = ("sku", "mpn", "gtin13", "gtin12", "gtin14", "gtin8", "gtin", "productID")
+PRODUCT_TYPES = {"Product", "ProductGroup", "IndividualProduct"}
+# Offer properties some stores put on the Product item itself
+OFFER_KEYS = ("price", "lowPrice", "priceCurrency", "availability")
+
+
+class StructuredProduct(BaseModel):
+    """ Product fields recovered from markup, with the source of each one """
+    fields: dict = Field(default_factory=dict)
+    provenance: dict[str, str] = Field(default_factory=dict)
+
+    def set(self, name: str, value, source: str):
+        """ Keeps the first value seen for a field, so sources must be applied best-first """
+        if name in self.fields or value in (None, "", []):
+            return
+        self.fields[name] = value
+        self.provenance[name] = source
+
+    def missing(self, names) -> list[str]:
+        return [name for name in names if name not in self.fields]
+
+
+def _first(value):
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _text(value) -> Optional[str]:
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("@id")
+    if value in (None, ""):
+        return None
+    return " ".join(str(value).split())
+
+
+def _types(item: dict) -> set[str]:
+    types = item.get("@type")
+    types = types if isinstance(types, list) else [types]
+    return {str(t).split("/")[-1] for t in types if t}
+
+
+def parse_price(value) -> Optional[float]:
+    """ Parses prices like 29.99, "1,200", "¥1200", "29,99 €" or "1.299,99 €" """
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get("price") or value.get("value")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    number = re.sub(r"[^\d.,]", "", value).rstrip(".,")
+    if number[:1] in (".", ",") and re.search(r"[.,]", number[1:]):
+        number = number[1:]  # Left over from a prefix like "Rs."
+    if not number:
+        return None
+    if "." in number and "," in number:
+        # The last separator is the decimal point, the other groups thousands: "1.299,99", "1,299.99"
+        decimal = max(".,", key=number.rfind)
+        number = number.replace("," if decimal == "." else ".", "").replace(decimal, ".")
+    else:
+        separator = "," if "," in number else "."
+        # A repeated separator, or exactly three digits after it, groups thousands: "1,200", "1.299"
+        if number.count(separator) > 1 or re.search(rf"\{separator}\d{{3}}$", number):
+            number = number.replace(separator, "")
+        else:
+            number = number.replace(",", ".")
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+
+def normalize_availability(value) -> Optional[str]:
+    value = _text(value)
+    if not value:
+        return None
+    key = re.sub(r"[^a-z]", "", value.rsplit("/", 1)[-1].lower())
+    return AVAILABILITY.get(key, value)
+
+
+def _int(value) -> Optional[int]:
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get("value")
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _images(value, base: Optional[str]) -> list[str]:
+    value = value if isinstance(value, list) else [value] if value else []
+    images = []
+    for image in value:
+        if isinstance(image, dict):
+            image = image.get("contentUrl") or image.get("url")
+        if isinstance(image, str) and image:
+            image = urljoin(base, image) if base else image
+            if image not in images:
+                images.append(image)
+    return images
+
+
+def _offer(product: dict) -> dict:
+    offers = _first(product.get("offers"))
+    if not isinstance(offers, dict):
+        return {}
+    if "AggregateOffer" in _types(offers):
+        nested = _first(offers.get("offers"))
+        if isinstance(nested, dict):
+            return {**offers, **nested}
+        return {**offers, "price": offers.get("price") or offers.get("lowPrice")}
+    return offers
+
+
+def _apply_product(result: StructuredProduct, item: dict, base: Optional[str], source: str):
+    """ Maps a schema.org Product, shaped like JSON-LD, and its Offer, Brand and seller children """
+    offer = _offer(item)
+    price = parse_price(offer.get("price"))
+    spec = offer.get("priceSpecification")
+    specs = spec if isinstance(spec, list) else [spec] if isinstance(spec, dict) else []
+    list_price = next((parse_price(s.get("price")) for s in specs if "StrikethroughPrice" in str(s.get("priceType", ""))), None)
+    if price is None:
+        price = next((parse_price(s.get("price")) for s in specs), None)
+    if list_price and price and list_price > price:
+        result.set("price", list_price, source)
+        result.set("discounted_price", price, source)
+    else:
+        result.set("price", price, source)
+    currency = offer.get("priceCurrency") or next((s.get("priceCurrency") for s in specs), None)
+    shipping = _first(offer.get("shippingDetails"))
+    region = offer.get("areaServed") or offer.get("eligibleRegion")
+
+    result.set("product_name", _text(item.get("name")), source)
+    result.set("brand", _text(item.get("brand") or item.get("manufacturer")), source)
+    result.set("description", _text(item.get("description")), source)
+    result.set("product_id", next((_text(item.get(k)) for k in PRODUCT_ID_KEYS if item.get(k)), None), source)
+    result.set("images", _images(item.get("image"), base), source)
+    result.set("url", _text(item.get("url") or offer.get("url")), source)
+    result.set("category", _text(item.get("category")), source)
+    result.set("release_date", _text(item.get("releaseDate")), source)
+    result.set("currency", _text(currency), source)
+    result.set("availability", normalize_availability(offer.get("availability")), source)
+    result.set("stock_quantity", _int(offer.get("inventoryLevel")), source)
+    result.set("store_name", _text(offer.get("seller")), source)
+    result.set("store_region", _text(region), source)
+    if isinstance(shipping, dict):
+        result.set("shipping_cost", parse_price(shipping.get("shippingRate")), source)
+
+
+def _find_product(items: list[dict]) -> Optional[dict]:
+    """
+    The first Product item, searching nested items too, e.g. a Product under a WebPage's mainEntity or
+    an @graph. Works on JSON-LD, where a property holds one value or a list, and on microdata items
+    """
+    for item in items:
+        if _types(item) & PRODUCT_TYPES:
+            return item
+        nested = []
+        for key, values in item.items():
+            if key != "@type":
+                nested.extend(value for value in (values if isinstance(values, list) else [values]) if isinstance(value, dict))
+        found = _find_product(nested)
+        if found is not None:
+            return found
+    return None
+
+
+def _microdata_item(item: dict) -> dict:
+    """ Reshapes a microdata item like JSON-LD: single values unwrapped, nested items converted """
+    converted = {"@type": item.get("@type")}
+    for key, values in item.items():
+        if key != "@type":
+            values = [_microdata_item(value) if isinstance(value, dict) else value for value in values]
+            converted[key] = values[0] if len(values) == 1 else values
+    if "offers" not in converted and any(key in converted for key in OFFER_KEYS):
+        converted["offers"] = {key: converted[key] for key in OFFER_KEYS if key in converted}
+    return converted
+
+
+def _apply_microdata(result: StructuredProduct, items: list[dict], base: Optional[str]):
+    """ Only the Product item is mapped, never properties of breadcrumbs, reviews or other items on the page """
+    product = _find_product(items)
+    if product is not None:
+        _apply_product(result, _microdata_item(product), base, MICRODATA)
+
+
+def _apply_open_graph(result: StructuredProduct, og: dict[str, str], base: Optional[str]):
+    result.set("product_name", og.get("og:title"), OPENGRAPH)
+    result.set("description", og.get("og:description") or og.get("description"), OPENGRAPH)
+    result.set("images", _images(og.get("og:image"), base), OPENGRAPH)
+    result.set("url", og.get("og:url"), OPENGRAPH)
+    result.set("price", parse_price(og.get("product:price:amount") or og.get("og:price:amount")), OPENGRAPH)
+    result.set("currency", og.get("product:price:currency") or og.get("og:price:currency"), OPENGRAPH)
+    result.set("availability", normalize_availability(og.get("product:availability") or og.get("og:availability")), OPENGRAPH)
+    result.set("brand", og.get("product:brand"), OPENGRAPH)
+    result.set("product_id", og.get("product:retailer_item_id"), OPENGRAPH)
+    result.set("store_name", og.get("og:site_name"), OPENGRAPH)
+
+
+def extract_structured(page: ReducedPage) -> StructuredProduct:
+    """ Fills as many Product fields as the page's markup allows, best source first """
+    result = StructuredProduct()
+    base = page.canonical_url
+    product = _find_product(page.json_ld)
+    if product is not None:
+        _apply_product(result, product, base, JSON_LD)
+    _apply_microdata(result, page.microdata, base)
+    _apply_open_graph(result, page.open_graph, base)
+
+    result.set("url", page.canonical_url, DERIVED)
+    url = result.fields.get("url")
+    if url and "://" in url:
+        scheme, rest = url.split("://", 1)
+        result.set("store_url", f"{scheme}://{rest.split('/')[0]}", DERIVED)
+    return result
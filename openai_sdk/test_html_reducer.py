@@ -0,0 +1,64 @@
+import unittest
+
+from html_reducer import reduce_html
+
+
+class TestReduceHtml(unittest.TestCase):
+
+    def test_drops_non_content(self):
+        """Test scripts, navigation and hidden nodes are dropped and visible text kept."""
+        page = reduce_html(
+            "<html><head><title>Shoe</title><script>var x = 1;</script></head>"
+            "<body><nav>Home | Shop</nav><h1>Trail Shoe</h1><p hidden>secret</p><p>Light and fast.</p></body></html>"
+        )
+        self.assertEqual(page.title, "Shoe")
+        self.assertEqual(page.text, "Shoe\nTrail Shoe\nLight and fast.")
+
+    def test_microdata_spans_nested_tags(self):
+        """Test an itemprop value runs to its own closing tag, not a nested child's."""
+        page = reduce_html(
+            '<div itemscope itemtype="https://schema.org/Product">'
+            '<div itemprop="description"><div>a</div> b</div><span itemprop="sku">X1</span></div>'
+        )
+        self.assertEqual(page.microdata, [
+            {"@type": ["https://schema.org/Product"], "description": ["a b"], "sku": ["X1"]},
+        ])
+
+    def test_nested_itemprops(self):
+        """Test an itemprop nested in another with the same tag closes each at the right place."""
+        page = reduce_html('<div itemscope><div itemprop="a"><div itemprop="b">x</div> y</div></div>')
+        self.assertEqual(page.microdata, [{"@type": [], "b": ["x"], "a": ["x y"]}])
+
+    def test_microdata_scopes(self):
+        """Test properties belong to their innermost itemscope and nested items to their parent."""
+        page = reduce_html(
+            '<ol itemscope itemtype="https://schema.org/BreadcrumbList">'
+            '<li itemprop="itemListElement" itemscope itemtype="https://schema.org/ListItem">'
+            '<span itemprop="name">Home</span></li></ol>'
+            '<div itemscope itemtype="https://schema.org/Product"><h1 itemprop="name">Trail Shoe</h1>'
+            '<div itemprop="offers" itemscope itemtype="https://schema.org/Offer">'
+            '<meta itemprop="price" content="89.00"><div><span>Sold by</span></div>'
+            '<div itemprop="seller" itemscope itemtype="https://schema.org/Organization">'
+            '<span itemprop="name">Shoe Shop</span></div></div>'
+            '<span itemprop="sku">TS-1</span></div>'
+            '<span itemprop="name">stray</span>'
+        )
+        breadcrumbs, product = page.microdata
+        self.assertEqual(breadcrumbs["itemListElement"][0]["name"], ["Home"])
+        self.assertEqual(product["name"], ["Trail Shoe"])
+        self.assertEqual(product["sku"], ["TS-1"])
+        offer = product["offers"][0]
+        self.assertEqual(offer["price"], ["89.00"])
+        self.assertEqual(offer["seller"][0]["name"], ["Shoe Shop"])
+
+    def test_streamed_chunks(self):
+        """Test feeding the page in chunks gives the same result as feeding it whole."""
+        html = '<p>Hello <b>world</b></p><script type="application/ld+json">{"@type": "Product", "name": "Shoe"}</script>'
+        whole = reduce_html(html)
+        streamed = reduce_html(html[i:i + 7] for i in range(0, len(html), 7))
+        self.assertEqual(streamed, whole)
+        self.assertEqual(whole.json_ld, [{"@type": "Product", "name": "Shoe"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
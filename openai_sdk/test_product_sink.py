@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+
+from product_sink import CHECKPOINT, ProductSink
+from scraper import Product
+
+
+def product(url: str) -> Product:
+    return Product(
+        product_name="Trail Shoe", brand="Acme", availability="In Stock", price=89.0, currency="USD",
+        store_name="Shoe Shop", store_url="https://shop.example.com", url=url, images=[],
+        description="Light and fast.", product_id=url.rsplit("/", 1)[-1],
+    )
+
+
+URLS = [f"https://shop.example.com/p/{i}" for i in range(6)]
+
+
+class TestProductSink(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an empty output directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def crash(self, sink):
+        """Drop the sink without flushing or closing it, as a killed process would."""
+        if sink._handle is not None:
+            sink._handle.close()
+        sink._checkpoint.close()
+
+    def jsonl_urls(self, name):
+        with open(os.path.join(self.path, name), encoding="utf-8") as f:
+            return [json.loads(line)["source_url"] for line in f]
+
+    def test_jsonl_rotation(self):
+        """Test records are written in batches and files rotate at the record limit."""
+        with ProductSink(self.path, batch_size=2, max_records_per_file=3) as sink:
+            for url in URLS[:5]:
+                sink.write(url, product(url))
+        self.assertEqual(self.jsonl_urls("products-00000.jsonl"), URLS[:3])
+        self.assertEqual(self.jsonl_urls("products-00001.jsonl"), URLS[3:5])
+
+    def test_resume_after_truncated_checkpoint(self):
+        """Test a crash mid-write resumes from the last complete checkpoint line."""
+        sink = ProductSink(self.path, batch_size=2, max_records_per_file=3)
+        for url in URLS[:5]:
+            sink.write(url, product(url))
+        self.crash(sink)
+        # Records appended to the data file, and a checkpoint line cut off, after the last durable write
+        with open(os.path.join(self.path, "products-00001.jsonl"), "a", encoding="utf-8") as f:
+            f.write('{"source_url": "https://shop.example.com/p/4", "product_na')
+        with open(os.path.join(self.path, CHECKPOINT), "a", encoding="utf-8") as f:
+            f.write('{"index": 1, "records": 2, "off')
+
+        with ProductSink(self.path, batch_size=2, max_records_per_file=3) as sink:
+            self.assertEqual(sink.completed_urls(), set(URLS[:4]))
+            pages = list(sink.pending((url, "<html></html>") for url in URLS))
+            self.assertEqual([url for url, _ in pages], URLS[4:])
+            for url, _ in pages:
+                sink.write(url, product(url))
+        self.assertEqual(self.jsonl_urls("products-00000.jsonl"), URLS[:3])
+        self.assertEqual(self.jsonl_urls("products-00001.jsonl"), URLS[3:])
+        with open(os.path.join(self.path, CHECKPOINT), encoding="utf-8") as f:
+            urls = [url for line in f for url in json.loads(line)["urls"]]
+        self.assertEqual(urls, URLS)
+
+    def test_parquet_rotation_and_resume(self):
+        """Test Parquet files are checkpointed on rotation and an unfinished one is redone on resume."""
+        import pyarrow.parquet as pq
+
+        sink = ProductSink(self.path, format="parquet", batch_size=2, max_records_per_file=3)
+        for url in URLS[:4]:
+            sink.write(url, product(url))
+        self.crash(sink)
+        with ProductSink(self.path, format="parquet", batch_size=2, max_records_per_file=3) as sink:
+            self.assertEqual(sink.completed_urls(), set(URLS[:3]))
+            self.assertFalse(os.path.exists(os.path.join(self.path, "products-00001.parquet")))
+            for url, _ in sink.pending((url, "") for url in URLS):
+                sink.write(url, product(url))
+        self.assertEqual(pq.read_table(os.path.join(self.path, "products-00000.parquet"))["source_url"].to_pylist(), URLS[:3])
+        self.assertEqual(pq.read_table(os.path.join(self.path, "products-00001.parquet"))["source_url"].to_pylist(), URLS[3:])
+
+
+if __name__ == '__main__':
+    unittest.main()
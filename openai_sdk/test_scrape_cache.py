@@ -0,0 +1,71 @@
+import os
+import tempfile
+import time
+import unittest
+
+from scrape_cache import ExtractionCache, make_key
+
+
+class TestMakeKey(unittest.TestCase):
+
+    def test_key_parts(self):
+        """Test whitespace does not change the key but the schema and model do."""
+        schema = {"type": "object", "properties": {"price": {"type": "number"}}}
+        key = make_key("Trail  Shoe\n89.00", schema, "model-a")
+        self.assertEqual(key, make_key("Trail Shoe 89.00", schema, "model-a"))
+        self.assertNotEqual(key, make_key("Trail Shoe 89.00", schema, "model-b"))
+        self.assertNotEqual(key, make_key("Trail Shoe 89.00", {"type": "object"}, "model-a"))
+
+
+class TestExtractionCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a cache in a temporary directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "scrape_cache.db")
+        self.cache = ExtractionCache(self.path)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_hit_and_miss(self):
+        """Test stored values are returned, survive reopening, and lookups are counted."""
+        self.cache.put("a", "value")
+        self.assertEqual(self.cache.get("a"), "value")
+        self.assertIsNone(self.cache.get("b"))
+        stats = self.cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.stores, stats.entries), (1, 1, 1, 1))
+        self.cache.close()
+        self.cache = ExtractionCache(self.path)
+        self.assertEqual(self.cache.get("a"), "value")
+
+    def test_expiry(self):
+        """Test entries older than the TTL miss and are removed."""
+        self.cache.ttl = 0.05
+        self.cache.put("a", "value")
+        self.cache.put("b", "value")
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.purge_expired(), 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats.expired, stats.entries, stats.bytes), (2, 0, 0))
+
+    def test_lru_eviction(self):
+        """Test going over the size limit evicts the least recently used entries first."""
+        self.cache.max_bytes = 250
+        for key in ("a", "b"):
+            self.cache.put(key, "x" * 100)
+            time.sleep(0.01)
+        self.assertIsNotNone(self.cache.get("a"))
+        time.sleep(0.01)
+        self.cache.put("c", "x" * 100)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNotNone(self.cache.get("c"))
+        stats = self.cache.stats()
+        self.assertEqual((stats.evictions, stats.bytes), (1, 202))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+import unittest
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+
+import openai
+from scraper import scrape_batch, scrape_batch_async
+
+PRODUCT = {
+    "product_name": "Trail Shoe",
+    "brand": "Acme",
+    "availability": "In Stock",
+    "price": 89.0,
+    "currency": "USD",
+    "store_name": "Shoe Shop",
+    "store_url": "https://shop.example.com",
+    "url": "https://shop.example.com/p/trail-shoe",
+    "images": [],
+    "description": "Light and fast.",
+    "product_id": "TS-1",
+}
+
+
+def completion(arguments: str):
+    function = SimpleNamespace(name="extract_product_info", arguments=arguments)
+    message = SimpleNamespace(tool_calls=[SimpleNamespace(function=function)])
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class StubClient:
+    """Chat completions stub answering by page: a list of outcomes, each a payload or an exception, used in order."""
+
+    def __init__(self, outcomes: dict[str, list]):
+        self.outcomes = outcomes
+        self.calls = {page: 0 for page in outcomes}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def with_options(self, **kwargs):
+        return self
+
+    def create(self, messages, **kwargs):
+        page = next(page for page in self.outcomes if page in messages[1]["content"])
+        outcome = self.outcomes[page][min(self.calls[page], len(self.outcomes[page]) - 1)]
+        self.calls[page] += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return completion(outcome if isinstance(outcome, str) else json.dumps(outcome))
+
+
+class AsyncStubClient(StubClient):
+
+    async def create(self, messages, **kwargs):
+        return super().create(messages, **kwargs)
+
+
+def outcomes():
+    """Page one succeeds after two connection errors, two is malformed, three always fails, four succeeds."""
+    error = openai.APIConnectionError(request=None)
+    return {
+        "page one": [error, error, PRODUCT],
+        "page two": [json.dumps([PRODUCT])],
+        "page three": [error],
+        "page four": [PRODUCT],
+    }
+
+
+class TestScrapeBatch(unittest.TestCase):
+
+    def check(self, results, client):
+        results = {result.url: result for result in results}
+        self.assertEqual(sorted(results), ["four", "one", "three", "two"])
+        self.assertTrue(results["one"].ok)
+        self.assertEqual(results["one"].product.product_name, "Trail Shoe")
+        self.assertEqual(results["one"].attempts, 3)
+        self.assertFalse(results["two"].ok)
+        self.assertEqual(results["two"].attempts, 1)
+        self.assertFalse(results["three"].ok)
+        self.assertTrue(results["three"].error.retryable)
+        self.assertEqual(results["three"].attempts, 3)
+        self.assertTrue(results["four"].ok)
+        self.assertEqual(client.calls, {"page one": 3, "page two": 1, "page three": 3, "page four": 1})
+
+    def pages(self):
+        return [(name, f"<h1>page {name}</h1>") for name in ("one", "two", "three", "four")]
+
+    def test_retries_and_isolates_failures(self):
+        """Test retryable errors are retried with backoff and a bad page fails alone."""
+        client = StubClient(outcomes())
+        results = list(scrape_batch(self.pages(), max_in_flight=2, retries=2, backoff=0.0, api_client=client))
+        self.check(results, client)
+
+    def test_async_retries_and_isolates_failures(self):
+        """Test the async batch behaves like the threaded one."""
+        client = AsyncStubClient(outcomes())
+
+        async def run():
+            return [result async for result in scrape_batch_async(
+                self.pages(), max_in_flight=2, retries=2, backoff=0.0, api_client=client)]
+
+        self.check(asyncio.run(run()), client)
+
+
+if __name__ == '__main__':
+    unittest.main()
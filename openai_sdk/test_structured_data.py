@@ -0,0 +1,126 @@
+import json
+import unittest
+
+from html_reducer import reduce_html
+from structured_data import JSON_LD, MICRODATA, OPENGRAPH, extract_structured, parse_price
+
+MICRODATA_PAGE = """
+<html><head><link rel="canonical" href="https://shop.example.com/p/trail-shoe"></head><body>
+<ol itemscope itemtype="https://schema.org/BreadcrumbList">
+  <li itemprop="itemListElement" itemscope itemtype="https://schema.org/ListItem">
+    <a itemprop="item" href="/"><span itemprop="name">Home</span></a></li>
+  <li itemprop="itemListElement" itemscope itemtype="https://schema.org/ListItem">
+    <a itemprop="item" href="/shoes"><span itemprop="name">Shoes</span></a></li>
+</ol>
+<div itemscope itemtype="https://schema.org/Product">
+  <h1 itemprop="name">Trail Shoe</h1>
+  <div itemprop="brand" itemscope itemtype="https://schema.org/Brand"><span itemprop="name">Acme</span></div>
+  <img itemprop="image" src="/img/trail.jpg">
+  <div itemprop="description"><p>Light and <b>fast</b>.</p> Made for mud.</div>
+  <span itemprop="sku">TS-1</span>
+  <div itemprop="offers" itemscope itemtype="https://schema.org/Offer">
+    <span itemprop="priceCurrency" content="USD">$</span><span itemprop="price">89.00</span>
+    <link itemprop="availability" href="https://schema.org/InStock">
+    <div itemprop="seller" itemscope itemtype="https://schema.org/Organization">
+      <span itemprop="name">Shoe Shop</span></div>
+  </div>
+  <div itemprop="review" itemscope itemtype="https://schema.org/Review">
+    <span itemprop="name">Great shoe</span></div>
+</div>
+</body></html>
+"""
+
+
+class TestExtractStructured(unittest.TestCase):
+
+    def test_microdata_product_scope(self):
+        """Test only the Product item and its Offer, Brand and seller are mapped from microdata."""
+        result = extract_structured(reduce_html(MICRODATA_PAGE))
+        self.assertEqual(result.fields["product_name"], "Trail Shoe")
+        self.assertEqual(result.fields["brand"], "Acme")
+        self.assertEqual(result.fields["description"], "Light and fast. Made for mud.")
+        self.assertEqual(result.fields["product_id"], "TS-1")
+        self.assertEqual(result.fields["images"], ["https://shop.example.com/img/trail.jpg"])
+        self.assertEqual(result.fields["price"], 89.0)
+        self.assertEqual(result.fields["currency"], "USD")
+        self.assertEqual(result.fields["availability"], "In Stock")
+        self.assertEqual(result.fields["store_name"], "Shoe Shop")
+        self.assertEqual(result.fields["store_url"], "https://shop.example.com")
+        self.assertEqual(result.provenance["product_name"], MICRODATA)
+
+    def test_no_product_scope(self):
+        """Test names from other items, or outside any item, are not taken as the product's."""
+        page = reduce_html(
+            '<ol itemscope itemtype="https://schema.org/BreadcrumbList"><li itemprop="itemListElement" itemscope>'
+            '<span itemprop="name">Home</span></li></ol><span itemprop="name">Stray</span>'
+        )
+        self.assertNotIn("product_name", extract_structured(page).fields)
+
+    def test_offer_properties_on_the_product(self):
+        """Test a price put directly on the Product item is still found."""
+        page = reduce_html(
+            '<div itemscope itemtype="http://schema.org/Product"><span itemprop="name">Mug</span>'
+            '<meta itemprop="price" content="12,50"><meta itemprop="priceCurrency" content="EUR"></div>'
+        )
+        result = extract_structured(page)
+        self.assertEqual((result.fields["price"], result.fields["currency"]), (12.5, "EUR"))
+
+    def test_sources_in_order(self):
+        """Test JSON-LD wins over microdata, which wins over OpenGraph, field by field."""
+        json_ld = {
+            "@context": "https://schema.org", "@type": "Product", "name": "JSON name",
+            "offers": {"@type": "Offer", "price": "100.00", "priceCurrency": "USD",
+                       "priceSpecification": {"price": "120.00", "priceType": "https://schema.org/StrikethroughPrice"}},
+        }
+        page = reduce_html(
+            f'<head><script type="application/ld+json">{json.dumps(json_ld)}</script>'
+            '<meta property="og:title" content="OG name"><meta property="og:site_name" content="OG Store"></head>'
+            '<div itemscope itemtype="https://schema.org/Product"><span itemprop="name">Microdata name</span>'
+            '<span itemprop="sku">MD-1</span></div>'
+        )
+        result = extract_structured(page)
+        self.assertEqual(result.fields["product_name"], "JSON name")
+        self.assertEqual((result.fields["price"], result.fields["discounted_price"]), (120.0, 100.0))
+        self.assertEqual(result.fields["product_id"], "MD-1")
+        self.assertEqual(result.fields["store_name"], "OG Store")
+        self.assertEqual(
+            (result.provenance["product_name"], result.provenance["product_id"], result.provenance["store_name"]),
+            (JSON_LD, MICRODATA, OPENGRAPH),
+        )
+
+    def test_nested_json_ld_product(self):
+        """Test a JSON-LD Product under a WebPage's mainEntity or a nested @graph is found."""
+        for json_ld in (
+            {"@type": "WebPage", "name": "Trail Shoe | Shoe Shop", "mainEntity": {"@type": "Product", "name": "Trail Shoe"}},
+            {"@type": "WebPage", "hasPart": {"@graph": [{"@type": "BreadcrumbList"}, {"@type": "Product", "name": "Trail Shoe"}]}},
+        ):
+            page = reduce_html(
+                f'<head><script type="application/ld+json">{json.dumps(json_ld)}</script>'
+                '<meta property="og:title" content="Shoe Shop"></head>'
+            )
+            result = extract_structured(page)
+            self.assertEqual(result.fields["product_name"], "Trail Shoe")
+            self.assertEqual(result.provenance["product_name"], JSON_LD)
+
+
+class TestParsePrice(unittest.TestCase):
+
+    def test_formats(self):
+        """Test numbers, thousands separators, decimal commas and currency symbols."""
+        self.assertEqual(parse_price(29.99), 29.99)
+        self.assertEqual(parse_price("1,200"), 1200.0)
+        self.assertEqual(parse_price("29,99 €"), 29.99)
+        self.assertEqual(parse_price("¥1200"), 1200.0)
+        self.assertEqual(parse_price(["$5.00"]), 5.0)
+        self.assertIsNone(parse_price("free"))
+
+    def test_separators(self):
+        """Test the last of "." and "," is the decimal point, and three digits after a lone one group thousands."""
+        self.assertEqual(parse_price("1.299,99 €"), 1299.99)
+        self.assertEqual(parse_price("1,299.99"), 1299.99)
+        self.assertEqual(parse_price("1.299"), 1299.0)
+        self.assertEqual(parse_price("12,5"), 12.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,310 @@
+"""
+Shared push notification dispatcher used by the apps, agents, crews and notebooks in this repo.
+
+    from notifier import push
+    push("Report ready")
+
+push() only queues the message and returns. A background thread runs an event loop that drains
+the bounded queue, folds bursts of short messages that arrive within coalesce_window into one
+notification, and hands them to a few sender threads, so up to `concurrency` notifications are in
+flight at once and may arrive out of order. The default sink posts to Pushover over one HTTP
+session pooling that many connections, with a timeout. Rate limits (429, honouring Retry-After), 5xx responses and
+network errors are retried with jittered exponential backoff; other 4xx responses are dropped.
+
+Tests can swap in a LocalSink, which records messages instead of sending them:
+
+    sink = LocalSink()
+    configure(sink=sink)
+    ...
+    get_notifier().flush()
+    assert sink.messages == [...]
+"""
+import asyncio
+import atexit
+import contextlib
+import os
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+# Pushover truncates anything longer, so coalescing never builds a message past this
+PUSHOVER_MAX_CHARS = 1024
+SEPARATOR = "\n\n"
+
+
+class DeliveryError(Exception):
+    """ A failed send. retryable is False for errors that will fail again, e.g. bad credentials """
+
+    def __init__(self, message: str, retryable: bool = True, retry_after: float | None = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class PushoverSink:
+    def __init__(self, token: str | None = None, user: str | None = None, timeout: float = 10.0, pool_size: int = 4):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.token = token or os.getenv("PUSHOVER_TOKEN")
+        self.user = user or os.getenv("PUSHOVER_USER")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def send(self, message: str):
+        import requests
+
+        try:
+            response = self.session.post(
+                PUSHOVER_URL,
+                data={"token": self.token, "user": self.user, "message": message},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise DeliveryError(str(e)) from e
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            raise DeliveryError("Rate limited", retry_after=float(retry_after) if retry_after else None)
+        if response.status_code >= 500:
+            raise DeliveryError(f"Pushover returned {response.status_code}")
+        if response.status_code >= 400:
+            raise DeliveryError(f"Pushover returned {response.status_code}: {response.text[:200]}", retryable=False)
+
+    def close(self):
+        self.session.close()
+
+
+class LocalSink:
+    """ Keeps delivered messages in memory, optionally printing them, instead of sending anything """
+
+    def __init__(self, echo: bool = False):
+        self.echo = echo
+        self.messages: list[str] = []
+        self._lock = threading.Lock()
+
+    def send(self, message: str):
+        with self._lock:
+            self.messages.append(message)
+        if self.echo:
+            print(f"Push: {message}")
+
+    def close(self):
+        pass
+
+
+@dataclass
+class NotifierStats:
+    queued: int = 0
+    sent: int = 0  # notifications delivered, each holding one or more coalesced messages
+    coalesced: int = 0  # messages that shared a notification with an earlier one
+    retries: int = 0
+    dropped: int = 0  # rejected because the queue was full
+    failed: int = 0  # messages given up on after retrying
+    errors: list[str] = field(default_factory=list)
+
+
+class Notifier:
+    def __init__(self, sink=None, max_queue: int = 1000, coalesce_window: float = 1.0,
+                 max_message_chars: int = PUSHOVER_MAX_CHARS, retries: int = 4, backoff: float = 1.0,
+                 max_backoff: float = 60.0, concurrency: int = 4):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.sink = sink if sink is not None else PushoverSink(pool_size=concurrency)
+        self.max_queue = max_queue
+        self.coalesce_window = coalesce_window
+        self.max_message_chars = max_message_chars
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.concurrency = concurrency
+        self.stats = NotifierStats()
+        self._loop = asyncio.new_event_loop()
+        self._queue: asyncio.Queue[str] = asyncio.Queue(max_queue)
+        self._closed = False
+        self._carry: str | None = None  # taken off the queue but left for the next batch
+        self._deliveries: set[asyncio.Task] = set()
+        # Started up front rather than through an executor: executors refuse new work once the interpreter
+        # starts shutting down, which is exactly when atexit flushes whatever is still queued
+        self._jobs: queue.SimpleQueue = queue.SimpleQueue()
+        self._senders = [
+            threading.Thread(target=self._send_forever, name=f"notifier-send-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for sender in self._senders:
+            sender.start()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="notifier", daemon=True)
+        self._thread.start()
+        self._worker: asyncio.Task | None = None
+        self._loop.call_soon_threadsafe(self._start)
+
+    def _start(self):
+        self._worker = self._loop.create_task(self._run())
+
+    async def _stop(self):
+        for task in [self._worker, *self._deliveries]:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def _send_forever(self):
+        while (job := self._jobs.get()) is not None:
+            message, future = job
+            error = None
+            try:
+                self.sink.send(message)
+            except Exception as e:
+                error = e
+            with contextlib.suppress(RuntimeError):  # the loop is already closed after a timed out close()
+                self._loop.call_soon_threadsafe(self._settle, future, error)
+
+    @staticmethod
+    def _settle(future: asyncio.Future, error: Exception | None):
+        if future.done():
+            return  # cancelled while the send was in flight
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+
+    def send(self, message: str):
+        """ Queues a message for delivery and returns immediately. Safe to call from any thread or event loop """
+        if self._closed:
+            raise RuntimeError("Notifier is closed")
+        self._loop.call_soon_threadsafe(self._enqueue, str(message))
+
+    def _enqueue(self, message: str):
+        try:
+            self._queue.put_nowait(message)
+            self.stats.queued += 1
+        except asyncio.QueueFull:
+            self.stats.dropped += 1
+            print(f"Notification queue full, dropping: {message[:80]}")
+
+    async def _next_batch(self) -> list[str]:
+        """ Waits for a message, then gathers any others that arrive within coalesce_window and still fit in one notification """
+        if self._carry is not None:
+            batch, self._carry = [self._carry], None
+        else:
+            batch = [await self._queue.get()]
+        size = len(batch[0])
+        deadline = time.monotonic() + self.coalesce_window
+        while size < self.max_message_chars:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                message = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if size + len(SEPARATOR) + len(message) > self.max_message_chars:
+                self._carry = message  # does not fit, so it starts the next batch
+                break
+            batch.append(message)
+            size += len(SEPARATOR) + len(message)
+        return batch
+
+    async def _deliver(self, message: str) -> bool:
+        for attempt in range(self.retries + 1):
+            try:
+                future = self._loop.create_future()
+                self._jobs.put((message, future))
+                await future
+                return True
+            except Exception as e:
+                retryable = getattr(e, "retryable", True)
+                if not retryable or attempt == self.retries:
+                    self.stats.errors = (self.stats.errors + [str(e)])[-20:]
+                    print(f"Push failed after {attempt + 1} attempts: {e}")
+                    return False
+                self.stats.retries += 1
+                delay = getattr(e, "retry_after", None)
+                if delay is None:
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+                await asyncio.sleep(delay)
+        return False
+
+    async def _deliver_batch(self, batch: list[str], slots: asyncio.Semaphore):
+        try:
+            if await self._deliver(SEPARATOR.join(batch)):
+                self.stats.sent += 1
+                self.stats.coalesced += len(batch) - 1
+            else:
+                self.stats.failed += len(batch)
+        finally:
+            slots.release()
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            batch = await self._next_batch()
+            await slots.acquire()
+            task = self._loop.create_task(self._deliver_batch(batch, slots))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    def flush(self, timeout: float | None = None):
+        """ Blocks until every message queued so far has been delivered or given up on """
+        future = asyncio.run_coroutine_threadsafe(self._queue.join(), self._loop)
+        future.result(timeout)
+
+    async def aflush(self):
+        """ flush() for async callers, without blocking their event loop """
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._queue.join(), self._loop))
+
+    def close(self, timeout: float | None = 30.0):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.flush(timeout)
+        except TimeoutError:
+            print(f"Notifier closed with {self._queue.qsize()} messages undelivered")
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+        self._loop.close()
+        for _ in self._senders:
+            self._jobs.put(None)
+        for sender in self._senders:
+            sender.join(5)
+        self.sink.close()
+
+
+_default: Notifier | None = None
+_default_lock = threading.Lock()
+
+
+def configure(**kwargs) -> Notifier:
+    """ Replaces the process-wide notifier, e.g. configure(sink=LocalSink()) in tests """
+    global _default
+    with _default_lock:
+        previous, _default = _default, Notifier(**kwargs)
+    if previous is not None:
+        previous.close()
+    return _default
+
+
+def get_notifier() -> Notifier:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Notifier()
+        return _default
+
+
+def push(message: str):
+    """ Queues a push notification on the shared notifier """
+    get_notifier().send(message)
+
+
+@atexit.register
+def _close_default():
+    # Give queued notifications a chance to go out before a short-lived script exits
+    if _default is not None:
+        _default.close(timeout=10.0)
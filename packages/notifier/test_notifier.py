@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import unittest
+
+from notifier import DeliveryError, LocalSink, Notifier
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class FlakySink(LocalSink):
+    """Fails the first few sends with a retryable error."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def send(self, message):
+        if self.failures:
+            self.failures -= 1
+            raise DeliveryError("unavailable", retry_after=0.0)
+        super().send(message)
+
+
+class SlowSink(LocalSink):
+    """Takes a while over each send and records how many were in flight at once."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.in_flight, self.peak = 0, 0
+        self._count_lock = threading.Lock()
+
+    def send(self, message):
+        with self._count_lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self._count_lock:
+            self.in_flight -= 1
+        super().send(message)
+
+
+class TestNotifier(unittest.TestCase):
+
+    def test_coalesces_a_burst(self):
+        """Test messages arriving within the window go out as one notification."""
+        sink = LocalSink()
+        notifier = Notifier(sink=sink, coalesce_window=0.2)
+        for message in ("one", "two", "three"):
+            notifier.send(message)
+        notifier.close()
+        self.assertEqual(sink.messages, ["one\n\ntwo\n\nthree"])
+        self.assertEqual((notifier.stats.sent, notifier.stats.coalesced), (1, 2))
+
+    def test_splits_at_the_message_limit(self):
+        """Test a message that would overflow the limit starts the next notification."""
+        sink = LocalSink()
+        notifier = Notifier(sink=sink, coalesce_window=0.2, max_message_chars=10)
+        for message in ("aaaa", "bbbb", "cccc"):
+            notifier.send(message)
+        notifier.close()
+        self.assertEqual(sink.messages, ["aaaa\n\nbbbb", "cccc"])
+
+    def test_retries_failed_sends(self):
+        """Test retryable errors are retried until the message goes out."""
+        sink = FlakySink(failures=2)
+        notifier = Notifier(sink=sink, coalesce_window=0.0, backoff=0.0)
+        notifier.send("hello")
+        notifier.close()
+        self.assertEqual(sink.messages, ["hello"])
+        self.assertEqual(notifier.stats.retries, 2)
+
+    def test_sends_concurrently(self):
+        """Test separate notifications go out in parallel, up to the concurrency limit."""
+        sink = SlowSink(delay=0.2)
+        notifier = Notifier(sink=sink, coalesce_window=0.0, concurrency=3)
+        for i in range(6):
+            notifier.send(f"message {i}")
+        notifier.close()
+        self.assertEqual(sorted(sink.messages), [f"message {i}" for i in range(6)])
+        self.assertEqual(sink.peak, 3)
+        self.assertEqual(notifier.stats.sent, 6)
+
+    def test_delivers_queued_messages_at_exit(self):
+        """Test a message pushed just before a script exits is still delivered."""
+        script = textwrap.dedent("""
+            from notifier import LocalSink, configure, push
+            configure(sink=LocalSink(echo=True), coalesce_window=1.0)
+            push("first")
+            push("last words")
+        """)
+        result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Push: first\n\nlast words", result.stdout)
+        self.assertNotIn("failed", result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
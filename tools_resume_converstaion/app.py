@@ -1,25 +1,16 @@
 from dotenv import load_dotenv
+import asyncio
 import json
-from openai import OpenAI
-import os
-import requests
-from pypdf import PdfReader
-import gradio as gr
+from functools import cached_property
+from resume_cache import load_pdf_text
+from resume_index import ChunkIndex, chunk_text
+from history import SUMMARY_PROMPT, HistoryManager, TokenCounter
+from notifier import push
 
-load_dotenv(override=True)
+# openai, pypdf and gradio each take a noticeable share of startup, so they are
+# imported where they are first needed instead of here
 
-# Push notification Setup
-pushover_user = os.getenv("PUSHOVER_USER")
-pushover_token = os.getenv("PUSHOVER_TOKEN")
-pushover_url = "https://api.pushover.net/1/messages.json"
-def push(message):
-    print(f"Push: {message}")
-    payload = {
-        "user": pushover_user, 
-        "token": pushover_token, 
-        "message": message
-    }
-    requests.post(pushover_url, data=payload)
+load_dotenv(override=True)
 
 # Tool 1
 def record_user_details(email, name="Name not provided", notes="not provided"):
@@ -35,6 +26,12 @@ def record_recruiter_question(inquiry):
     push(f"Job Description: {inquiry}")
     return {"recorded": True}
 
+tool_functions = {
+    "record_user_details": record_user_details,
+    "record_unknown_question": record_unknown_question,
+    "record_recruiter_question": record_recruiter_question,
+}
+
 record_user_details_json = {
     "name": "record_user_details",
     "description": "Use this tool to record that a user is interested in being in touch and provided an email address",
@@ -95,72 +92,143 @@ tools = [{"type": "function", "function": record_user_details_json},
          {"type": "function", "function": record_unknown_question_json},
          {"type": "function", "function": record_recruiter_question_json}]
 
+MODEL = "gpt-4o-mini"
+# Rounds of tool calls allowed per reply; the last round must answer in text
+MAX_TOOL_ROUNDS = 5
+
 class Conversation:
     def __init__(self):
-        self.openai = OpenAI()
         self.name = "Ashutosh Gajankush"
-        render = PdfReader("data/resume/Ashutosh_Gajankush.pdf")
-        self.resume = ""
-        for page in render.pages:
-            text = page.extract_text()
-            if text:
-                self.resume += text
+        # Parsed once and cached on disk, restarts only re-parse the PDF when it has changed
+        self.resume = load_pdf_text("data/resume/Ashutosh_Gajankush.pdf")
         with open("data/resume/summary.txt", "r", encoding="utf-8") as f:
             self.summary = f.read()
+        # Each turn only carries the top_k chunks most relevant to the question, so the prompt stays the
+        # same size however long the resume and summary grow
+        self.top_k = 4
+        self.index = ChunkIndex([f"Summary:\n{chunk}" for chunk in chunk_text(self.summary)] +
+                                [f"Resume:\n{chunk}" for chunk in chunk_text(self.resume)])
+        # The prompt prefix (tools, then the system message) is identical on every call, so build it once.
+        # Keeping those bytes stable lets the provider's prompt cache serve the prefix instead of re-reading it
+        self._system_prompt = self.build_system_prompt()
+        self.system_message = {"role": "system", "content": self._system_prompt}
+        self.prompt_cache_key = f"resume-chat-{self.name}"
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        # Older turns are folded into a running summary so each request stays within the token budget
+        self.history = HistoryManager(self.summarize_history, TokenCounter(MODEL), token_budget=3000, recent_budget=1500)
+
+    @cached_property
+    def openai(self):
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI()
+
+    async def call_tool(self, tool_call):
+        tool_name = tool_call.function.name
+        function = tool_functions.get(tool_name)
+        if function is None:
+            raise ValueError(f"Unknown tool: {tool_name}")
+        args = json.loads(tool_call.function.arguments)
+        if asyncio.iscoroutinefunction(function):
+            result = await function(**args)
+        else:
+            result = function(**args)
+        return {"role": "tool", "content": json.dumps(result), "tool_call_id": tool_call.id}
+
+    async def handle_tool_calls(self, tool_calls):
+        # Run every tool call from one response together; results keep the order of the calls
+        return list(await asyncio.gather(*(self.call_tool(tool_call) for tool_call in tool_calls)))
         
-
-    def handle_tool_calls(self, tool_calls):
-        results = []
-        for tool_call in tool_calls:
-            tool_name = tool_call.function.name
-            tool_args = tool_call.function.arguments
-            if tool_name == "record_user_details":
-                result = record_user_details(**json.loads(tool_args))
-            elif tool_name == "record_unknown_question":
-                result = record_unknown_question(**json.loads(tool_args))
-            elif tool_name == "record_recruiter_question":
-                result = record_recruiter_question(**json.loads(tool_args))
-            else:
-                raise ValueError(f"Unknown tool: {tool_name}")
-            results.append({"role": "tool", "content": json.dumps(result), "tool_call_id": tool_call.id})
-        return results
-        
-    def system_prompt(self):
+    def build_system_prompt(self):
         system_prompt = f"You are acting as {self.name}. You are answering questions on {self.name}'s website, \
 particularly questions related to {self.name}'s career, background, skills and experience. \
 Your responsibility is to represent {self.name} for interactions on the website as faithfully as possible. \
-You are given a summary of {self.name}'s background and LinkedIn profile which you can use to answer questions. \
+With each message you are given the excerpts of {self.name}'s summary and resume most relevant to it, which you can use to answer questions. \
 Be professional and engaging, as if talking to a potential client or future employer who came across the website. \
 If you don't know the answer to any question, use your record_unknown_question tool to record the question that you couldn't answer, even if it's about something trivial or unrelated to career. \
 If the user is engaging in discussion, try to steer them towards getting in touch via email; ask for their email and record it using your record_user_details tool. \
 If you suspect the user is a recruiter, use the record_recruiter_question tool to record the job description or inquiry they send in."
 
-        system_prompt += f"\n\n## Summary:\n{self.summary}\n\n## Resume:\n{self.resume}\n\n"
-        system_prompt += f"With this context, please chat with the user, always staying in character as {self.name}."
+        system_prompt += f"\n\nWith this context, please chat with the user, always staying in character as {self.name}."
         return system_prompt
 
-    def chat(self, message, history):
-        messages = [{"role": "system", "content": self.system_prompt()}] + history + [{"role": "user", "content": message}]
+    def system_prompt(self):
+        return self._system_prompt
+
+    @staticmethod
+    def clean_history(history):
+        # Gradio adds keys like metadata and options to each message; send only role and content so
+        # the same history always serializes to the same bytes
+        return [{"role": item["role"], "content": item["content"]} for item in history]
+
+    def context_message(self, message, history):
+        # Include the previous question so follow-ups like "tell me more about that" still retrieve the right chunks
+        previous = next((item["content"] for item in reversed(history) if item["role"] == "user" and isinstance(item["content"], str)), "")
+        chunks = self.index.search(f"{previous}\n{message}", self.top_k) or self.index.chunks[:self.top_k]
+        excerpts = "\n\n---\n\n".join(chunks)
+        return {"role": "system", "content": f"## Relevant excerpts from {self.name}'s summary and resume:\n\n{excerpts}"}
+
+    async def summarize_history(self, summary, messages):
+        conversation = "\n\n".join(f"{item['role']}: {item['content']}" for item in messages)
+        response = await self.openai.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"Current summary:\n{summary or 'None yet'}\n\nConversation:\n{conversation}"}
+            ]
+        )
+        return response.choices[0].message.content
+
+    def record_usage(self, usage):
+        details = usage.prompt_tokens_details
+        cached = (details.cached_tokens or 0) if details else 0
+        self.prompt_tokens += usage.prompt_tokens
+        self.cached_tokens += cached
+        overall = self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+        print(f"Prompt cache: {cached}/{usage.prompt_tokens} tokens cached this call, {overall:.0%} overall")
+
+    async def chat(self, message, history):
+        history = self.clean_history(history)
+        summary, recent = await self.history.compact(history)
+        messages = [self.system_message]
+        if summary:
+            messages.append({"role": "system", "content": f"## Summary of the earlier conversation:\n{summary}"})
+        # Retrieved excerpts go after the history, so the system message and history stay a cacheable prefix
+        messages += recent + [self.context_message(message, history), {"role": "user", "content": message}]
         done = False
+        rounds = 0
         while not done:
-            response = self.openai.chat.completions.create(
-                model="gpt-4o-mini",
+            rounds += 1
+            response = await self.openai.chat.completions.create(
+                model=MODEL,
                 messages=messages,
-                tools=tools
+                tools=tools,
+                tool_choice="none" if rounds >= MAX_TOOL_ROUNDS else "auto",
+                prompt_cache_key=self.prompt_cache_key
             )
+            if response.usage:
+                self.record_usage(response.usage)
             finish_reason = response.choices[0].finish_reason
             
             if finish_reason == "tool_calls":
                 message = response.choices[0].message
                 tool_calls = message.tool_calls
-                tool_results = self.handle_tool_calls(tool_calls)
-                messages.append(message)
+                tool_results = await self.handle_tool_calls(tool_calls)
+                # Plain dict rather than the response object, so the follow-up request serializes deterministically
+                messages.append({
+                    "role": "assistant",
+                    "content": message.content,
+                    "tool_calls": [tool_call.model_dump() for tool_call in tool_calls]
+                })
                 messages.extend(tool_results)
             else:
                 done = True
         return response.choices[0].message.content
 
 if __name__ == "__main__":
+    import gradio as gr
+
     conversation = Conversation()
     gr.ChatInterface(
         conversation.chat,
@@ -0,0 +1,136 @@
+import hashlib
+from collections import OrderedDict
+
+CHARS_PER_TOKEN = 4
+# Every chat message costs a few tokens of framing on top of its content
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_PROMPT = "You maintain a running summary of a chat between a visitor and an assistant on a personal \
+resume website. Given the current summary and the next part of the conversation, return an updated summary. \
+Keep every fact the visitor shared (name, email, company, role, what they are looking for), questions that \
+could not be answered, and anything the assistant promised. Drop small talk. Write concise notes, at most 200 words."
+
+
+class TokenCounter:
+    """Counts tokens locally with tiktoken when it is installed, otherwise estimates about 4 characters per token.
+    Counts are memoized per message, so re-sending the same history does not re-tokenize it."""
+
+    def __init__(self, model="gpt-4o-mini", cache_size=10_000):
+        self.model = model
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._encoding = None
+        self._loaded = False
+
+    @property
+    def encoding(self):
+        """Loaded on first use rather than at startup, as tiktoken downloads its BPE file the first time.
+        None if tiktoken is missing or the encoding cannot be loaded, e.g. on an offline host."""
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                self._encoding = None
+        return self._encoding
+
+    def count(self, text):
+        if self.encoding is None:
+            return len(text) // CHARS_PER_TOKEN + 1
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count_message(self, message):
+        content = str(message["content"] or "")
+        key = (message["role"], content)
+        tokens = self._cache.get(key)
+        if tokens is None:
+            tokens = self.count(content) + MESSAGE_OVERHEAD
+            self._cache[key] = tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return tokens
+
+
+class HistoryManager:
+    """Keeps the history sent to the model within token_budget.
+
+    Recent turns are kept verbatim. Once they no longer fit, the oldest ones are folded into a running
+    summary until the verbatim part is down to recent_budget, so summarizing happens once per several
+    turns and the summary then stays byte-identical, which keeps the prompt prefix cacheable.
+
+    Gradio sends the full history on every turn and one Conversation serves every session, so summaries
+    are stored by a hash of the history prefix they cover rather than per session."""
+
+    def __init__(self, summarize, counter=None, token_budget=3000, recent_budget=1500, max_summaries=1000):
+        self.summarize = summarize  # async (previous_summary, messages) -> new summary
+        self.counter = counter or TokenCounter()
+        self.token_budget = token_budget
+        self.recent_budget = recent_budget
+        self.max_summaries = max_summaries
+        self._summaries = OrderedDict()  # prefix hash -> summary of history[:n]
+
+    @staticmethod
+    def prefix_hashes(history):
+        """hashes[i] identifies history[:i]; chained, so each message is hashed once"""
+        hashes = [b""]
+        for message in history:
+            digest = hashlib.sha1(hashes[-1])
+            digest.update(message["role"].encode())
+            digest.update(b"\0")
+            digest.update(str(message["content"] or "").encode())
+            hashes.append(digest.digest())
+        return hashes
+
+    def _remember(self, key, summary):
+        self._summaries[key] = summary
+        self._summaries.move_to_end(key)
+        if len(self._summaries) > self.max_summaries:
+            self._summaries.popitem(last=False)
+
+    def _cut(self, history, start):
+        """Index of the first message to keep verbatim: as many recent messages as fit in recent_budget,
+        starting on a user turn so a question is never separated from its answer"""
+        tokens = 0
+        cut = len(history)
+        for i in range(len(history) - 1, start - 1, -1):
+            tokens += self.counter.count_message(history[i])
+            if tokens > self.recent_budget:
+                break
+            if history[i]["role"] == "user":
+                cut = i
+        return cut
+
+    async def compact(self, history):
+        """Returns (summary or None, recent messages) to send in place of history"""
+        hashes = self.prefix_hashes(history)
+        start, summary = 0, None
+        for i in range(len(history), 0, -1):
+            if hashes[i] in self._summaries:
+                start, summary = i, self._summaries[hashes[i]]
+                self._summaries.move_to_end(hashes[i])
+                break
+
+        recent = history[start:]
+        used = sum(self.counter.count_message(message) for message in recent)
+        if summary is not None:
+            used += self.counter.count(summary)
+        if used <= self.token_budget:
+            return summary, recent
+
+        cut = self._cut(history, start)
+        if cut <= start:
+            return summary, recent  # a single turn is over budget, nothing older left to fold in
+        try:
+            summary = await self.summarize(summary, history[start:cut])
+        except Exception as e:
+            # Better to lose the oldest turns than to fail the reply
+            print(f"History summary failed, dropping {cut - start} older messages: {e}")
+        self._remember(hashes[cut], summary)
+        return summary, history[cut:]
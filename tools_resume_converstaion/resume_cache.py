@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+
+CACHE_PATH = ".resume_cache.json"
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_pdf_text(path):
+    # pypdf is slow to import, so it is only loaded when a PDF actually has to be parsed
+    from pypdf import PdfReader
+
+    text = ""
+    for page in PdfReader(path).pages:
+        page_text = page.extract_text()
+        if page_text:
+            text += page_text
+    return text
+
+
+def load_pdf_text(path, cache_path=CACHE_PATH):
+    """Returns the text of a PDF, parsing it only when the file changed since the cached extraction.
+
+    Entries are matched on mtime and size first, which needs just a stat. If those differ, e.g. after
+    a fresh checkout, the content hash decides whether the cached text is still valid."""
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    entry = cache.get(key)
+    if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return entry["text"]
+
+    digest = file_hash(path)
+    if entry and entry["sha256"] == digest:
+        text = entry["text"]
+    else:
+        text = extract_pdf_text(path)
+    cache[key] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest, "text": text}
+    try:
+        # Write to a temporary file and rename, so a concurrently starting worker never reads a partial cache
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp, cache_path)
+    except OSError as e:
+        print(f"Could not write resume cache: {e}")
+    return text
@@ -0,0 +1,72 @@
+import math
+import re
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "has", "have", "he",
+    "his", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "that", "the", "this", "to",
+    "was", "what", "when", "where", "which", "who", "with", "you", "your",
+}
+
+
+def tokenize(text):
+    return [word for word in re.findall(r"[a-z0-9+#]+", text.lower()) if word not in STOPWORDS]
+
+
+def chunk_text(text, max_words=80, overlap_lines=1):
+    """Splits text into chunks of whole lines, up to max_words each, repeating the last
+    overlap_lines lines of a chunk at the start of the next so no bullet is cut off from its context"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    chunks = []
+    current = []
+    words = 0
+    for line in lines:
+        count = len(line.split())
+        if current and words + count > max_words:
+            chunks.append("\n".join(current))
+            current = current[-overlap_lines:] if overlap_lines else []
+            words = sum(len(item.split()) for item in current)
+        current.append(line)
+        words += count
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class ChunkIndex:
+    """BM25 index over a fixed set of chunks.
+
+    Per-term BM25 weights are precomputed into postings lists, so scoring a query only touches the
+    chunks that contain its terms. The corpus is a single resume, so plain lists are fast enough and
+    keep NumPy's import time out of startup."""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = list(chunks)
+        doc_terms = [{} for _ in self.chunks]
+        for counts, chunk in zip(doc_terms, self.chunks):
+            for token in tokenize(chunk):
+                counts[token] = counts.get(token, 0) + 1
+
+        lengths = [sum(counts.values()) for counts in doc_terms]
+        average = sum(lengths) / len(lengths) if sum(lengths) > 0 else 1.0
+        # term -> [(chunk, BM25 weight of the term in that chunk)]
+        self.postings = {}
+        for doc, counts in enumerate(doc_terms):
+            norm = k1 * (1 - b + b * lengths[doc] / average)
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((doc, tf * (k1 + 1) / (tf + norm)))
+        for token, postings in self.postings.items():
+            idf = math.log(1 + (len(self.chunks) - len(postings) + 0.5) / (len(postings) + 0.5))
+            self.postings[token] = [(doc, idf * weight) for doc, weight in postings]
+
+    def scores(self, query):
+        scores = [0.0] * len(self.chunks)
+        for token in set(tokenize(query)):
+            for doc, weight in self.postings.get(token, ()):
+                scores[doc] += weight
+        return scores
+
+    def search(self, query, k=4):
+        """Returns up to k chunks that share at least one term with the query, best match first"""
+        scores = self.scores(query)
+        top = sorted(range(len(self.chunks)), key=lambda i: -scores[i])[:k]
+        return [self.chunks[i] for i in top if scores[i] > 0]
@@ -0,0 +1,58 @@
+"""
+Measures how long a fresh process takes to import app.py and build a Conversation.
+
+Each sample runs in a new interpreter so module imports are not already cached. The cold case
+deletes the resume text cache first, so the PDF is parsed; the warm case reuses it.
+
+    python startup_benchmark.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from resume_cache import CACHE_PATH
+
+PROBE = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.Conversation()
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def sample(env):
+    output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True, env=env).stdout
+    imported, constructed = map(float, output.split()[-2:])
+    return imported, constructed
+
+
+def report(label, samples):
+    imports = [s[0] for s in samples]
+    totals = [s[0] + s[1] for s in samples]
+    print(f"{label:<6} import {statistics.median(imports) * 1000:8.1f}ms   "
+          f"import + Conversation() {statistics.median(totals) * 1000:8.1f}ms (median of {len(samples)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of the resume chat app, with and without the resume cache")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "unused")}
+
+    cold = []
+    for _ in range(args.runs):
+        if os.path.exists(CACHE_PATH):
+            os.remove(CACHE_PATH)
+        cold.append(sample(env))
+    warm = [sample(env) for _ in range(args.runs)]
+    report("cold", cold)
+    report("warm", warm)
+
+
+if __name__ == "__main__":
+    main()